@@ -0,0 +1,723 @@
+"""
+Micro-benchmarks for giphypop. These run against a local stand-in for the
+giphy api (see `tests.FakeGiphyServer`), so no api key or network access is
+needed. Run all of them with::
+
+    $ python benchmarks.py
+
+or a single one by name::
+
+    $ python benchmarks.py connection_pool
+"""
+import copy
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+
+from mock import patch
+
+import giphypop
+
+from giphypop import (CompactGiphyImage, Giphy, GiphyImage, LazyGiphyImage,
+                      LocalIndex, MemoryCache, RateLimiter)
+from tests import FAKE_DATA, FakeGiphyServer
+
+
+def _report(title, rows):
+    print(title)
+    for label, values in rows:
+        print('    %-24s %s' % (label, ', '.join('%s=%s' % kv for kv in values)))
+    print('')
+
+
+class UnpooledGiphy(Giphy):
+
+    """
+    Mimics the client before connection pooling: every request goes through
+    the module-level `requests.get`/`requests.post`, each with its own
+    throwaway connection
+    """
+
+    @property
+    def session(self):
+        return requests
+
+
+def bench_connection_pool(total=1000):
+    """
+    Pages through `total` search results with and without a pooled session,
+    reporting TCP connections opened and wall time
+    """
+    rows = []
+
+    for label, cls in (('unpooled', UnpooledGiphy), ('pooled', Giphy)):
+        with FakeGiphyServer(total_count=total) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                g = cls()
+                start = time.time()
+                g.search_list('foo', limit=total)
+                elapsed = time.time() - start
+                g.close()
+
+            rows.append((label, (('requests', len(server.requests)),
+                                 ('connections', server.connections),
+                                 ('seconds', '%.3f' % elapsed))))
+
+    _report('connection_pool: %d search results' % total, rows)
+
+
+def bench_prefetch(total=500, latency=0.05, work=0.002):
+    """
+    Crawls `total` search results from a server that takes `latency` seconds
+    per page while spending `work` seconds on each result, with increasing
+    amounts of prefetch
+    """
+    rows = []
+
+    for prefetch in (0, 1, 2, 4):
+        with FakeGiphyServer(total_count=total, latency=latency) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy() as g:
+                    start = time.time()
+                    for img in g.search('foo', limit=None, prefetch=prefetch):
+                        time.sleep(work)
+                    elapsed = time.time() - start
+
+        rows.append(('prefetch=%d' % prefetch,
+                     (('requests', len(server.requests)),
+                      ('seconds', '%.3f' % elapsed))))
+
+    pages = len(server.requests)
+    _report('prefetch: %d results, network %.2fs, processing %.2fs' %
+            (total, pages * latency, total * work), rows)
+
+
+def _items(count):
+    return [copy.deepcopy(FAKE_DATA) for _ in range(count)]
+
+
+def _measure_build(cls, count, use):
+    """
+    Builds `count` results with `cls` and calls `use` on each, returning the
+    seconds taken and the bytes still allocated afterwards. Time and memory
+    are measured in separate runs since tracing allocations is slow.
+    """
+    items = _items(count)
+    start = time.time()
+    for result in [cls(item) for item in items]:
+        use(result)
+    elapsed = time.time() - start
+
+    items = _items(count)
+    tracemalloc.start()
+    results = [cls(item) for item in items]
+    for result in results:
+        use(result)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return elapsed, size
+
+
+def bench_lazy_images(count=10000):
+    """
+    Builds `count` results eagerly and lazily, then reads only the id and
+    fixed_width url of each, or every rendition
+    """
+    uses = (
+        ('build', lambda img: None),
+        ('id+url', lambda img: (img.id, img.fixed_width.url)),
+        ('all', lambda img: img.keys()),
+    )
+
+    rows = []
+    for cls in (GiphyImage, LazyGiphyImage):
+        for label, use in uses:
+            elapsed, size = _measure_build(cls, count, use)
+            rows.append(('%s %s' % (cls.__name__, label),
+                         (('seconds', '%.3f' % elapsed),
+                          ('bytes/result', size // count))))
+
+    _report('lazy_images: %d results' % count, rows)
+
+
+def bench_compact_images(count=10000):
+    """
+    Measures the memory each kind of result holds on to once the api
+    response it was built from has been discarded
+    """
+    classes = (
+        ('GiphyImage', GiphyImage),
+        ('LazyGiphyImage', LazyGiphyImage),
+        ('CompactGiphyImage', CompactGiphyImage),
+        ('Compact keep_raw', lambda item: CompactGiphyImage(item,
+                                                            keep_raw=True)),
+    )
+
+    rows = []
+    for label, cls in classes:
+        tracemalloc.start()
+        items = _items(count)
+        results = [cls(item) for item in items]
+        del items
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        rows.append((label, (('bytes/result', size // len(results)),)))
+
+    _report('compact_images: %d results, including the api data they retain' %
+            count, rows)
+
+
+def _record_pages(total, per_page=25):
+    """
+    Records the raw bodies of the search pages for `total` results
+    """
+    with FakeGiphyServer(total_count=total) as server:
+        session = requests.Session()
+        pages = [session.get(server.endpoint + '/search',
+                             params={'offset': offset, 'limit': per_page}
+                             ).content
+                 for offset in range(0, total, per_page)]
+        session.close()
+
+    return pages
+
+
+def bench_json_decoders(total=5000, rounds=5):
+    """
+    Decodes recorded search pages for `total` results with each available
+    JSON decoder, alone and together with building the results
+    """
+    decoders = [('json', json.loads)]
+    for name in ('ujson', 'orjson'):
+        try:
+            decoders.append((name, __import__(name).loads))
+        except ImportError:
+            decoders.append((name, None))
+
+    pages = _record_pages(total)
+    size = sum(len(page) for page in pages)
+
+    rows = []
+    for name, loads in decoders:
+        if loads is None:
+            rows.append((name, (('status', 'not installed'),)))
+            continue
+
+        g = Giphy(json_decoder=loads)
+
+        start = time.time()
+        for _ in range(rounds):
+            for page in pages:
+                g._decode(page)
+        decode = (time.time() - start) / rounds
+
+        start = time.time()
+        for _ in range(rounds):
+            for page in pages:
+                [g._image(item) for item in g._decode(page)['data']]
+        build = (time.time() - start) / rounds
+
+        rows.append((name, (('decode seconds', '%.4f' % decode),
+                            ('MB/s', '%.0f' % (size / decode / 1e6)),
+                            ('decode+build seconds', '%.4f' % build))))
+
+    _report('json_decoders: %d pages, %d bytes' % (len(pages), size), rows)
+
+
+def bench_streaming(total=250, item_latency=0.01):
+    """
+    Pages through `total` search results whole and streamed, from a server
+    that sends each result `item_latency` seconds after the last, reporting
+    the time to the first result, the total time and the peak memory used
+    """
+    rows = []
+
+    for stream in (False, True):
+        with FakeGiphyServer(total_count=total,
+                             item_latency=item_latency) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy() as g:
+                    start = time.time()
+                    results = g.search('foo', limit=None, stream=stream)
+                    next(results)
+                    first = time.time() - start
+                    for img in results:
+                        pass
+                    elapsed = time.time() - start
+
+                    server.item_latency = 0
+                    tracemalloc.start()
+                    for img in g.search('foo', limit=None, stream=stream):
+                        pass
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+        rows.append(('stream=%s' % stream,
+                     (('first result seconds', '%.3f' % first),
+                      ('seconds', '%.3f' % elapsed),
+                      ('peak bytes', peak))))
+
+    _report('streaming: %d results, %.3fs between results' %
+            (total, item_latency), rows)
+
+
+def bench_rate_limit(total=60, quota=(20, 1.0), threads=4):
+    """
+    Looks up `total` gifs from `threads` threads against a server allowing
+    `quota` requests per window, without a rate limiter, with one set to
+    the quota's average rate, and with one that follows the rate limit
+    headers
+    """
+    limiters = (
+        ('none', lambda: None),
+        ('fixed rate', lambda: RateLimiter(quota[0] / quota[1], burst=1)),
+        ('adaptive', lambda: RateLimiter(1000)),
+    )
+
+    rows = []
+    for label, make in limiters:
+        with FakeGiphyServer() as server:
+            server.quota = quota
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy(rate_limit=make()) as g:
+                    def lookup(gif_id):
+                        try:
+                            return g.gif(str(gif_id))
+                        except requests.HTTPError:
+                            return None
+
+                    start = time.time()
+                    with ThreadPoolExecutor(threads) as pool:
+                        found = [img for img in pool.map(lookup, range(total))
+                                 if img is not None]
+                    elapsed = time.time() - start
+
+        rows.append((label, (('found', len(found)),
+                             ('429s', server.statuses.count(429)),
+                             ('seconds', '%.3f' % elapsed))))
+
+    _report('rate_limit: %d gifs, quota of %d per %.1fs' %
+            ((total,) + quota), rows)
+
+
+def bench_coalesce(threads=50, rounds=5, latency=0.05):
+    """
+    Looks up the same gif from `threads` threads at once, `rounds` times
+    over, with and without coalescing identical calls
+    """
+    rows = []
+    for coalesce in (False, True):
+        with FakeGiphyServer(latency=latency) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy(coalesce=coalesce,
+                           pool_maxsize=threads) as g:
+                    start = time.time()
+                    with ThreadPoolExecutor(threads) as pool:
+                        for _ in range(rounds):
+                            list(pool.map(g.gif, ['foo'] * threads))
+                    elapsed = time.time() - start
+
+        rows.append(('coalesce=%s' % coalesce,
+                     (('requests', len(server.requests)),
+                      ('seconds', '%.3f' % elapsed))))
+
+    _report('coalesce: %d identical lookups, %d at a time' %
+            (threads * rounds, threads), rows)
+
+
+def bench_threads(total=400, latency=0.02):
+    """
+    Looks up `total` different gifs through one shared client from more and
+    more threads, against a server taking `latency` seconds per request
+    """
+    ids = [str(i) for i in range(total)]
+
+    rows = []
+    for threads in (1, 2, 4, 8, 16, 32):
+        with FakeGiphyServer(latency=latency) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy(pool_maxsize=threads) as g:
+                    start = time.time()
+                    with ThreadPoolExecutor(threads) as pool:
+                        list(pool.map(g.gif, ids))
+                    elapsed = time.time() - start
+
+        rows.append(('threads=%d' % threads,
+                     (('requests/s', '%.0f' % (total / elapsed)),
+                      ('connections', server.connections),
+                      ('seconds', '%.3f' % elapsed))))
+
+    _report('threads: %d gifs, %.3fs per request' % (total, latency), rows)
+
+
+class BufferedUploadGiphy(Giphy):
+
+    """
+    Mimics the client before streaming uploads, which had requests build the
+    whole multipart body in memory
+    """
+
+    def upload(self, tags, file_path, username=None):
+        with open(file_path, 'rb') as f:
+            resp = self.session.post(
+                giphypop.GIPHY_UPLOAD_ENDPOINT, files={'file': f},
+                params={'api_key': self.api_key, 'tags': ','.join(tags)})
+        resp.raise_for_status()
+
+
+def bench_upload(size=32 * 1024 * 1024):
+    """
+    Uploads a `size` byte file with the multipart body built in memory and
+    streamed from disk, reporting the peak memory used and wall time
+    """
+    with tempfile.NamedTemporaryFile(suffix='.gif') as f:
+        chunk = os.urandom(1024 * 1024)
+        for _ in range(size // len(chunk)):
+            f.write(chunk)
+        f.flush()
+
+        rows = []
+        for label, cls in (('buffered', BufferedUploadGiphy),
+                           ('streamed', Giphy)):
+            with FakeGiphyServer() as server:
+                server.discard_uploads = True
+                with patch.multiple('giphypop',
+                                    GIPHY_API_ENDPOINT=server.endpoint,
+                                    GIPHY_UPLOAD_ENDPOINT=server.endpoint):
+                    with cls() as g:
+                        start = time.time()
+                        tracemalloc.start()
+                        g.upload(['foo'], f.name)
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                        elapsed = time.time() - start
+
+            rows.append((label, (('peak bytes', peak),
+                                 ('seconds', '%.3f' % elapsed))))
+
+    _report('upload: %d byte file' % size, rows)
+
+
+def bench_upload_many(count=40, latency=0.05):
+    """
+    Uploads `count` small files one by one and with upload_many, against a
+    server taking `latency` seconds per request
+    """
+    tmp = tempfile.mkdtemp()
+    paths = []
+    for i in range(count):
+        paths.append(os.path.join(tmp, '%d.gif' % i))
+        with open(paths[-1], 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+
+    def one_by_one(g, hydrate):
+        for path in paths:
+            g.upload(['foo'], path, hydrate=hydrate)
+
+    def many(concurrency):
+        def run(g, hydrate):
+            list(g.upload_many(paths, tags=['foo'], hydrate=hydrate,
+                               concurrency=concurrency))
+        return run
+
+    runs = (('one by one', one_by_one), ('upload_many 4', many(4)),
+            ('upload_many 16', many(16)))
+
+    rows = []
+    for hydrate in (True, False):
+        for label, run in runs:
+            with FakeGiphyServer(latency=latency) as server:
+                server.discard_uploads = True
+                with patch.multiple('giphypop',
+                                    GIPHY_API_ENDPOINT=server.endpoint,
+                                    GIPHY_UPLOAD_ENDPOINT=server.endpoint):
+                    with Giphy(pool_maxsize=16) as g:
+                        start = time.time()
+                        run(g, hydrate)
+                        elapsed = time.time() - start
+
+            rows.append(('%s%s' % (label, '' if hydrate else ', ids'),
+                         (('seconds', '%.3f' % elapsed),)))
+
+    shutil.rmtree(tmp)
+    _report('upload_many: %d files, %.3fs per request' % (count, latency),
+            rows)
+
+
+def bench_download(count=300, size=100 * 1024, latency=0.01):
+    """
+    Downloads the original rendition of `count` gifs of `size` bytes one by
+    one with a fresh connection each, as a hand-rolled downloader might,
+    and with download_many, against a server taking `latency` seconds per
+    request
+    """
+    def naive(g, images, dest):
+        for img in images:
+            content = requests.get(img.original.url).content
+            with open(os.path.join(dest, '%s.gif' % img.id), 'wb') as f:
+                f.write(content)
+
+    def many(concurrency):
+        def run(g, images, dest):
+            for img, path, error in g.download_many(images, dest,
+                                                    concurrency=concurrency):
+                if error is not None:
+                    raise error
+        return run
+
+    runs = (('one by one', naive), ('download_many 1', many(1)),
+            ('download_many 8', many(8)))
+
+    rows = []
+    for label, run in runs:
+        with FakeGiphyServer(latency=latency) as server:
+            images = []
+            for i in range(count):
+                data = copy.deepcopy(FAKE_DATA)
+                data['id'] = str(i)
+                server.media['%d.gif' % i] = os.urandom(size)
+                data['images']['original'].update(
+                    url=server.media_url('%d.gif' % i), size=str(size))
+                images.append(GiphyImage(data))
+
+            dest = tempfile.mkdtemp()
+            with Giphy(pool_maxsize=8) as g:
+                start = time.time()
+                run(g, iter(images), dest)
+                elapsed = time.time() - start
+            shutil.rmtree(dest)
+
+        rows.append((label, (('connections', server.connections),
+                             ('MB/s', '%.1f' % (count * size / elapsed / 1e6)),
+                             ('seconds', '%.3f' % elapsed))))
+
+    _report('download: %d gifs of %d bytes, %.3fs per request' %
+            (count, size, latency), rows)
+
+
+def bench_best_rendition(count=10000, box=250):
+    """
+    Compares the bytes served for `count` results when always sending the
+    original against the cheapest and the largest rendition for a `box`
+    pixel wide slot, and the time taken to pick them
+    """
+    data = copy.deepcopy(FAKE_DATA)
+    sizes = {'original': 2000000, 'fixed_height': 400000,
+             'fixed_height_downsampled': 150000, 'fixed_height_still': 20000,
+             'fixed_width': 250000, 'fixed_width_downsampled': 90000,
+             'fixed_width_still': 12000}
+    for name, size in sizes.items():
+        data['images'][name]['size'] = str(size)
+
+    rows = []
+    for cls in (GiphyImage, CompactGiphyImage):
+        images = [cls(data) for _ in range(count)]
+
+        start = time.time()
+        original = sum(img.original.size for img in images)
+        elapsed = time.time() - start
+        rows.append(('%s original' % cls.__name__,
+                     (('MB', original // 1000000),
+                      ('seconds', '%.3f' % elapsed))))
+
+        for label, largest in (('cheapest', False), ('largest', True)):
+            start = time.time()
+            best = giphypop.best_renditions(images, max_width=box,
+                                            largest=largest)
+            elapsed = time.time() - start
+            rows.append(('%s %s' % (cls.__name__, label),
+                         (('MB', sum(r.size for r in best) // 1000000),
+                          ('seconds', '%.3f' % elapsed))))
+
+    _report('best_rendition: %d results, %dpx wide' % (count, box), rows)
+
+
+def _percentile(times, fraction):
+    return sorted(times)[int(len(times) * fraction)]
+
+
+def bench_local_index(count=1000000, queries=1000, batch=10000):
+    """
+    Stores `count` gifs, titled with random words, in a LocalIndex on disk
+    and reports how long it takes to add them and the latency of searches
+    and lookups by id against it, with FTS5 and with the fallback table
+    """
+    rng = random.Random(0)
+    vocabulary = ['word%d' % i for i in range(5000)]
+    item = {'images': {'original': {'url': 'http://media.giphy.com/x.gif',
+                                    'width': '480', 'height': '270'}}}
+
+    rows = []
+    for fts in (True, False):
+        directory = tempfile.mkdtemp()
+        try:
+            index = LocalIndex(os.path.join(directory, 'index.db'), fts=fts)
+            label = 'fts5' if index.fts else 'fallback'
+
+            start = time.time()
+            for offset in range(0, count, batch):
+                index.add([dict(item, id=str(i), rating='g',
+                                title=' '.join(rng.sample(vocabulary, 3)))
+                           for i in range(offset, offset + batch)])
+            elapsed = time.time() - start
+            rows.append(('%s add' % label,
+                         (('items/s', int(count / elapsed)),
+                          ('seconds', '%.1f' % elapsed))))
+
+            for words in (1, 2):
+                times = []
+                for _ in range(queries):
+                    query = ' '.join(rng.sample(vocabulary, words))
+                    start = time.time()
+                    index.search(query, limit=25)
+                    times.append(time.time() - start)
+                rows.append(('%s search %d word%s' %
+                             (label, words, 's' if words > 1 else ''),
+                             (('ms p50', '%.2f' % (_percentile(times, .5) * 1e3)),
+                              ('ms p99', '%.2f' % (_percentile(times, .99) * 1e3)))))
+
+            times = []
+            for _ in range(queries):
+                gif_id = str(rng.randrange(count))
+                start = time.time()
+                index.get(gif_id)
+                times.append(time.time() - start)
+            rows.append(('%s get' % label,
+                         (('ms p50', '%.2f' % (_percentile(times, .5) * 1e3)),
+                          ('ms p99', '%.2f' % (_percentile(times, .99) * 1e3)))))
+            index.close()
+        finally:
+            shutil.rmtree(directory)
+
+    _report('local_index: %d gifs, %d queries' % (count, queries), rows)
+
+
+def bench_reservoir(calls=50, latency=0.05, reservoir=10):
+    """
+    Times `calls` random gifs for one tag, one after another, with the
+    screensaver response only holding the gif id (two requests per gif),
+    with the full gif (one), and drawn from a reservoir
+    """
+    rows = []
+    for label, bare, size in (('two requests', True, 0),
+                              ('one request', False, 0),
+                              ('reservoir', False, reservoir)):
+        with FakeGiphyServer(latency=latency) as server:
+            server.bare_random = bare
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                g = Giphy(reservoir=size)
+                times = []
+                for _ in range(calls):
+                    start = time.time()
+                    g.random_gif('cats')
+                    times.append(time.time() - start)
+                    # Stand in for the time between clicks
+                    time.sleep(latency)
+                g.close()
+
+        rows.append((label, (('ms p50', '%.1f' % (_percentile(times, .5) * 1e3)),
+                             ('ms max', '%.1f' % (max(times) * 1e3)),
+                             ('requests', len(server.requests)))))
+
+    _report('reservoir: %d random gifs, %.3fs per request' % (calls, latency),
+            rows)
+
+
+def bench_shorthands(calls=200, latency=0.005):
+    """
+    Looks up `calls` gifs with the `gif` shorthand, as it was (a new client
+    per call) and as it is (a shared client), reporting connections opened
+    and wall time
+    """
+    rows = []
+    for label, client in (('client per call', lambda key: Giphy(api_key=key)),
+                          ('shared client', giphypop.get_client)):
+        with FakeGiphyServer(latency=latency) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint), \
+                    patch('giphypop.get_client', client):
+                start = time.time()
+                for i in range(calls):
+                    giphypop.gif(str(i), api_key='key')
+                elapsed = time.time() - start
+        giphypop.close_clients()
+
+        rows.append((label, (('connections', server.connections),
+                             ('seconds', '%.3f' % elapsed))))
+
+    _report('shorthands: %d gif lookups, %.3fs per request' %
+            (calls, latency), rows)
+
+
+def bench_instrumentation(total=1000, rounds=20, requests_made=200):
+    """
+    Times paging through `total` cached search results `rounds` times, and
+    making `requests_made` api calls, with no hooks, with a hook that does
+    nothing on every event, and collecting stats
+    """
+    noop = dict((event, lambda info: None) for event in giphypop.HOOK_EVENTS)
+    rows = []
+    for label, kwargs in (('no hooks', {}),
+                          ('no-op hooks', {'hooks': noop}),
+                          ('stats', {'collect_stats': True})):
+        with FakeGiphyServer(total_count=total) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint), \
+                    Giphy(cache=MemoryCache(), **kwargs) as g:
+                list(g.search('foo', limit=total))  # Warm the cache
+
+                start = time.time()
+                for _ in range(rounds):
+                    for _ in g.search('foo', limit=total):
+                        pass
+                cached = time.time() - start
+
+                start = time.time()
+                for i in range(requests_made):
+                    g.gif(str(i))
+                uncached = time.time() - start
+
+        rows.append((label, (
+            ('us/cached result', '%.2f' % (cached / (rounds * total) * 1e6)),
+            ('ms/request', '%.3f' % (uncached / requests_made * 1e3)))))
+
+    _report('instrumentation: %d cached results x %d, %d requests' %
+            (total, rounds, requests_made), rows)
+
+
+BENCHMARKS = {
+    'best_rendition': bench_best_rendition,
+    'coalesce': bench_coalesce,
+    'compact_images': bench_compact_images,
+    'connection_pool': bench_connection_pool,
+    'download': bench_download,
+    'instrumentation': bench_instrumentation,
+    'json_decoders': bench_json_decoders,
+    'lazy_images': bench_lazy_images,
+    'local_index': bench_local_index,
+    'prefetch': bench_prefetch,
+    'rate_limit': bench_rate_limit,
+    'reservoir': bench_reservoir,
+    'shorthands': bench_shorthands,
+    'streaming': bench_streaming,
+    'threads': bench_threads,
+    'upload': bench_upload,
+    'upload_many': bench_upload_many,
+}
+
+
+if __name__ == '__main__':
+    import warnings
+    warnings.simplefilter('ignore')
+
+    for name in (sys.argv[1:] or sorted(BENCHMARKS)):
+        BENCHMARKS[name]()
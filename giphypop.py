@@ -5,11 +5,29 @@ __license__ = 'MIT'
 __copyright__ = 'Copyright 2013 Shaun Duncan'
 
 
+import bisect
+import calendar
+import hashlib
+import json
+import mimetypes
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
 import warnings
+import weakref
 import requests
 
+from collections import deque, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_tz, mktime_tz
 from functools import partial
 
+from requests.compat import basestring, urlencode, urlparse
+
 
 GIPHY_API_ENDPOINT = 'http://api.giphy.com/v1/gifs'
 GIPHY_UPLOAD_ENDPOINT = 'http://upload.giphy.com/v1/gifs'
@@ -20,11 +38,274 @@ GIPHY_PUBLIC_KEY = 'dc6zaTOxFJmzC'
 
 DEFAULT_SEARCH_LIMIT = 25
 
+# The renditions of each image that are made available on GiphyImage.
+# Order matters :)
+RENDITIONS = ('original',
+              'fixed_width',
+              'fixed_height',
+              'fixed_width_downsampled',
+              'fixed_width_still',
+              'fixed_height_downsampled',
+              'fixed_height_still',
+              'downsized')
+
+# Number of pages `search_list` and `trending_list` request at once
+DEFAULT_PARALLEL = 4
+
+# Most results the api returns in one page of `search` or `trending`.
+# Pages are sized to fetch just enough results for the limit asked for, up
+# to this many, unless a `page_size` is given.
+MAX_PAGE_SIZE = 50
+
+# Maximum number of ids `gifs` asks for in a single request
+GIFS_CHUNK_SIZE = 100
+
+# Connection pooling defaults. `pool_connections` is the number of distinct
+# hosts to keep pools for, `pool_maxsize` is the number of keep-alive
+# connections to keep per host
+DEFAULT_POOL_CONNECTIONS = 2
+DEFAULT_POOL_MAXSIZE = 10
+
+# Seconds that responses from each endpoint stay cached when a cache is in
+# use; 0 disables caching for that endpoint. Lookups by gif id (which have
+# no endpoint name of their own) use the 'gif' entry.
+DEFAULT_CACHE_TTLS = {
+    'search': 5 * 60,
+    'trending': 60,
+    'translate': 5 * 60,
+    'screensaver': 0,  # Random by nature
+    'gif': 24 * 60 * 60,
+}
+
+# Seconds a cached response that carries an ETag or Last-Modified header is
+# kept after it goes stale, so that it can be revalidated with a conditional
+# request rather than downloaded again
+CACHE_REVALIDATE_TTL = 24 * 60 * 60
+
+# How many times a rate limited request is retried after a 429 Too Many
+# Requests response, and the seconds to wait before the first retry when the
+# api doesn't send Retry-After. The wait doubles for every 429 in a row.
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF = 1
+
+# Seconds to wait for a connection to the api and then for each read from
+# it, unless a Giphy instance is given its own `timeout`
+DEFAULT_TIMEOUT = (3.05, 10)
+
+# How many times requests that fail with one of RETRY_STATUSES or a
+# connection error or timeout are retried, unless a Giphy instance is given
+# its own `retries`. Retries wait a random time of up to RETRY_BACKOFF
+# seconds, doubling for each further retry up to RETRY_BACKOFF_MAX.
+DEFAULT_RETRIES = 2
+RETRY_STATUSES = frozenset((500, 502, 503, 504))
+RETRY_BACKOFF = 0.5
+RETRY_BACKOFF_MAX = 10
+
+# Bytes of a file read, and sent, at a time when uploading it
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Bytes of a media file written to disk at a time when downloading it
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Renames a file over another, where the platform allows
+_replace = getattr(os, 'replace', os.rename)
+
+# Seconds results stored in a LocalIndex may answer queries for instead of
+# the api, unless a Giphy instance is given its own `local_max_age`. Trending
+# results only answer for as long as they'd be cached, as what's trending
+# moves on much sooner.
+LOCAL_MAX_AGE = 24 * 60 * 60
+
+# How a Giphy instance uses its LocalIndex: 'store' only saves results to
+# it, 'first' also answers queries it has fresh results for, and 'offline'
+# answers everything from it, never calling the api
+LOCAL_MODES = ('store', 'first', 'offline')
+
+# Endpoints whose responses are random by nature, so identical concurrent
+# calls to them are not coalesced into one request
+UNCOALESCED_ENDPOINTS = frozenset(('screensaver',))
+
+# A clock that can't go backwards, where there is one
+_clock = getattr(time, 'monotonic', time.time)
+
+# Objects holding locks, connections or threads that don't survive a fork,
+# which `after_fork` resets in the child
+_fork_sensitive = weakref.WeakSet()
+
+# Environment variables read by `get_client`, and the Giphy arguments they set
+CLIENT_ENVIRON = {
+    'GIPHYPOP_TIMEOUT': 'timeout',
+    'GIPHYPOP_RETRIES': 'retries',
+    'GIPHYPOP_POOL_MAXSIZE': 'pool_maxsize',
+    'GIPHYPOP_RATE_LIMIT': 'rate_limit',
+    'GIPHYPOP_CACHE_DIR': 'cache',
+}
+
+# Events Giphy `hooks` can be given for. Each hook is called with a dict:
+#   request_start: endpoint, method, url and params (without the api key)
+#       of a call to the api, and the clock time it started
+#   request_end: the same, plus the last response's status (None if there
+#       was none), the number of attempts made, bytes_in and bytes_out of
+#       response and request bodies, seconds taken in all, decode_seconds of
+#       that spent decoding the response, and the error raised, if any
+#   retry: endpoint, the attempt that failed, the delay in seconds before the
+#       next (None when the rate limiter decides), and its status or error
+#   cache_hit, cache_miss: endpoint and cache key; misses say whether a
+#       stale entry was found to revalidate
+#   page: endpoint, offset of a page of results, how many results of it
+#       were yielded and the build_seconds spent making them into images
+HOOK_EVENTS = ('request_start', 'request_end', 'retry', 'cache_hit',
+               'cache_miss', 'page')
+
+# Upper bounds, in seconds, of the request latency histograms kept by Stats
+STATS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                         5, 10)
+
+
+def _fast_json_decoder():
+    """
+    Returns the `loads` function of the fastest JSON library installed
+    """
+    for name in ('orjson', 'ujson'):
+        try:
+            return __import__(name).loads
+        except ImportError:
+            pass
+
+    return json.loads
+
+
+# The function used to decode api responses, from bytes, unless a Giphy
+# instance is given its own `json_decoder`. Uses orjson or ujson when one of
+# them is installed, falling back to the standard library.
+DEFAULT_JSON_DECODER = _fast_json_decoder()
+
+# Bytes read from the network at a time when streaming a response
+STREAM_CHUNK_SIZE = 1024
+
+# Everything up to the next bracket outside of a string, or to the opening
+# quote of a string that hasn't fully arrived yet
+_JSON_FILLER = re.compile(br'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_JSON_STRING = re.compile(br'"[^"\\]*(?:\\.[^"\\]*)*"')
+_JSON_SCALAR = re.compile(br'[^,:\s\]}]*')
+_JSON_SEPARATOR = re.compile(br'[\s,:]*')
+
+
+class _JSONStream(object):
+
+    """
+    Splits a JSON object that arrives in chunks into its top level members
+    without waiting for the whole document. `feed` each chunk and it yields
+    (key, raw JSON bytes) for every member completed so far, except that the
+    elements of a top level `data` array are yielded one at a time, with a
+    key of None, as soon as each is complete. The raw values still need to be
+    decoded; they are only split out, not validated.
+    """
+
+    def __init__(self):
+        self.buffer = b''
+        self.pos = 0
+        self.state = 'start'
+        self.key = None
+        self.resume = (0, 0)  # How far into a partial value we've scanned
+
+    @property
+    def done(self):
+        return self.state == 'done'
+
+    def _scan(self, start):
+        """
+        Returns the end of the value starting at `start`, or None if it
+        hasn't been received in full yet
+        """
+        buf = self.buffer
+        first = buf[start:start + 1]
+
+        if first == b'"':
+            match = _JSON_STRING.match(buf, start)
+            return match and match.end()
+
+        if first not in (b'{', b'['):
+            # Numbers, booleans and null end at the next separator
+            end = _JSON_SCALAR.match(buf, start).end()
+            return None if end == len(buf) else end
+
+        # Containers end once their brackets balance, so only brackets are
+        # looked at, picking up where the last chunk left off
+        offset, depth = self.resume
+        pos = start + offset
+        while True:
+            pos = _JSON_FILLER.match(buf, pos).end()
+            char = buf[pos:pos + 1]
+            if not char or char == b'"':
+                self.resume = (pos - start, depth)
+                return None
+
+            depth += 1 if char in (b'{', b'[') else -1
+            pos += 1
+            if not depth:
+                self.resume = (0, 0)
+                return pos
+
+    def feed(self, chunk):
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+        while self.state != 'done':
+            start = _JSON_SEPARATOR.match(self.buffer, self.pos).end()
+            if start == len(self.buffer):
+                return
+            first = self.buffer[start:start + 1]
+
+            if self.state == 'start':
+                if first != b'{':
+                    raise ValueError('Expected a JSON object')
+                self.pos, self.state = start + 1, 'key'
+            elif self.state == 'key' and first == b'}':
+                self.pos, self.state = start + 1, 'done'
+            elif self.state == 'value' and self.key == 'data' and first == b'[':
+                self.pos, self.state = start + 1, 'items'
+            elif self.state == 'items' and first == b']':
+                self.pos, self.state = start + 1, 'key'
+            else:
+                end = self._scan(start)
+                if end is None:
+                    return
+                self.pos = end
+                value = self.buffer[start:end]
+
+                if self.state == 'key':
+                    self.key = value[1:-1].decode('utf-8')
+                    self.state = 'value'
+                elif self.state == 'value':
+                    self.state = 'key'
+                    yield self.key, value
+                else:
+                    yield None, value
+
 
 class GiphyApiException(Exception):
     pass
 
 
+class GiphyTimeoutException(GiphyApiException):
+    """
+    Raised when a call's `deadline` passes before it could finish
+    """
+
+
+class GiphyCircuitOpenException(GiphyApiException):
+    """
+    Raised instead of making a request while a CircuitBreaker is open
+    """
+
+
+class GiphyDownloadException(GiphyApiException):
+    """
+    Raised when a downloaded file isn't the size giphy said it would be
+    """
+
+
 class AttrDict(dict):
 
     """
@@ -48,7 +329,245 @@ class AttrDict(dict):
             self[attr] = value
 
 
-class GiphyImage(AttrDict):
+def _rendition_attrs(key):
+    """
+    Splits a rendition name into its attribute and sub-attribute (or None),
+    e.g. fixed_width_still becomes ('fixed_width', 'still')
+    """
+    parts = key.split('_')
+
+    # attr/subattr style
+    if len(parts) > 2:
+        return '_'.join(parts[:-1]), parts[-1]
+    else:
+        return '_'.join(parts), None
+
+
+_RENDITION_ATTRS = dict((key, _rendition_attrs(key)) for key in RENDITIONS)
+
+
+def _rendition_groups(renditions):
+    """
+    Maps each top level GiphyImage attribute to the renditions built under
+    it, in order, given the renditions wanted
+    """
+    groups = {}
+    for key in RENDITIONS:
+        if key in renditions:
+            groups.setdefault(_RENDITION_ATTRS[key][0], []).append(key)
+    return groups
+
+
+_RENDITION_GROUPS = _rendition_groups(RENDITIONS)
+
+
+# Renditions that are a single frame of the gif
+STILL_RENDITIONS = frozenset(('fixed_width_still', 'fixed_height_still'))
+
+
+def _rendition_index(image):
+    """
+    Builds the list of (name, rendition) pairs an image's `renditions` are
+    """
+    index = []
+    for name in RENDITIONS:
+        attr, subattr = _RENDITION_ATTRS[name]
+        rendition = getattr(image, attr, None)
+        if rendition is not None and subattr is not None:
+            rendition = getattr(rendition, subattr, None)
+
+        if getattr(rendition, 'url', None):
+            index.append((name, rendition))
+
+    def cost(item):
+        size = getattr(item[1], 'size', None)
+        return size is None, size or 0, _rendition_area(item[1])
+
+    # Cheapest first: fewest bytes, then those of unknown size by area
+    index.sort(key=cost)
+    return index
+
+
+def _rendition_area(rendition):
+    """
+    Returns a rendition's width times height, or -1 if either is unknown
+    """
+    width = getattr(rendition, 'width', None)
+    height = getattr(rendition, 'height', None)
+    if isinstance(width, int) and isinstance(height, int):
+        return width * height
+    return -1
+
+
+def _largest_first(index):
+    """
+    Reorders a rendition index largest in width times height first, and
+    cheapest first among those the same size
+    """
+    return sorted(index, key=lambda item: -_rendition_area(item[1]))
+
+
+def _rendition_filter(max_width, max_height, max_bytes, animated):
+    """
+    Returns a function of a rendition's name and the rendition, that tells
+    whether it fits the limits given to `best_rendition`
+    """
+    limits = [(field, limit) for field, limit in (('width', max_width),
+                                                  ('height', max_height),
+                                                  ('size', max_bytes))
+              if limit is not None]
+
+    def fits(name, rendition):
+        if animated is not None and (name in STILL_RENDITIONS) == animated:
+            return False
+
+        for field, limit in limits:
+            value = getattr(rendition, field, None)
+            if not isinstance(value, int) or value > limit:
+                return False
+        return True
+
+    return fits
+
+
+def best_renditions(images, max_width=None, max_height=None, max_bytes=None,
+                    animated=True, largest=False):
+    """
+    Returns a list of the best rendition of each of `images`, or None for
+    those with none that fit, as `best_rendition` picks them. The limits are
+    worked out once for all of them.
+    """
+    fits = _rendition_filter(max_width, max_height, max_bytes, animated)
+    best = []
+    for image in images:
+        index = image.renditions
+        if largest:
+            index = _largest_first(index)
+        for name, rendition in index:
+            if fits(name, rendition):
+                best.append(rendition)
+                break
+        else:
+            best.append(None)
+    return best
+
+
+class _ImageMixin(object):
+
+    """
+    Behavior shared by all kinds of image results
+    """
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return '%s<%s> at %s' % (self.__class__.__name__, self.id, self.url)
+
+    def __str__(self):
+        return self.url
+
+    __unicode__ = __str__
+
+    def open(self):
+        """
+        Opens the giphy url in a web browser
+        """
+        # Imported here because this method is MAGIC
+        import webbrowser
+        webbrowser.open(self.url)
+
+    @property
+    def media_url(self):
+        """
+        The media URL of the gif at its original size
+        """
+        return self.original.url
+
+    @property
+    def frames(self):
+        """
+        The number of frames of the gif
+        """
+        return self.original.frames
+
+    @property
+    def width(self):
+        """
+        The width of the gif at its original size
+        """
+        return self.original.width
+
+    @property
+    def height(self):
+        """
+        The height of the gif at its original size
+        """
+        return self.original.height
+
+    @property
+    def filesize(self):
+        """
+        The size of the original size file in bytes
+        """
+        return self.original.size
+
+    @property
+    def renditions(self):
+        """
+        The renditions of the gif as (name, rendition) pairs, cheapest
+        first: smallest in bytes first, then those of unknown size in bytes,
+        smallest in width times height first
+        """
+        index = getattr(self, '_rendition_index', None)
+        if index is None:
+            index = _rendition_index(self)
+            # Not an item of GiphyImage's dict, nor a field of the result
+            object.__setattr__(self, '_rendition_index', index)
+        return index
+
+    def best_rendition(self, max_width=None, max_height=None, max_bytes=None,
+                       animated=True, largest=False):
+        """
+        Returns the cheapest rendition that fits in `max_width` by
+        `max_height` and `max_bytes`, in the order of `renditions`, or None
+        if none fit. With `largest`, returns the largest in width times
+        height that fits instead, choosing the smallest in bytes of any the
+        same size, for when quality matters more than bandwidth. Renditions
+        missing a field that is limited don't fit.
+
+        :param max_width: Widest rendition wanted in pixels, or None for any
+        :type max_width: int
+        :param max_height: Tallest rendition wanted in pixels, or None for any
+        :type max_height: int
+        :param max_bytes: Largest file wanted in bytes, or None for any
+        :type max_bytes: int
+        :param animated: True for animated renditions only, False for
+                         stills only and None for either
+        :type animated: bool
+        :param largest: Whether to pick the largest rendition that fits
+                        rather than the cheapest
+        :type largest: bool
+        """
+        fits = _rendition_filter(max_width, max_height, max_bytes, animated)
+        index = self.renditions
+        if largest:
+            index = _largest_first(index)
+        for name, rendition in index:
+            if fits(name, rendition):
+                return rendition
+        return None
+
+    def download(self, rendition='original', dest='.', giphy=None):
+        """
+        Downloads the gif at one of its RENDITIONS to `dest`, a file path or
+        a directory to save it in as <id>-<rendition>.<ext>, returning the
+        path saved to. See `Giphy.download`, which this calls on `giphy`,
+        if given, to use its connection pool, timeout and retries.
+        """
+        return (giphy or _downloader()).download(self, rendition, dest)
+
+
+class GiphyImage(_ImageMixin, AttrDict):
 
     """
     A special case AttrDict that handles data specifically being returned
@@ -95,7 +614,7 @@ class GiphyImage(AttrDict):
                     - height: image height
     """
 
-    def __init__(self, data=None):
+    def __init__(self, data=None, renditions=None):
         if data:
             super(GiphyImage, self).__init__(id=data.get('id'),
                                              url=data.get('url'),
@@ -107,168 +626,2419 @@ class GiphyImage(AttrDict):
             self.tiled = data.get('bitly_tiled_url')
             self.bitly = data.get('bitly_gif_url')
 
-            # Shorthand
-            self._make_images(data.get('images', {}))
+            # Shorthand
+            self._make_images(data.get('images', {}), renditions)
+
+    def _make_images(self, images, renditions=None):
+        """
+        Takes an image dict from the giphy api and converts it to attributes.
+        Any fields expected to be int (width, height, size, frames) will be attempted
+        to be converted. Also, the keys of `data` serve as the attribute names, but
+        with special action taken. Keys are split by the last underscore; anything prior
+        becomes the attribute name, anything after becomes a sub-attribute. For example:
+        fixed_width_downsampled will end up at `self.fixed_width.downsampled`.
+        If `renditions` is given, only the renditions it names are converted.
+        """
+        for key in RENDITIONS:
+            if renditions is not None and key not in renditions:
+                continue
+
+            data = images.get(key)
+
+            # Ignore empties
+            if not data:
+                continue
+
+            attr, subattr = _RENDITION_ATTRS[key]
+
+            # Normalize a copy, leaving the api data as it was
+            img = self._normalized(AttrDict(data))
+
+            if subattr is None:
+                setattr(self, attr, img)
+            else:
+                # The parent rendition may not have been wanted
+                parent = dict.get(self, attr)
+                if parent is None:
+                    parent = AttrDict()
+                    setattr(self, attr, parent)
+                setattr(parent, subattr, img)
+
+    def _normalized(self, data):
+        """
+        Does a normalization of sorts on image type data so that values
+        that should be integers are converted from strings
+        """
+        int_keys = ('frames', 'width', 'height', 'size')
+
+        for key in int_keys:
+            if key not in data:
+                continue
+
+            try:
+                data[key] = int(data[key])
+            except ValueError:
+                pass  # Ignored
+
+        return data
+
+
+class LazyGiphyImage(GiphyImage):
+
+    """
+    A GiphyImage that puts off building its renditions until they are used.
+    Attributes are the same as a GiphyImage's, but accessing `original`,
+    `fixed_width`, `fixed_height` or `downsized` (or a property that relies
+    on them, like `media_url`) is what converts that rendition. Using the
+    image as a dict (keys, items, iteration, pop, update, ...) converts
+    everything. Setting a rendition replaces it without converting it.
+    This makes results cheaper to create when only a few fields are read.
+    """
+
+    def __getattr__(self, attr):
+        if '_pending' in self.__dict__ and not dict.__contains__(self, attr):
+            self._materialize(attr)
+
+        try:
+            return dict.__getitem__(self, attr)
+        except KeyError:
+            return super(LazyGiphyImage, self).__getattr__(attr)
+
+    def __setitem__(self, key, value):
+        # A value set by hand replaces the rendition that would be built
+        pending = self.__dict__.get('_pending')
+        if pending:
+            with _materialize_lock:
+                pending.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def _make_images(self, images, renditions=None):
+        """
+        Records `images` to be converted when first accessed
+        """
+        if renditions is None:
+            groups = _RENDITION_GROUPS
+        else:
+            groups = _rendition_groups(renditions)
+
+        # Maps each attribute not yet built to the renditions to build it from
+        self.__dict__['_pending'] = dict((attr, (images, keys))
+                                         for attr, keys in groups.items())
+
+    def _materialize(self, attr=None):
+        """
+        Converts the pending renditions under `attr`, or all of them
+        """
+        with _materialize_lock:
+            pending = self.__dict__.get('_pending')
+            if not pending:
+                return
+
+            attrs = list(pending) if attr is None else [attr]
+            for name in attrs:
+                if name in pending:
+                    images, keys = pending.pop(name)
+                    GiphyImage._make_images(self, images, keys)
+
+            if not pending:
+                del self.__dict__['_pending']
+
+
+_materialize_lock = threading.RLock()
+
+
+def _materializing(name):
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('__contains__', '__delitem__', '__eq__', '__getitem__',
+              '__iter__', '__len__', '__ne__', 'clear', 'copy', 'get', 'items',
+              'keys', 'pop', 'popitem', 'setdefault', 'update', 'values'):
+    setattr(LazyGiphyImage, _name, _materializing(_name))
+
+
+class GiphyRendition(object):
+
+    """
+    A compact, fixed-field version of the AttrDict used for each rendition of
+    a GiphyImage. Like those, only the fields present in the api response
+    are set, and integer fields are converted from strings. Renditions
+    with variations (fixed_width, fixed_height) have them as `downsampled`
+    and `still`.
+    """
+
+    __slots__ = ('url', 'width', 'height', 'size', 'frames', 'mp4',
+                 'mp4_size', 'webp', 'webp_size', 'downsampled', 'still')
+
+    _int_fields = frozenset(('frames', 'width', 'height', 'size'))
+
+    def __init__(self, data=None):
+        for key, value in (data or {}).items():
+            if key not in self.__slots__:
+                continue
+
+            if key in self._int_fields:
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass  # Ignored
+
+            setattr(self, key, value)
+
+    def __repr__(self):
+        return '%s<%s>' % (self.__class__.__name__, getattr(self, 'url', None))
+
+
+class CompactGiphyImage(_ImageMixin):
+
+    """
+    A memory efficient alternative to GiphyImage for when you hold on to a
+    lot of results. It has the same attributes, but is not a dict, uses
+    GiphyRendition objects for renditions, and only keeps the api response
+    in `raw_data` if `keep_raw` is set (it is None otherwise). If given,
+    only the `renditions` named are converted.
+    """
+
+    __slots__ = ('id', 'url', 'type', 'raw_data', 'fullscreen', 'tiled',
+                 'bitly', 'original', 'fixed_width', 'fixed_height',
+                 'downsized', '_rendition_index')
+
+    def __init__(self, data=None, keep_raw=False, renditions=None):
+        data = data or {}
+
+        self.id = data.get('id')
+        self.url = data.get('url')
+        self.type = data.get('type')
+        self.raw_data = data if keep_raw else None
+
+        # bit.ly urls
+        self.fullscreen = data.get('bitly_fullscreen_url')
+        self.tiled = data.get('bitly_tiled_url')
+        self.bitly = data.get('bitly_gif_url')
+
+        images = data.get('images') or {}
+        for key in RENDITIONS:
+            if renditions is not None and key not in renditions:
+                continue
+
+            if not images.get(key):
+                continue
+
+            attr, subattr = _RENDITION_ATTRS[key]
+            rendition = GiphyRendition(images[key])
+
+            if subattr is None:
+                setattr(self, attr, rendition)
+            else:
+                # The parent rendition may not have been wanted
+                parent = getattr(self, attr, None)
+                if parent is None:
+                    parent = GiphyRendition()
+                    setattr(self, attr, parent)
+                setattr(parent, subattr, rendition)
+
+
+def _freshness(headers, default):
+    """
+    Returns the number of seconds a response may be served from the cache,
+    which is `default` unless its Cache-Control or Expires headers say
+    otherwise, or None if the response must not be stored
+    """
+    directives = {}
+    for directive in (headers.get('Cache-Control') or '').split(','):
+        name, _, value = directive.partition('=')
+        directives[name.strip().lower()] = value.strip().strip('"')
+
+    if 'no-store' in directives:
+        return None
+
+    if 'no-cache' in directives:
+        return 0
+
+    try:
+        return max(min(int(directives['max-age']), default), 0)
+    except (KeyError, ValueError):
+        pass
+
+    if headers.get('Expires'):
+        expires = parsedate_tz(headers['Expires'])
+        if expires is None:
+            return 0  # Invalid dates, e.g. '0', mean already expired
+
+        date = headers.get('Date') and parsedate_tz(headers['Date'])
+        now = mktime_tz(date) if date else calendar.timegm(time.gmtime())
+        return max(min(mktime_tz(expires) - now, default), 0)
+
+    return default
+
+
+class BaseCache(object):
+
+    """
+    The interface for response caches used by `Giphy`. To write your own
+    backend, subclass this, call its __init__, and implement `get`, `set`,
+    `delete` and `clear`. Keys are strings and values are JSON-serializable
+    dicts holding a decoded api response and its caching metadata. Backends
+    must be safe to use from multiple threads.
+
+    `Giphy` keeps count of how its requests were served: `hits` were
+    answered from the cache, `revalidations` were stale but confirmed
+    unchanged by the api (a cheap 304 response), and `misses` had to be
+    downloaded.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._stats_lock = threading.Lock()
+        _fork_sensitive.add(self)
+
+    def _after_fork(self):
+        self._stats_lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value stored under `key`, or None if there is no value or
+        it has expired
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """
+        Stores `value` under `key` for `ttl` seconds
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """
+        Removes the value stored under `key`, if any
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Removes every stored value
+        """
+        raise NotImplementedError
+
+    def record(self, outcome):
+        """
+        Counts a request as one of 'hits', 'misses' or 'revalidations'
+        """
+        with self._stats_lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+
+class MemoryCache(BaseCache):
+
+    """
+    An in-process cache holding at most `maxsize` responses. Once full, the
+    least recently used response is evicted. Note that cached values are
+    shared with the results built from them, so results should be treated
+    as read-only.
+    """
+
+    def __init__(self, maxsize=1024):
+        super(MemoryCache, self).__init__()
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires, value), oldest first
+        self._lock = threading.Lock()
+
+    def _after_fork(self):
+        super(MemoryCache, self)._after_fork()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None or entry[0] <= time.time():
+                return None
+
+            # Re-insert as most recently used
+            self._data[key] = entry
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + ttl, value)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileCache(BaseCache):
+
+    """
+    A persistent cache storing each response as a JSON file in `directory`,
+    which is created if needed. It can be shared by several processes.
+    Expired files are removed when next read, or by `clear`.
+    """
+
+    def __init__(self, directory):
+        super(FileCache, self).__init__()
+        self.directory = directory
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if entry['expires'] <= time.time():
+            self.delete(key)
+            return None
+
+        return entry['value']
+
+    def set(self, key, value, ttl):
+        # Write to a temp file and rename so readers never see partial data
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'expires': time.time() + ttl, 'value': value}, f)
+        _replace(tmp, self._path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+def _words(text):
+    """
+    Splits text into the lowercase words a LocalIndex matches on
+    """
+    return re.findall(r'\w+', (text or '').lower(), re.UNICODE)
+
+
+def _local_query(endpoint_name, params):
+    """
+    Returns the key a LocalIndex stores the results of a paged query under.
+    Keys don't include the api key or the page asked for.
+    """
+    query = urlencode(sorted(item for item in params.items()
+                             if item[0] not in ('api_key', 'offset', 'limit')))
+    return '%s?%s' % (endpoint_name, query)
+
+
+class LocalIndex(object):
+
+    """
+    A searchable store of the gifs seen in api responses, kept in the SQLite
+    database at `path` (in memory by default). Pass one to `Giphy` as
+    `local_index` to have it save every result, and to answer queries from
+    it; see `Giphy` for how. It can also be searched directly.
+
+    Gifs are indexed by the words of their title, slug and username, and of
+    every query they were a result of, along with their id, rating and
+    original dimensions. Words are matched with SQLite's FTS5 full-text
+    search where it is available, and with a plain table of words
+    otherwise, or if `fts` is False. The order each paged query returned
+    its results in is kept too, so repeat queries can be answered as the
+    api answered them.
+
+    An index can be shared by any number of threads, and a database file
+    by several processes.
+    """
+
+    def __init__(self, path=':memory:', fts=True):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = self._connect()
+        _fork_sensitive.add(self)
+
+        with self._lock, self._db:
+            if path != ':memory:':
+                self._db.execute('PRAGMA journal_mode=WAL')
+
+            self._db.executescript("""
+                CREATE TABLE IF NOT EXISTS gifs (
+                    rowid INTEGER PRIMARY KEY,
+                    id TEXT UNIQUE NOT NULL,
+                    data TEXT NOT NULL,
+                    rating TEXT,
+                    width INTEGER,
+                    height INTEGER,
+                    stored REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS gifs_size ON gifs (width, height);
+                CREATE TABLE IF NOT EXISTS queries (
+                    query TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS results (
+                    query TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    gif INTEGER NOT NULL,
+                    stored REAL NOT NULL,
+                    PRIMARY KEY (query, position)) WITHOUT ROWID;
+            """)
+
+            # A database made without FTS5 keeps using the table of words
+            fts = fts and not self._db.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'words'").fetchone()
+            if fts:
+                try:
+                    self._db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS '
+                                     'gif_text USING fts5(text)')
+                except sqlite3.OperationalError:
+                    fts = False  # No FTS5 in this build of SQLite
+
+            if not fts:
+                self._db.execute("""
+                    CREATE TABLE IF NOT EXISTS words (
+                        word TEXT NOT NULL,
+                        gif INTEGER NOT NULL,
+                        PRIMARY KEY (word, gif)) WITHOUT ROWID""")
+
+        self.fts = fts
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM gifs').fetchone()[0]
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        # SQLite connections to a file mustn't be used across a fork, or
+        # even closed, so the parent's is left alone. An in-memory database
+        # is the child's own copy, so it's kept.
+        if self.path != ':memory:':
+            self._inherited, self._db = self._db, self._connect()
+
+    def close(self):
+        """
+        Closes the database
+        """
+        with self._lock:
+            self._db.close()
+
+    def add(self, items, query=None):
+        """
+        Stores gifs, given as api results (dicts) or GiphyImages, all at
+        once. `query`, if given, is a search they were results of, and its
+        words are indexed for them. This is how to warm an index up from
+        results crawled some other way.
+
+        :param items: Results to store
+        :type items: iterable
+        :param query: Search the results matched
+        :type query: string
+        """
+        with self._lock, self._db:
+            self._add(items, _words(query), time.time())
+
+    def store(self, endpoint_name, params, data):
+        """
+        Stores the results of an api response, where `params` are those it
+        was requested with. The results of paged queries are also recorded
+        in the order they were returned, to answer the same query later.
+        """
+        items = data.get('data')
+        if isinstance(items, dict):
+            items = [items]
+        items = [item for item in items or () if item.get('images')]
+        if not items:
+            return
+
+        query = params.get('q') or params.get('s')
+        now = time.time()
+
+        with self._lock, self._db:
+            rowids = self._add(items, _words(query), now)
+
+            pagination = data.get('pagination')
+            if endpoint_name in ('search', 'trending') and pagination:
+                key = _local_query(endpoint_name, params)
+                offset = int(params.get('offset') or 0)
+                self._db.execute(
+                    'INSERT OR REPLACE INTO queries VALUES (?, ?)',
+                    (key, int(pagination.get('total_count') or 0)))
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    [(key, offset + i, rowid, now)
+                     for i, rowid in enumerate(rowids)])
+
+    def _add(self, items, query_words, now):
+        """
+        Inserts or updates gifs, returning their rowids in order. Must be
+        called under the lock, in a transaction.
+        """
+        rowids = []
+        for item in items:
+            item = getattr(item, 'raw_data', item)
+            if not isinstance(item, dict):
+                raise ValueError('Only results with raw_data can be stored')
+
+            original = (item.get('images') or {}).get('original') or {}
+            try:
+                width, height = (int(original['width']),
+                                 int(original['height']))
+            except (KeyError, TypeError, ValueError):
+                width = height = None
+
+            row = (json.dumps(item), item.get('rating'), width, height, now)
+            rowid = self._db.execute('SELECT rowid FROM gifs WHERE id = ?',
+                                     (item['id'],)).fetchone()
+            if rowid is None:
+                rowid = self._db.execute(
+                    'INSERT INTO gifs (data, rating, width, height, stored, '
+                    'id) VALUES (?, ?, ?, ?, ?, ?)',
+                    row + (item['id'],)).lastrowid
+                words = set()
+            else:
+                rowid = rowid[0]
+                self._db.execute(
+                    'UPDATE gifs SET data = ?, rating = ?, width = ?, '
+                    'height = ?, stored = ? WHERE rowid = ?', row + (rowid,))
+                words = self._indexed_words(rowid)
+
+            new = set(query_words)
+            for field in ('title', 'slug', 'username'):
+                new.update(_words(item.get(field)))
+            new.difference_update(words)
+            if new:
+                self._index(rowid, words, new)
+
+            rowids.append(rowid)
+        return rowids
+
+    def _indexed_words(self, rowid):
+        if self.fts:
+            row = self._db.execute('SELECT text FROM gif_text WHERE rowid = ?',
+                                   (rowid,)).fetchone()
+            return set(row[0].split()) if row else set()
+
+        return set(word for word, in self._db.execute(
+            'SELECT word FROM words WHERE gif = ?', (rowid,)))
+
+    def _index(self, rowid, words, new):
+        if self.fts:
+            text = ' '.join(sorted(words | new))
+            if words:
+                self._db.execute('UPDATE gif_text SET text = ? '
+                                 'WHERE rowid = ?', (text, rowid))
+            else:
+                self._db.execute('INSERT INTO gif_text (rowid, text) '
+                                 'VALUES (?, ?)', (rowid, text))
+        else:
+            self._db.executemany('INSERT OR IGNORE INTO words VALUES (?, ?)',
+                                 [(word, rowid) for word in new])
+
+    def get(self, gif_id, max_age=None):
+        """
+        Returns the api result stored for `gif_id`, or None if there isn't
+        one stored in the last `max_age` seconds
+        """
+        with self._lock:
+            row = self._db.execute('SELECT data, stored FROM gifs '
+                                   'WHERE id = ?', (gif_id,)).fetchone()
+
+        if row is None or (max_age is not None and
+                           row[1] < time.time() - max_age):
+            return None
+        return json.loads(row[0])
+
+    def results(self, endpoint_name, params, limit=None, max_age=None):
+        """
+        Returns the api results a paged query got, in the order it got them,
+        up to `limit` of them. Returns None unless all of those are stored,
+        and were stored in the last `max_age` seconds.
+        """
+        key = _local_query(endpoint_name, params)
+        with self._lock:
+            row = self._db.execute('SELECT total FROM queries WHERE query = ?',
+                                   (key,)).fetchone()
+            if row is None:
+                return None
+
+            wanted = row[0] if limit is None else min(row[0], limit)
+            rows = self._db.execute(
+                'SELECT g.data, r.stored FROM results r '
+                'JOIN gifs g ON g.rowid = r.gif '
+                'WHERE r.query = ? AND r.position < ? ORDER BY r.position',
+                (key, wanted)).fetchall()
+
+        if len(rows) < wanted:
+            return None  # Not every page has been fetched
+        if max_age is not None and rows and \
+                min(stored for _, stored in rows) < time.time() - max_age:
+            return None
+        return [json.loads(data) for data, _ in rows]
+
+    def search(self, query, rating=None, limit=DEFAULT_SEARCH_LIMIT,
+               max_width=None, max_height=None):
+        """
+        Returns the stored api results matching every word of `query`, best
+        matches first when FTS5 is used and most recently added first
+        otherwise.
+
+        :param query: Words to search for
+        :type query: string
+        :param rating: Only return results rated this (y, g, pg, pg-13 or r)
+        :type rating: string
+        :param limit: Maximum number of results to return, or None for all
+        :type limit: int
+        :param max_width: Only return results at most this wide originally
+        :type max_width: int
+        :param max_height: Only return results at most this tall originally
+        :type max_height: int
+        """
+        words = sorted(set(_words(query)))
+        if not words:
+            return []
+
+        where, args = [], []
+        for column, op, value in (('rating', '=', rating),
+                                  ('width', '<=', max_width),
+                                  ('height', '<=', max_height)):
+            if value is not None:
+                where.append('g.%s %s ?' % (column, op))
+                args.append(value)
+
+        if self.fts:
+            sql = ('SELECT g.data FROM gif_text t '
+                   'JOIN gifs g ON g.rowid = t.rowid WHERE gif_text MATCH ?')
+            args.insert(0, ' '.join('"%s"' % word for word in words))
+            order = 't.rank'
+        else:
+            sql = ('SELECT g.data FROM gifs g WHERE g.rowid IN ('
+                   'SELECT gif FROM words WHERE word IN (%s) GROUP BY gif '
+                   'HAVING COUNT(*) = ?)' % ', '.join('?' * len(words)))
+            args[:0] = words + [len(words)]
+            order = 'g.rowid DESC'
+
+        sql += ''.join(' AND ' + clause for clause in where)
+        sql += ' ORDER BY %s' % order
+        if limit is not None:
+            sql += ' LIMIT ?'
+            args.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [json.loads(data) for data, in rows]
+
+
+def _retry_after(headers):
+    """
+    Returns the seconds a Retry-After header asks to wait, or None
+    """
+    value = headers.get('Retry-After')
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        date = parsedate_tz(value)
+        if date is None:
+            return None
+        return max(mktime_tz(date) - time.time(), 0)
+
+
+def _number_header(headers, name):
+    try:
+        return float(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter(object):
+
+    """
+    A thread safe token bucket that spaces out api requests to `rate` per
+    second, allowing bursts of up to `burst` requests. Call `acquire` before
+    each request, or `reserve` and wait the seconds it returns yourself,
+    e.g. with asyncio, then pass each response's headers and status to
+    `update`.
+
+    Responses adapt the limiter to the api's own quota. While
+    X-RateLimit-Remaining and X-RateLimit-Reset say how many requests are
+    left and when the quota resets, requests beyond that wait for the reset.
+    A Retry-After header or a 429 Too Many Requests status pauses all
+    requests until the api is ready for more.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError('rate must be more than 0')
+        self.rate = float(rate)
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = _clock()  # Tokens are counted up to this time
+        self._quota = None  # Requests left in the api's window, and its end
+        self._pending = 0  # Requests reserved but not yet answered
+        self._throttled = 0  # 429 responses in a row
+        self._lock = threading.Lock()
+        _fork_sensitive.add(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._pending = 0  # Those were the parent's
+
+    def reserve(self, tokens=1):
+        """
+        Takes `tokens` from the bucket, returning the number of seconds to
+        wait before using them
+        """
+        with self._lock:
+            now = _clock()
+            if now > self._updated:
+                self._tokens = min(self.burst, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+
+            self._tokens -= tokens
+            self._pending += tokens
+            wait = (max(self._updated - now, 0) +
+                    max(-self._tokens, 0) / self.rate)
+
+            if self._quota is not None:
+                remaining, reset = self._quota
+                if now >= reset:
+                    self._quota = None
+                else:
+                    self._quota = (remaining - tokens, reset)
+                    if remaining - tokens < 0:
+                        wait = max(wait, reset - now)
+
+            return wait
+
+    def acquire(self, tokens=1):
+        """
+        Takes `tokens` from the bucket, sleeping until they can be used
+        """
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Holds back all requests for `seconds`
+        """
+        with self._lock:
+            until = _clock() + seconds
+            if until > self._updated:
+                self._updated = until
+                self._tokens = min(self._tokens, 0)
+
+    def update(self, headers, status=None):
+        """
+        Adapts to the rate limit headers and status of an api response. Call
+        this without a status when a request fails without a response.
+        """
+        remaining = _number_header(headers, 'X-RateLimit-Remaining')
+        reset = _number_header(headers, 'X-RateLimit-Reset')
+        wait = _retry_after(headers)
+
+        with self._lock:
+            self._pending = max(self._pending - 1, 0)
+
+            if remaining is not None and reset is not None:
+                # Resets may be given as a unix time or as seconds from now
+                if reset > 1e9:
+                    reset -= time.time()
+
+                # The api may not have counted requests still in flight
+                self._quota = (remaining - self._pending,
+                               _clock() + max(reset, 0))
+
+            if status == 429:
+                self._throttled += 1
+                if wait is None:
+                    wait = RATE_LIMIT_BACKOFF * 2 ** (self._throttled - 1)
+            elif status is not None:
+                self._throttled = 0
+
+        if wait:
+            self.pause(wait)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def rate_limiter(api_key, rate, burst=None):
+    """
+    Returns the RateLimiter shared by every client using `api_key`, creating
+    it or changing its rate and burst as needed
+    """
+    if rate <= 0:
+        raise ValueError('rate must be more than 0')
+
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(api_key)
+        if limiter is None:
+            limiter = _rate_limiters[api_key] = RateLimiter(rate, burst)
+        else:
+            limiter.rate = float(rate)
+            limiter.burst = burst or max(1, int(rate))
+        return limiter
+
+
+class _Flight(object):
+
+    """
+    A request in flight, which identical concurrent calls wait on rather than
+    making their own
+    """
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# In-flight requests by (api key, endpoint, params), shared by every client
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+class _Reservoir(object):
+
+    """
+    Random results kept ready to hand out for one tag. `filling` is set
+    while a refill is under way, so that only one runs at a time.
+    """
+
+    def __init__(self):
+        self.items = deque()
+        self.filling = False
+        self.lock = threading.Lock()
+
+
+class CircuitBreaker(object):
+
+    """
+    Fails requests fast while the api is down. Once `failure_threshold`
+    requests in a row have failed, even after retrying, the breaker opens
+    and requests raise GiphyCircuitOpenException straight away instead of
+    tying up a thread waiting on the api. After `recovery_timeout` seconds a
+    single request is let through to try the api again; if it succeeds the
+    breaker closes, otherwise it stays open for another `recovery_timeout`.
+
+    A breaker is thread safe and can be shared by several Giphy instances.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0  # Failures in a row
+        self._opened = None  # When the breaker last opened
+        self._trial = False  # Whether a request is trying the api again
+        self._lock = threading.Lock()
+        _fork_sensitive.add(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._trial = False  # That was the parent's
+
+    @property
+    def state(self):
+        """
+        One of 'closed', 'open', or 'half-open' once it's time to try again
+        """
+        with self._lock:
+            if self._opened is None:
+                return 'closed'
+            if _clock() - self._opened < self.recovery_timeout:
+                return 'open'
+            return 'half-open'
+
+    def before(self):
+        """
+        Raises GiphyCircuitOpenException unless a request may be made now
+        """
+        with self._lock:
+            if self._opened is None:
+                return
+
+            retry_in = self._opened + self.recovery_timeout - _clock()
+            if retry_in > 0 or self._trial:
+                raise GiphyCircuitOpenException(
+                    'Giphy api unavailable after %d failed requests, trying '
+                    'again in %.1f seconds' % (self.failures, max(retry_in, 0)))
+            self._trial = True
+
+    def record(self, success):
+        """
+        Records the outcome of a request let through by `before`. Pass None
+        when it ended without a verdict on the api, such as when its deadline
+        passed before it was sent.
+        """
+        with self._lock:
+            self._trial = False
+            if success:
+                self.failures = 0
+                self._opened = None
+            elif success is not None:
+                self.failures += 1
+                if (self._opened is not None or
+                        self.failures >= self.failure_threshold):
+                    self._opened = _clock()
+
+
+def _metric_endpoint(endpoint_name):
+    """
+    Returns the name hooks and Stats report calls to `endpoint_name` under:
+    lookups by id are 'gif', or 'gifs' for several ids at once
+    """
+    if endpoint_name in DEFAULT_CACHE_TTLS or endpoint_name in ('upload',
+                                                                'download'):
+        return endpoint_name
+    return 'gif' if endpoint_name else 'gifs'
+
+
+class Stats(object):
+
+    """
+    Aggregates the events of the Giphy instances it collects for, by
+    endpoint: requests made, errors raised and retries, responses by status,
+    a histogram of request latencies, seconds spent on requests in all and
+    on decoding responses, bytes received and sent, cache hits and misses,
+    and pages and results yielded along with the seconds spent building
+    them. Latencies are counted in the first of `buckets` (upper bounds in
+    seconds) they fit, or else in an overflow bucket.
+
+    Pass one as `collect_stats` to share it between instances, or pass its
+    `hooks` along with hooks of your own. A Stats is thread safe, and starts
+    over in a child process after a fork.
+    """
+
+    def __init__(self, buckets=STATS_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._endpoints = {}  # Endpoint name -> counters
+        self._lock = threading.Lock()
+        _fork_sensitive.add(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}  # Those were the parent's requests
+
+    @property
+    def hooks(self):
+        """
+        The hooks that feed events to this, as Giphy's `hooks` takes them
+        """
+        return {
+            'request_end': self._request_end,
+            'retry': self._retry,
+            'cache_hit': self._cache_hit,
+            'cache_miss': self._cache_miss,
+            'page': self._page,
+        }
+
+    def _counters(self, endpoint):
+        """
+        Returns the counters for `endpoint`. The lock must be held.
+        """
+        counters = self._endpoints.get(endpoint)
+        if counters is None:
+            counters = self._endpoints[endpoint] = {
+                'requests': 0,
+                'errors': 0,
+                'retries': 0,
+                'statuses': {},
+                'latency': [0] * (len(self.buckets) + 1),
+                'seconds': 0.0,
+                'decode_seconds': 0.0,
+                'bytes_in': 0,
+                'bytes_out': 0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'pages': 0,
+                'results': 0,
+                'build_seconds': 0.0,
+            }
+        return counters
+
+    def _request_end(self, info):
+        bucket = bisect.bisect_left(self.buckets, info['seconds'])
+        with self._lock:
+            counters = self._counters(info['endpoint'])
+            counters['requests'] += 1
+            if info['error'] is not None:
+                counters['errors'] += 1
+            if info['status'] is not None:
+                statuses = counters['statuses']
+                statuses[info['status']] = statuses.get(info['status'], 0) + 1
+            counters['latency'][bucket] += 1
+            counters['seconds'] += info['seconds']
+            counters['decode_seconds'] += info['decode_seconds']
+            counters['bytes_in'] += info['bytes_in']
+            counters['bytes_out'] += info['bytes_out']
+
+    def _retry(self, info):
+        with self._lock:
+            self._counters(info['endpoint'])['retries'] += 1
+
+    def _cache_hit(self, info):
+        with self._lock:
+            self._counters(info['endpoint'])['cache_hits'] += 1
+
+    def _cache_miss(self, info):
+        with self._lock:
+            self._counters(info['endpoint'])['cache_misses'] += 1
+
+    def _page(self, info):
+        with self._lock:
+            counters = self._counters(info['endpoint'])
+            counters['pages'] += 1
+            counters['results'] += info['results']
+            counters['build_seconds'] += info['build_seconds']
+
+    def snapshot(self, reset=False):
+        """
+        Returns the stats so far as a dict of endpoint name to its counters,
+        made of plain numbers, dicts and lists that can be exported as they
+        are. `latency` is a list of [upper bound, count] pairs, the last of
+        which has a bound of None. With `reset`, counting starts over, so
+        that each snapshot covers the time since the one before.
+
+        :param reset: Whether to start counting over
+        :type reset: boolean
+        """
+        bounds = self.buckets + (None,)
+        with self._lock:
+            endpoints = self._endpoints
+            if reset:
+                self._endpoints = {}
+
+            snapshot = {}
+            for endpoint, counters in endpoints.items():
+                counters = dict(counters)
+                counters['statuses'] = dict(counters['statuses'])
+                counters['latency'] = [[bound, count] for bound, count in
+                                       zip(bounds, counters['latency'])]
+                snapshot[endpoint] = counters
+        return snapshot
+
+
+_default_downloader = None
+_default_downloader_lock = threading.Lock()
+
+
+def _downloader():
+    """
+    Returns the client used to download images when none is given
+    """
+    global _default_downloader
+    with _default_downloader_lock:
+        if _default_downloader is None:
+            # Media downloads don't need an api key
+            _default_downloader = Giphy(api_key=None)
+        return _default_downloader
+
+
+def _download_target(image, rendition, dest):
+    """
+    Returns the url, local path and expected size (or None) of the file
+    `image` has for `rendition`, to be saved at or in `dest`
+    """
+    if rendition not in _RENDITION_ATTRS:
+        raise ValueError('Unknown rendition: %s' % rendition)
+
+    attr, subattr = _RENDITION_ATTRS[rendition]
+    data = getattr(image, attr, None)
+    if data is not None and subattr is not None:
+        data = getattr(data, subattr, None)
+
+    url = getattr(data, 'url', None)
+    if not url:
+        raise GiphyApiException("GIF '%s' has no %s rendition" %
+                                (image.id, rendition))
+
+    if os.path.isdir(dest):
+        ext = os.path.splitext(urlparse(url).path)[1] or '.gif'
+        dest = os.path.join(dest, '%s-%s%s' % (image.id, rendition, ext))
+
+    size = getattr(data, 'size', None)
+    return url, dest, size if isinstance(size, int) else None
+
+
+def _finish_download(part, path, size):
+    """
+    Moves a finished download from `part` to `path`, unless it isn't the
+    `size` expected, in which case it's thrown away
+    """
+    actual = os.path.getsize(part)
+    if size is not None and actual != size:
+        os.remove(part)
+        raise GiphyDownloadException(
+            'Downloaded %d bytes for %s, expected %d' % (actual, path, size))
+
+    _replace(part, path)
+    return path
+
+
+def _size_left(f):
+    """
+    Returns the number of bytes left to read from file-like `f`, or None if
+    that can't be told
+    """
+    try:
+        return os.fstat(f.fileno()).st_size - f.tell()
+    except (AttributeError, EnvironmentError, ValueError):
+        pass
+
+    try:
+        position = f.tell()
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        f.seek(position)
+        return end - position
+    except (AttributeError, EnvironmentError, ValueError):
+        return None
+
+
+class _MultipartBody(object):
+
+    """
+    A multipart/form-data request body for a single file field, which is read
+    and sent UPLOAD_CHUNK_SIZE bytes at a time so that uploads take the same
+    memory however big the file. The file can be a path, a binary file-like
+    object, or an iterable of bytes. Bytes are taken for a path, as they are
+    on Python 2, so wrap contents already in memory in io.BytesIO.
+
+    If the file's size can be told, the body has a length and is sent with
+    a Content-Length header; otherwise it is sent chunked. `progress`, if
+    given, is called with the number of bytes of the file sent so far and
+    its size (or None) as each chunk goes out. Use it as a context manager
+    to close a file it opened from a path.
+    """
+
+    def __init__(self, name, source, filename=None, progress=None):
+        self.progress = progress
+        self.sent = 0  # Bytes of the whole body sent so far
+        self._opened = None
+
+        if isinstance(source, basestring) or hasattr(source, '__fspath__'):
+            self._opened = open(source, 'rb')
+            self.size = _size_left(self._opened)
+            self._chunks = iter(partial(self._opened.read, UPLOAD_CHUNK_SIZE),
+                                b'')
+            filename = filename or source
+        elif hasattr(source, 'read'):
+            self.size = _size_left(source)
+            self._chunks = iter(partial(source.read, UPLOAD_CHUNK_SIZE), b'')
+            filename = filename or getattr(source, 'name', None)
+        else:
+            self.size = None
+            self._chunks = iter(source)
+
+        if isinstance(filename, basestring) or hasattr(filename,
+                                                       '__fspath__'):
+            filename = os.path.basename(filename)
+            if isinstance(filename, bytes):
+                filename = filename.decode('utf-8', 'replace')
+        else:
+            filename = 'file'
+
+        content_type = (mimetypes.guess_type(filename)[0] or
+                        'application/octet-stream')
+        self.boundary = hashlib.md5(os.urandom(16)).hexdigest()
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self._head = ('--%s\r\n'
+                      'Content-Disposition: form-data; name="%s"; '
+                      'filename="%s"\r\n'
+                      'Content-Type: %s\r\n\r\n' %
+                      (self.boundary, name, filename.replace('"', '%22'),
+                       content_type)).encode('utf-8')
+        self._tail = ('\r\n--%s--\r\n' % self.boundary).encode('utf-8')
+
+    @property
+    def len(self):
+        """
+        The length of the body, which requests sends as its Content-Length.
+        Missing if the size of the file isn't known.
+        """
+        if self.size is None:
+            raise AttributeError('The size of the file is unknown')
+        return len(self._head) + self.size + len(self._tail)
+
+    def __iter__(self):
+        yield self._head
+        self.sent += len(self._head)
+
+        sent = 0
+        for chunk in self._chunks:
+            if not chunk:
+                continue
+            yield chunk
+            sent += len(chunk)
+            self.sent += len(chunk)
+            if self.progress is not None:
+                self.progress(sent, self.size)
+
+        yield self._tail
+        self.sent += len(self._tail)
+
+    def close(self):
+        if self._opened is not None:
+            self._opened.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Giphy(object):
+
+    """
+    A python wrapper around the Giphy api. You should supply your own api
+    key when using this class, but it will default to Giphy's public api
+    key for testing. Note, that this might go away in the future, so don't
+    use this for anything outside of testing/playing with the api.
+
+    You can also supply a `strict` flag that will raise an exception if any
+    api method does not return a result. Note that individual api methods
+    also accept this flag if you would like more control over this behavior.
+
+    Each instance keeps its own pool of keep-alive HTTP connections, so
+    paging through results reuses sockets rather than opening a new one per
+    request. The pool can be tuned with `pool_connections` (number of hosts
+    to keep pools for), `pool_maxsize` (connections kept per host) and
+    `pool_block` (whether to wait for a free connection rather than opening
+    a throwaway one once `pool_maxsize` is reached). Call `close` or use the
+    instance as a context manager to release the connections.
+
+    Api responses can be cached by passing a `cache`, such as a MemoryCache
+    or FileCache. How long responses stay cached depends on the endpoint;
+    see DEFAULT_CACHE_TTLS. Any of these can be overridden with `cache_ttls`,
+    a dict of endpoint name to seconds. Responses are never kept longer than
+    their Cache-Control or Expires headers allow, and are not stored at all
+    if marked no-store. Once stale, responses with an ETag or Last-Modified
+    header are revalidated with a conditional request, and reused if the
+    api answers 304 Not Modified.
+
+    Pass `lazy=True` to get results as LazyGiphyImage objects, which only
+    convert the renditions you actually use, or `compact=True` to get them
+    as CompactGiphyImage objects, which take far less memory. Compact
+    results only keep the raw api response if `keep_raw` is set.
+
+    If you only use some renditions of each image, name them in
+    `renditions` (see RENDITIONS) and only those will be converted and
+    kept. Query methods also accept `renditions` to override this per call.
+    Giphy can also leave renditions out of its responses if you ask for one
+    of its rendition `bundle`s, such as 'low_bandwidth'.
+
+    Responses are decoded with DEFAULT_JSON_DECODER, or `json_decoder` if
+    given: a function taking the response body as bytes.
+
+    `search` and `trending` size each page to the results still wanted, up
+    to MAX_PAGE_SIZE. Set `page_size` to request fixed size pages instead.
+
+    Set `rate_limit` to a number of requests per second to keep under your
+    api key's quota. Every instance using the same key shares one limiter,
+    which also slows down as the api's rate limit headers ask, and retries
+    requests that get 429 Too Many Requests. A RateLimiter of your own can
+    be passed instead.
+
+    Requests give up on connecting to the api after the first of the
+    `timeout` seconds, and on each read from it after the second; a single
+    number sets both. Requests that fail with a server error, a connection
+    error or a timeout are retried up to `retries` times, waiting a little
+    longer each time. Query methods accept a `deadline`, in seconds, within
+    which the whole call must finish, including every page of `search` and
+    `trending`; the instance's `deadline` is used for calls without one.
+    GiphyTimeoutException is raised once it passes. Pass a CircuitBreaker as
+    `circuit_breaker` to stop calling the api for a while once it is down.
+
+    Set `reservoir` to have `screensaver` (`random_gif`) hand out random
+    gifs from a reservoir kept for each tag, rather than asking the api
+    while you wait. Once a tag's reservoir is down to `reservoir_low`
+    results (half of `reservoir` by default), it is topped back up to
+    `reservoir` in the background. The first call for a tag asks the api
+    as usual while its reservoir fills.
+
+    Pass a LocalIndex as `local_index` to save every result of `search`,
+    `trending`, `translate`, `gif` and `gifs` to it. With the default
+    `local_mode` of 'first', `search`, `trending`, `gif` and `gifs` are
+    answered from it, without calling the api, when it has every result
+    wanted from the last `local_max_age` seconds, or, for `trending`, from
+    no longer ago than its cache TTL. With 'offline', the api is
+    never called: searches the index doesn't have the results of fall back
+    to a full-text search of everything stored, `translate` to its best
+    match, and gifs are looked up however long ago they were stored. Other
+    calls raise GiphyApiException. With 'store', results are saved but
+    never used. `warm` fills an index with the results of many searches.
+
+    Identical calls made at the same time, from any thread or Giphy instance
+    using the same api key, cache and local index and without hooks of its
+    own, share a single request to the api and all get its result or its
+    error, unless `coalesce` is False. Calls to random
+    endpoints such as `screensaver` are never shared. A call waiting on
+    another's request still gives up at its own `deadline`.
+
+    Pass `hooks`, a dict of event name (see HOOK_EVENTS) to a function or
+    list of functions, to be told as calls to the api start and end, are
+    retried, and hit or miss the cache, and as each page of results has been
+    yielded. Hooks are called with a dict of details, including how long
+    requests took and how much of that went on decoding responses and
+    building results. Set `collect_stats` to aggregate them into `stats`, or
+    pass a Stats of your own to share one between instances. Without either,
+    calls pay next to nothing for them.
+
+    An instance can be shared by any number of threads. Its settings can't
+    be changed once it is created (pass `strict` to a call rather than
+    changing it for everyone), all threads share its connection pool, and
+    each call returns results of its own. The raw api data behind results
+    may be shared with the cache and other calls, so treat `raw_data` as
+    read-only. Set `pool_maxsize` to the number of threads making requests
+    at once, so that connections aren't opened and thrown away.
+    """
+
+    # Settings that can't be changed once an instance is created, so that
+    # it can be shared between threads
+    _settings = frozenset((
+        'api_key', 'strict', 'pool_connections', 'pool_maxsize', 'pool_block',
+        'cache', 'cache_ttls', 'lazy', 'compact', 'keep_raw', 'renditions',
+        'bundle', 'json_decoder', 'page_size', 'rate_limiter', 'timeout',
+        'retries', 'deadline', 'circuit_breaker', 'coalesce', 'local_index',
+        'local_mode', 'local_max_age', 'reservoir', 'reservoir_low', 'hooks',
+        'stats_collector'))
+
+    def __init__(self, api_key=GIPHY_PUBLIC_KEY, strict=False,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 cache=None, cache_ttls=None, lazy=False, compact=False,
+                 keep_raw=False, renditions=None, bundle=None,
+                 json_decoder=None, page_size=None, rate_limit=None,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES,
+                 deadline=None, circuit_breaker=None, coalesce=True,
+                 local_index=None, local_mode='first',
+                 local_max_age=LOCAL_MAX_AGE, reservoir=0,
+                 reservoir_low=None, hooks=None, collect_stats=False):
+        # Warn if using public key
+        if api_key == GIPHY_PUBLIC_KEY:
+            warnings.warn('You are using the giphy public api key. This '
+                          'should be used for testing only and may be '
+                          'deactivated in the future. See '
+                          'https://github.com/Giphy/GiphyAPI.')
+
+        self.api_key = api_key
+        self.strict = strict
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        self.cache = cache
+        self.cache_ttls = dict(DEFAULT_CACHE_TTLS, **(cache_ttls or {}))
+
+        self.lazy = lazy
+        self.compact = compact
+        self.keep_raw = keep_raw
+        self.renditions = self._check_renditions(renditions)
+        self.bundle = bundle
+        self.json_decoder = json_decoder
+        self.page_size = self._check_page_size(page_size)
+
+        if rate_limit is None or isinstance(rate_limit, RateLimiter):
+            self.rate_limiter = rate_limit
+        else:
+            self.rate_limiter = rate_limiter(api_key, rate_limit)
+
+        self.timeout = timeout
+        self.retries = retries
+        self.deadline = deadline
+        self.circuit_breaker = circuit_breaker
+        self.coalesce = coalesce
+
+        if local_mode not in LOCAL_MODES:
+            raise ValueError('local_mode must be one of: %s' %
+                             ', '.join(LOCAL_MODES))
+        self.local_index = local_index
+        self.local_mode = local_mode
+        self.local_max_age = local_max_age
+
+        if reservoir_low is None:
+            reservoir_low = reservoir // 2
+        if reservoir and not 0 <= reservoir_low < reservoir:
+            raise ValueError('reservoir_low must be less than reservoir')
+        self.reservoir = reservoir
+        self.reservoir_low = reservoir_low
+        self._reservoirs = {}  # Tag -> _Reservoir
+        self._reservoirs_lock = threading.Lock()
+        self._refiller = None
+
+        if collect_stats is True:
+            collect_stats = Stats()
+        self.hooks = hooks
+        self.stats_collector = collect_stats or None
+        self._hooks = self._hook_table()
+
+        _fork_sensitive.add(self)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if name in self._settings and self.__dict__.get('_frozen'):
+            raise AttributeError("Giphy settings can't be changed once it is "
+                                 "created: '%s'" % name)
+        object.__setattr__(self, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def session(self):
+        """
+        The pooled `requests.Session` used for api calls, created on first use
+        and shared by every thread
+        """
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._make_session()
+                session = self._session
+        return session
+
+    def _after_fork(self):
+        """
+        Drops the connection pool and reservoir refills inherited from the
+        parent process, so that the child makes its own
+        """
+        # Not closed, as the parent may still be using the connections
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._refiller = None
+        self._reservoirs_lock = threading.Lock()
+        for reservoir in self._reservoirs.values():
+            reservoir.lock = threading.Lock()
+            reservoir.filling = False
+
+    def _make_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            pool_block=self.pool_block)
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    def close(self):
+        """
+        Closes any pooled connections. The instance can still be used
+        afterwards; a new pool will be created on the next request
+        """
+        with self._reservoirs_lock:
+            refiller, self._refiller = self._refiller, None
+        if refiller is not None:
+            refiller.shutdown(wait=False)
+
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def _endpoint(self, name):
+        # The bare endpoint looks up gifs by id
+        if not name:
+            return GIPHY_API_ENDPOINT
+        return '/'.join((GIPHY_API_ENDPOINT, name))
+
+    def _check_renditions(self, renditions):
+        """
+        Validates a collection of rendition names, returning it as a set
+        """
+        if renditions is None:
+            return None
+
+        renditions = frozenset(renditions)
+        unknown = renditions.difference(RENDITIONS)
+        if unknown:
+            raise ValueError('Unknown renditions: %s' %
+                             ', '.join(sorted(unknown)))
+
+        return renditions
+
+    def _image(self, data, renditions=None):
+        """
+        Wraps a single result from the api, with the renditions wanted for
+        this call or, failing that, for this instance
+        """
+        if renditions is None:
+            renditions = self.renditions
+
+        if self.compact:
+            return CompactGiphyImage(data, keep_raw=self.keep_raw,
+                                     renditions=renditions)
+        if self.lazy:
+            return LazyGiphyImage(data, renditions)
+        return GiphyImage(data, renditions)
+
+    def _decode(self, body):
+        """
+        Decodes a JSON response body
+        """
+        return (self.json_decoder or DEFAULT_JSON_DECODER)(body)
+
+    def _decode_body(self, body, call):
+        """
+        Decodes a whole response body, counting its size and the time taken
+        towards `call`, if it is instrumented
+        """
+        if call is None:
+            return self._decode(body)
+
+        call['bytes_in'] += len(body)
+        start = _clock()
+        try:
+            return self._decode(body)
+        finally:
+            call['decode_seconds'] += _clock() - start
+
+    def _hook_table(self):
+        """
+        Returns `hooks`, and those of the stats collector, as a dict of event
+        name to a tuple of functions, or None if there are none at all, so
+        that calls only have to check that to skip instrumenting themselves
+        """
+        sources = [self.hooks or {}]
+        if self.stats_collector is not None:
+            sources.append(self.stats_collector.hooks)
+
+        table = {}
+        for hooks in sources:
+            for event, funcs in hooks.items():
+                if event not in HOOK_EVENTS:
+                    raise ValueError('Unknown hook event: %s' % event)
+                if callable(funcs):
+                    funcs = (funcs,)
+                table[event] = table.get(event, ()) + tuple(funcs)
+
+        return table or None
+
+    def _emit(self, event, info):
+        for hook in self._hooks.get(event, ()):
+            hook(info)
+
+    def _call_start(self, endpoint_name, url, params, method='get'):
+        """
+        Reports a call to the api starting to `request_start` hooks. Returns
+        the details of the call for `_request` and the like to fill in, and
+        for `_call_end` to report, or None if this instance has no hooks.
+        """
+        if self._hooks is None:
+            return None
+
+        call = {
+            'endpoint': _metric_endpoint(endpoint_name),
+            'method': method,
+            'url': url,
+            'params': dict(item for item in params.items()
+                           if item[0] != 'api_key'),
+            'start': _clock(),
+            'status': None,
+            'attempts': 0,
+            'bytes_in': 0,
+            'bytes_out': 0,
+            'decode_seconds': 0.0,
+        }
+        self._emit('request_start', dict(call))
+        return call
+
+    def _call_end(self, call, error=None):
+        """
+        Reports a call started by `_call_start` to `request_end` hooks, with
+        the error it raised, if any
+        """
+        if call is not None:
+            self._emit('request_end', dict(call, error=error,
+                                           seconds=_clock() - call['start']))
+
+    def _retried(self, call, delay, status=None, error=None):
+        """
+        Reports to `retry` hooks that `call` is to be tried again in `delay`
+        seconds, after failing with `status` or `error`
+        """
+        self._emit('retry', {'endpoint': call['endpoint'],
+                             'attempt': call['attempts'], 'delay': delay,
+                             'status': status, 'error': error})
+
+    def stats(self, reset=False):
+        """
+        Returns the stats collected for this instance by endpoint, as
+        described by `Stats.snapshot`. Only available with `collect_stats`.
+
+        :param reset: Whether to start counting over
+        :type reset: boolean
+        """
+        if self.stats_collector is None:
+            raise ValueError('Stats are only collected with collect_stats')
+        return self.stats_collector.snapshot(reset)
+
+    def _deadline(self, seconds):
+        """
+        Returns the clock time by which a call allowed `seconds`, or else
+        this instance's `deadline`, must finish, or None if it has no limit
+        """
+        if seconds is None:
+            seconds = self.deadline
+        if seconds is None:
+            return None
+        return _clock() + seconds
+
+    def _remaining(self, deadline):
+        """
+        Returns the seconds left until `deadline`, to pass it on to another
+        public method
+        """
+        if deadline is None:
+            return None
+        return max(deadline - _clock(), 0)
+
+    def _timeout(self, deadline):
+        """
+        Returns the (connect, read) timeouts for the next request, cut short
+        so as not to run past `deadline`
+        """
+        timeout = self.timeout
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+
+        if deadline is not None:
+            remaining = deadline - _clock()
+            if remaining <= 0:
+                raise GiphyTimeoutException('Deadline exceeded')
+            timeout = tuple(remaining if t is None else min(t, remaining)
+                            for t in timeout)
+
+        return timeout
+
+    def _retry_delay(self, retry, failures, deadline):
+        """
+        Returns how long to wait before retrying a request that has failed
+        `failures` times already, with full jitter, or None if it shouldn't
+        be retried or the wait would run past `deadline`
+        """
+        if not retry or failures >= self.retries:
+            return None
+
+        delay = random.uniform(0, min(RETRY_BACKOFF_MAX,
+                                      RETRY_BACKOFF * 2 ** failures))
+        if deadline is not None and _clock() + delay >= deadline:
+            return None
+        return delay
+
+    def _limiter_wait(self, limiter, deadline):
+        """
+        Reserves the next request with the rate limiter, returning how many
+        seconds to wait before making it. Raises GiphyTimeoutException if
+        that would run past `deadline`.
+        """
+        wait = limiter.reserve()
+        if wait and deadline is not None and _clock() + wait >= deadline:
+            raise GiphyTimeoutException('Deadline exceeded')
+        return wait
+
+    def _request(self, method, url, retry=True, deadline=None, call=None,
+                 **kwargs):
+        """
+        Makes a request with the session. Requests wait for the rate limiter
+        and check the circuit breaker, if there are any, and time out as set
+        by `timeout` and `deadline`, giving up rather than waiting for the
+        rate limiter past `deadline`. Attempts, statuses and retries are
+        recorded in `call`, if it is instrumented.
+
+        Unless `retry` is False, requests that fail with one of
+        RETRY_STATUSES, a connection error or a timeout are retried up to
+        `retries` times with jittered exponential backoff, and rate limited
+        requests that get a 429 Too Many Requests response are retried up to
+        RATE_LIMIT_RETRIES times.
+        """
+        send = getattr(self.session, method)
+        limiter, breaker = self.rate_limiter, self.circuit_breaker
+        if breaker is not None:
+            breaker.before()
+
+        failures = throttled = 0
+        success = None
+        try:
+            while True:
+                try:
+                    if limiter is not None:
+                        wait = self._limiter_wait(limiter, deadline)
+                        if wait:
+                            time.sleep(wait)
+
+                    # Only once the limiter lets the request go
+                    kwargs['timeout'] = self._timeout(deadline)
+                    if call is not None:
+                        call['attempts'] += 1
+                    resp = send(url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    status, error = None, e
+                    if limiter is not None:
+                        limiter.update({})
+
+                    delay = self._retry_delay(retry, failures, deadline)
+                    if delay is None:
+                        success = False
+                        if deadline is not None and _clock() >= deadline:
+                            raise GiphyTimeoutException('Deadline exceeded')
+                        raise
+                except BaseException:
+                    # The request won't be answered, so stop counting it
+                    if limiter is not None:
+                        limiter.update({})
+                    raise
+                else:
+                    status, error = resp.status_code, None
+                    if call is not None:
+                        call['status'] = status
+                    if limiter is not None:
+                        limiter.update(resp.headers, status)
+
+                    if (status == 429 and limiter is not None and
+                            retry and throttled < RATE_LIMIT_RETRIES):
+                        throttled += 1
+                        resp.close()
+                        if call is not None:
+                            self._retried(call, None, status)
+                        continue
+
+                    if resp.status_code not in RETRY_STATUSES:
+                        success = True
+                        return resp
+
+                    delay = self._retry_delay(retry, failures, deadline)
+                    if delay is None:
+                        success = False
+                        return resp
+                    resp.close()
+
+                if call is not None:
+                    self._retried(call, delay, status, error)
+                failures += 1
+                time.sleep(delay)
+        finally:
+            if breaker is not None:
+                breaker.record(success)
+
+    def _check_or_raise(self, meta):
+        if meta.get('status') != 200:
+            raise GiphyApiException(meta.get('error_message'))
+
+    def _query_params(self, key, term, phrase, rating):
+        """
+        Builds the params for a term or phrase query, stored under `key`
+        """
+        assert any((term, phrase)), 'You must supply a term or phrase to search'
+
+        # Phrases should have dashes and not spaces
+        if phrase:
+            phrase = phrase.replace(' ', '-')
+
+        params = {key: (term or phrase)}
+        if rating:
+            params.update({'rating': rating})
+
+        return params
 
-    def __repr__(self):
-        return '%s<%s> at %s' % (self.__class__.__name__, self.id, self.url)
+    def _cache_key(self, endpoint_name, params):
+        """
+        Returns the cache key for a request, or None if it shouldn't be
+        cached. Keys don't include the api key.
+        """
+        if self.cache is None or not self._cache_ttl(endpoint_name):
+            return None
 
-    def __str__(self):
-        return self.url
+        # Escaped, so that values can't pass for other params
+        query = urlencode(sorted(item for item in params.items()
+                                 if item[0] != 'api_key'))
+        return '%s?%s' % (endpoint_name, query)
 
-    __unicode__ = __str__
+    def _cache_ttl(self, endpoint_name):
+        return self.cache_ttls.get(endpoint_name, self.cache_ttls['gif'])
 
-    def open(self):
+    def _cache_get(self, key, endpoint_name):
         """
-        Opens the giphy url in a web browser
+        Returns a tuple of the cached entry for `key` (or None) and whether
+        it is still fresh
         """
-        # Imported here because this method is MAGIC
-        import webbrowser
-        webbrowser.open(self.url)
+        entry = self.cache.get(key)
+        fresh = entry is not None and entry['fresh_until'] > time.time()
 
-    @property
-    def media_url(self):
+        if fresh:
+            self.cache.record('hits')
+
+        if self._hooks is not None:
+            info = {'endpoint': _metric_endpoint(endpoint_name), 'key': key}
+            if fresh:
+                self._emit('cache_hit', info)
+            else:
+                info['stale'] = entry is not None
+                self._emit('cache_miss', info)
+
+        return entry, fresh
+
+    def _flight_key(self, endpoint_name, params):
         """
-        The media URL of the gif at its original size
+        Returns the key identical concurrent requests share a flight under,
+        or None if they shouldn't. Only the request's maker caches, indexes
+        and reports it, so instances with a different cache, local index or
+        hooks never share one.
         """
-        return self.original.url
+        if not self.coalesce or endpoint_name in UNCOALESCED_ENDPOINTS:
+            return None
+        return (self.api_key, id(self.cache), id(self.local_index),
+                id(self._hooks), endpoint_name,
+                tuple(sorted(params.items())))
 
-    @property
-    def frames(self):
+    def _coalesced(self, key, call, deadline):
         """
-        The number of frames of the gif
+        Returns the result of `call`, unless an identical one is already in
+        flight under `key`, in which case its result is waited for until
+        `deadline` instead
         """
-        return self.original.frames
+        with _flights_lock:
+            flight = _flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _flights[key] = _Flight()
 
-    @property
-    def width(self):
+        if leader:
+            try:
+                flight.result = call()
+            except BaseException as e:
+                # Even an interrupt, so the callers waiting don't go on
+                # without a result
+                flight.error = e
+                raise
+            finally:
+                with _flights_lock:
+                    del _flights[key]
+                flight.done.set()
+            return flight.result
+
+        if not flight.done.wait(self._remaining(deadline)):
+            raise GiphyTimeoutException('Deadline exceeded')
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def _conditional_headers(self, entry):
         """
-        The width of the gif at its original size
+        Request headers to revalidate a stale cache entry
         """
-        return self.original.width
-
-    @property
-    def height(self):
+        headers = {}
+        if entry is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def _cache_set(self, key, endpoint_name, headers, data, revalidated):
         """
-        The height of the gif at its original size
+        Stores a response in the cache according to its headers. If the
+        response revalidated a stale entry, that entry is passed as
+        `revalidated`.
         """
-        return self.original.height
+        self.cache.record('revalidations' if revalidated else 'misses')
+
+        fresh = _freshness(headers, self._cache_ttl(endpoint_name))
+        if fresh is None:
+            self.cache.delete(key)
+            return
+
+        entry = {
+            'data': data,
+            'fresh_until': time.time() + fresh,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        }
 
-    @property
-    def filesize(self):
+        # A 304 needn't repeat the validators, which still hold if it doesn't
+        if revalidated:
+            for name in ('etag', 'last_modified'):
+                if not entry[name]:
+                    entry[name] = revalidated.get(name)
+
+        ttl = fresh
+        if entry['etag'] or entry['last_modified']:
+            ttl += CACHE_REVALIDATE_TTL
+
+        if ttl > 0:
+            self.cache.set(key, entry, ttl)
+
+    def _fetch(self, endpoint_name, deadline=None, **params):
         """
-        The size of the original size file in bytes
+        Wrapper for making an api request from giphy, which must finish by
+        the clock time `deadline`, if given
         """
-        return self.original.size
-
-    def _make_images(self, images):
+        self._check_online(endpoint_name)
+        if self.bundle:
+            params.setdefault('bundle', self.bundle)
+
+        key = self._cache_key(endpoint_name, params)
+        entry = None
+        if key is not None:
+            entry, fresh = self._cache_get(key, endpoint_name)
+            if fresh:
+                return entry['data']
+
+        flight = self._flight_key(endpoint_name, params)
+        get = partial(self._get, endpoint_name, params, key, entry, deadline)
+        if flight is None:
+            return get()
+        return self._coalesced(flight, get, deadline)
+
+    def _get(self, endpoint_name, params, key, entry, deadline):
         """
-        Takes an image dict from the giphy api and converts it to attributes.
-        Any fields expected to be int (width, height, size, frames) will be attempted
-        to be converted. Also, the keys of `data` serve as the attribute names, but
-        with special action taken. Keys are split by the last underscore; anything prior
-        becomes the attribute name, anything after becomes a sub-attribute. For example:
-        fixed_width_downsampled will end up at `self.fixed_width.downsampled`
-        """
-        # Order matters :)
-        process = ('original',
-                   'fixed_width',
-                   'fixed_height',
-                   'fixed_width_downsampled',
-                   'fixed_width_still',
-                   'fixed_height_downsampled',
-                   'fixed_height_still',
-                   'downsized')
-
-        for key in process:
-            data = images.get(key)
-
-            # Ignore empties
-            if not data:
-                continue
+        Requests an api response missing from the cache or stale in it,
+        caching it under `key`, if given
+        """
+        params = dict(params, api_key=self.api_key)
+        url = self._endpoint(endpoint_name)
+        call = self._call_start(endpoint_name, url, params)
 
-            parts = key.split('_')
+        error = None
+        try:
+            resp = self._request('get', url, deadline=deadline, call=call,
+                                 params=params,
+                                 headers=self._conditional_headers(entry))
 
-            # attr/subattr style
-            if len(parts) > 2:
-                attr, subattr = '_'.join(parts[:-1]), parts[-1]
+            revalidated = entry is not None and resp.status_code == 304
+            if revalidated:
+                data = entry['data']
             else:
-                attr, subattr = '_'.join(parts), None
+                resp.raise_for_status()
+                data = self._decode_body(resp.content, call)
+                self._check_or_raise(data.get('meta', {}))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        if key is not None:
+            self._cache_set(key, endpoint_name, resp.headers, data,
+                            entry if revalidated else None)
+        if self.local_index is not None:
+            self.local_index.store(endpoint_name, params, data)
 
-            # Normalize data
-            img = AttrDict(self._normalized(data))
+        return data
 
-            if subattr is None:
-                setattr(self, attr, img)
-            else:
-                setattr(getattr(self, attr), subattr, img)
+    def _local(self, endpoint_name, params, limit):
+        """
+        Returns the api results the local index answers a paged query with,
+        or None if the api should be asked
+        """
+        if self.local_index is None or self.local_mode == 'store':
+            return None
+
+        if self.bundle:
+            params = dict(params, bundle=self.bundle)
+
+        if self.local_mode == 'first':
+            max_age = self.local_max_age
+            if endpoint_name == 'trending':
+                max_age = min(max_age, self._cache_ttl(endpoint_name))
+            return self.local_index.results(endpoint_name, params, limit,
+                                            max_age)
+
+        results = self.local_index.results(endpoint_name, params, limit)
+        if results is None:
+            if endpoint_name != 'search':
+                return []
+            results = self.local_index.search(params['q'],
+                                              params.get('rating'), limit)
+        return results
+
+    def _local_gif(self, gif_id):
+        """
+        Returns the response the local index answers a lookup of `gif_id`
+        with, or None if the api should be asked
+        """
+        if self.local_index is None or self.local_mode == 'store':
+            return None
 
-    def _normalized(self, data):
+        if self.local_mode == 'offline':
+            return {'data': self.local_index.get(gif_id)}
+
+        data = self.local_index.get(gif_id, self.local_max_age)
+        return data and {'data': data}
+
+    def _local_translate(self, params):
         """
-        Does a normalization of sorts on image type data so that values
-        that should be integers are converted from strings
+        Returns the response the local index answers `translate` with when
+        offline, or None if the api should be asked
         """
-        int_keys = ('frames', 'width', 'height', 'size')
+        if self.local_index is None or self.local_mode != 'offline':
+            return None
 
-        for key in int_keys:
-            if key not in data:
-                continue
+        results = self.local_index.search(params['s'], params.get('rating'),
+                                          limit=1)
+        return {'data': results[0] if results else None}
 
-            try:
-                data[key] = int(data[key])
-            except ValueError:
-                pass  # Ignored
+    def _check_online(self, endpoint_name):
+        if self.local_index is not None and self.local_mode == 'offline':
+            raise GiphyApiException("'%s' can't be answered offline" %
+                                    endpoint_name)
 
-        return data
+    def _stream_members(self, pairs, members, items, call=None):
+        """
+        Decodes the raw (key, value) pairs split out by a _JSONStream,
+        checking `meta` as it arrives. Values are also collected into
+        `members` and `items`, if given, so that the response can be cached.
+        The time spent decoding is counted towards `call`, if instrumented.
+        """
+        for name, raw in pairs:
+            if call is None:
+                value = self._decode(raw)
+            else:
+                start = _clock()
+                value = self._decode(raw)
+                call['decode_seconds'] += _clock() - start
+            if name == 'meta':
+                self._check_or_raise(value)
 
+            if name is None:
+                if items is not None:
+                    items.append(value)
+            elif members is not None:
+                members[name] = value
 
-class Giphy(object):
+            yield name, value
 
-    """
-    A python wrapper around the Giphy api. You should supply your own api
-    key when using this class, but it will default to Giphy's public api
-    key for testing. Note, that this might go away in the future, so don't
-    use this for anything outside of testing/playing with the api.
+    def _replay_members(self, data):
+        """
+        Produces the same (key, value) pairs as `_stream_members` from an
+        already decoded response
+        """
+        for name, value in data.items():
+            if name == 'data' and isinstance(value, list):
+                for item in value:
+                    yield None, item
+            else:
+                yield name, value
 
-    You can also supply a `strict` flag that will raise an exception if any
-    api method does not return a result. Note that individual api methods
-    also accept this flag if you would like more control over this behavior.
-    """
+    def _fetch_stream(self, endpoint_name, deadline=None, **params):
+        """
+        Like `_fetch`, but generates the members of the response as they are
+        downloaded: each element of the `data` array as (None, item), then
+        every other member as (key, value). Responses from the cache are
+        replayed the same way.
+        """
+        self._check_online(endpoint_name)
+        if self.bundle:
+            params.setdefault('bundle', self.bundle)
+
+        key = self._cache_key(endpoint_name, params)
+        entry = None
+        if key is not None:
+            entry, fresh = self._cache_get(key, endpoint_name)
+            if fresh:
+                for pair in self._replay_members(entry['data']):
+                    yield pair
+                return
 
-    def __init__(self, api_key=GIPHY_PUBLIC_KEY, strict=False):
-        # Warn if using public key
-        if api_key == GIPHY_PUBLIC_KEY:
-            warnings.warn('You are using the giphy public api key. This '
-                          'should be used for testing only and may be '
-                          'deactivated in the future. See '
-                          'https://github.com/Giphy/GiphyAPI.')
+        params['api_key'] = self.api_key
+        url = self._endpoint(endpoint_name)
+        call = self._call_start(endpoint_name, url, params)
 
-        self.api_key = api_key
-        self.strict = strict
+        error = None
+        try:
+            resp = self._request('get', url, deadline=deadline, call=call,
+                                 params=params,
+                                 headers=self._conditional_headers(entry),
+                                 stream=True)
+            try:
+                revalidated = entry is not None and resp.status_code == 304
+                if revalidated:
+                    data = entry['data']
+                    for pair in self._replay_members(data):
+                        yield pair
+                else:
+                    resp.raise_for_status()
+
+                    # Only hold on to the whole response if it's to be kept
+                    keep = key is not None or self.local_index is not None
+                    members, items = ({}, []) if keep else (None, None)
+                    parser = _JSONStream()
+                    for chunk in resp.iter_content(STREAM_CHUNK_SIZE):
+                        if call is not None:
+                            call['bytes_in'] += len(chunk)
+                        for pair in self._stream_members(parser.feed(chunk),
+                                                         members, items,
+                                                         call):
+                            yield pair
+
+                    if not parser.done:
+                        raise GiphyApiException(
+                            'Incomplete response from giphy')
+
+                    if keep:
+                        data = dict(members)
+                        data.setdefault('data', items)
+            finally:
+                resp.close()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        if key is not None:
+            self._cache_set(key, endpoint_name, resp.headers, data,
+                            entry if revalidated else None)
+        if self.local_index is not None:
+            self.local_index.store(endpoint_name, params, data)
+
+    def _paginate_stream(self, endpoint_name, params, limit, renditions=None,
+                         page_size=None, deadline=None):
+        """
+        Generates GiphyImage results from a paged endpoint like `_paginate`,
+        but parses each page as it downloads, so that results are yielded
+        as soon as they arrive rather than once the whole page is in
+        """
+        results_yielded = 0  # Count how many things we yield
+        page = 0  # Offset of the next page to request
 
-    def _endpoint(self, name):
-        return '/'.join((GIPHY_API_ENDPOINT, name))
+        while True:
+            count, total = 0, None
+            per_page = self._page_size(page, limit, page_size)
+            built = self._page_start(endpoint_name, page)
+            try:
+                for name, value in self._fetch_stream(endpoint_name,
+                                                      deadline=deadline,
+                                                      offset=page,
+                                                      limit=per_page,
+                                                      **params):
+                    if name is None:
+                        count += 1
+                        results_yielded += 1
+                        yield self._build(value, renditions, built)
+
+                        if limit is not None and results_yielded >= limit:
+                            return
+                    elif name == 'pagination':
+                        total = value['total_count']
+            finally:
+                self._page_end(built)
+
+            page += count
+
+            # Guard for empty results, then check for more items
+            if not count or total is None or page >= total:
+                return
+
+    def _page_start(self, endpoint_name, offset):
+        """
+        Returns the details of the page of results starting at `offset` for
+        `_build` to fill in and `_page_end` to report, or None if this
+        instance has no hooks
+        """
+        if self._hooks is None:
+            return None
+        return {'endpoint': _metric_endpoint(endpoint_name), 'offset': offset,
+                'results': 0, 'build_seconds': 0.0}
 
-    def _check_or_raise(self, meta):
-        if meta.get('status') != 200:
-            raise GiphyApiException(meta.get('error_message'))
+    def _build(self, item, renditions, page):
+        """
+        Makes an api result into an image with `_image`, counting it and the
+        time taken towards `page`, if it is instrumented
+        """
+        if page is None:
+            return self._image(item, renditions)
 
-    def _fetch(self, endpoint_name, **params):
+        start = _clock()
+        image = self._image(item, renditions)
+        page['build_seconds'] += _clock() - start
+        page['results'] += 1
+        return image
+
+    def _page_end(self, page):
         """
-        Wrapper for making an api request from giphy
+        Reports a page started by `_page_start` to `page` hooks, once its
+        results have all been yielded or the caller has stopped early
         """
-        params['api_key'] = self.api_key
+        if page is not None:
+            self._emit('page', page)
 
-        resp = requests.get(self._endpoint(endpoint_name), params=params)
-        resp.raise_for_status()
+    def _page_size(self, offset, limit, page_size=None, maximum=None):
+        """
+        Returns how many results to ask for in the page starting at `offset`:
+        just enough to reach `limit`, but no more than MAX_PAGE_SIZE. A
+        `page_size` given for the call, or else for this instance, is used
+        instead. Either way, no more than `maximum` are asked for, if given;
+        this is the most the api has returned in one page so far.
+        """
+        size = page_size or self.page_size
+        if not size:
+            size = MAX_PAGE_SIZE
+            if limit is not None:
+                size = max(1, min(size, limit - offset))
+
+        if maximum:
+            size = min(size, maximum)
+        return size
+
+    def _paginate(self, endpoint_name, params, limit, prefetch=0, parallel=0,
+                  renditions=None, page_size=None, deadline=None):
+        """
+        Generates GiphyImage results from a paged endpoint until we 1) run out
+        of pages 2) reach a limit. With `prefetch`, up to that many of the
+        following pages are requested from a thread pool while the current
+        page is consumed. With `parallel`, every remaining page is requested
+        as soon as the first page reveals the total count, at most `parallel`
+        at a time. Either way results come out in offset order, and requests
+        not yet started are cancelled once the generator finishes or is
+        closed. Pages are sized by `_page_size`, and all of them must be
+        fetched by the clock time `deadline`, if given.
+        """
+        results_yielded = 0  # Count how many things we yield
+        fetch = partial(self._fetch, endpoint_name, deadline=deadline,
+                        **params)
+        size = partial(self._page_size, limit=limit, page_size=page_size)
 
-        data = resp.json()
-        self._check_or_raise(data.get('meta', {}))
+        workers = parallel or prefetch
+        window = None if parallel else prefetch  # None for no bound
+        executor = ThreadPoolExecutor(workers) if workers else None
+        pending = deque()  # Prefetched pages, in offset order
 
-        return data
+        try:
+            per_page = size(0)
+            data = fetch(offset=0, limit=per_page)
+            offset = 0  # Offset of the page being yielded
+            page = len(data['data'])  # Offset of the next page to request
+
+            # The api may return fewer results per page than were asked for,
+            # so never ask for more than that again, or pages requested ahead
+            # would leave gaps
+            if 0 < page < per_page:
+                size = partial(size, maximum=page)
+
+            while True:
+                # Guard for empty results
+                if not data['data']:
+                    return
+
+                total = data['pagination']['total_count']
+                if limit is not None:
+                    total = min(total, limit)
+
+                # Top up the lookahead window
+                while (executor and page < total and
+                       (window is None or len(pending) < window)):
+                    per_page = size(page)
+                    pending.append(executor.submit(fetch, offset=page,
+                                                   limit=per_page))
+                    page += per_page
+
+                built = self._page_start(endpoint_name, offset)
+                try:
+                    for item in data['data']:
+                        results_yielded += 1
+                        yield self._build(item, renditions, built)
+
+                        if limit is not None and results_yielded >= limit:
+                            return
+                finally:
+                    self._page_end(built)
+
+                # Check whether or not there are more items
+                offset += len(data['data'])
+                if pending:
+                    data = pending.popleft().result()
+                elif page < total:
+                    data = fetch(offset=page, limit=size(page))
+                    page += len(data['data'])
+                else:
+                    return
+        finally:
+            if executor is not None:
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=False)
+
+    def _check_page_size(self, page_size):
+        if page_size is not None and page_size < 1:
+            raise ValueError('page_size must be at least 1')
+        return page_size
+
+    def _paged(self, endpoint_name, params, limit, prefetch, parallel,
+               renditions, stream, page_size, deadline):
+        """
+        Validates the paging options shared by `search` and `trending` and
+        returns the matching results generator. The deadline starts now,
+        rather than when the generator is first used.
+        """
+        renditions = self._check_renditions(renditions)
+        page_size = self._check_page_size(page_size)
+        deadline = self._deadline(deadline)
+        if stream and (prefetch or parallel):
+            raise ValueError('stream cannot be combined with prefetch or '
+                             'parallel')
+
+        local = self._local(endpoint_name, params, limit)
+        if local is not None:
+            return (self._image(item, renditions) for item in local)
+
+        if not stream:
+            return self._paginate(endpoint_name, params, limit,
+                                  prefetch=prefetch, parallel=parallel,
+                                  renditions=renditions, page_size=page_size,
+                                  deadline=deadline)
+        return self._paginate_stream(endpoint_name, params, limit, renditions,
+                                     page_size, deadline)
 
     def search(self, term=None, phrase=None, limit=DEFAULT_SEARCH_LIMIT,
-               rating=None):
+               rating=None, prefetch=0, parallel=0, renditions=None,
+               stream=False, page_size=None, deadline=None):
         """
         Search for gifs with a given word or phrase. Punctuation is ignored.
         By default, this will perform a `term` search. If you want to search
@@ -282,6 +3052,29 @@ class Giphy(object):
         terminate the generation after a specified number of results have been
         yielded. This defaults to 25 results; a None implies no limit
 
+        Pages are normally requested one at a time, as the previous page is
+        exhausted. Pass `prefetch` to have up to that many upcoming pages
+        requested in the background while you iterate, so that network time
+        overlaps with whatever you do with each result. Alternatively, pass
+        `parallel` to request every remaining page up front, that many at a
+        time, once the first page says how many results there are. Results
+        are yielded in the same order either way, but note that `parallel`
+        may buffer all remaining results in memory.
+
+        Pass `stream` instead to have each page parsed as it downloads, so
+        that results are yielded as soon as they arrive rather than once the
+        whole page is in. This gets the first result sooner and never holds
+        a whole decoded page in memory. It can't be combined with `prefetch`
+        or `parallel`.
+
+        Each page asks for just the results still needed to reach `limit`,
+        up to MAX_PAGE_SIZE, so small limits don't download a full page and
+        large ones take fewer requests. Pass `page_size` to always request
+        pages of that size instead.
+
+        A `deadline` covers every page, starting from this call, so results
+        stop with GiphyTimeoutException once it passes.
+
         :param term: Search term or terms
         :type term: string
         :param phrase: Search phrase
@@ -290,54 +3083,44 @@ class Giphy(object):
         :type limit: int
         :param rating: limit results to those rated (y,g, pg, pg-13 or r).
         :type rating: string
+        :param prefetch: Number of pages to request ahead in the background
+        :type prefetch: int
+        :param parallel: Number of remaining pages to request concurrently
+        :type parallel: int
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param stream: Whether to yield results while each page downloads
+        :type stream: boolean
+        :param page_size: Number of results to request per page
+        :type page_size: int
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
         """
-        assert any((term, phrase)), 'You must supply a term or phrase to search'
-
-        # Phrases should have dashes and not spaces
-        if phrase:
-            phrase = phrase.replace(' ', '-')
-
-        results_yielded = 0  # Count how many things we yield
-        page, per_page = 0, 25
-        params = {'q': (term or phrase)}
-        if rating:
-            params.update({'rating': rating})
-        fetch = partial(self._fetch, 'search', **params)
-
-        # Generate results until we 1) run out of pages 2) reach a limit
-        while True:
-            data = fetch(offset=page, limit=per_page)
-            page += per_page
-
-            # Guard for empty results
-            if not data['data']:
-                raise StopIteration
-
-            for item in data['data']:
-                results_yielded += 1
-                yield GiphyImage(item)
-
-                if limit is not None and results_yielded >= limit:
-                    raise StopIteration
-
-            # Check yieled limit and whether or not there are more items
-            if (page >= data['pagination']['total_count'] or
-                    (limit is not None and results_yielded >= limit)):
-                raise StopIteration
+        params = self._query_params('q', term, phrase, rating)
+        return self._paged('search', params, limit, prefetch, parallel,
+                           renditions, stream, page_size, deadline)
 
     def search_list(self, term=None, phrase=None, limit=DEFAULT_SEARCH_LIMIT,
-                    rating=None):
+                    rating=None, parallel=DEFAULT_PARALLEL, renditions=None,
+                    page_size=None, deadline=None):
         """
         Suppose you expect the `search` method to just give you a list rather
         than a generator. This method will have that effect. Equivalent to::
 
             >>> g = Giphy()
-            >>> results = list(g.search('foo'))
+            >>> results = list(g.search('foo', parallel=4))
+
+        Since the whole list is wanted anyway, pages after the first are
+        requested `parallel` at a time. Pass `parallel=0` to fetch them one
+        after another.
         """
         return list(self.search(term=term, phrase=phrase, limit=limit,
-                                rating=rating))
+                                rating=rating, parallel=parallel,
+                                renditions=renditions, page_size=page_size,
+                                deadline=deadline))
 
-    def translate(self, term=None, phrase=None, strict=False, rating=None):
+    def translate(self, term=None, phrase=None, strict=False, rating=None,
+                  renditions=None, deadline=None):
         """
         Retrieve a single image that represents a transalation of a term or
         phrase into an animated gif. Punctuation is ignored. By default, this
@@ -352,72 +3135,72 @@ class Giphy(object):
         :type strict: boolean
         :param rating: limit results to those rated (y,g, pg, pg-13 or r).
         :type rating: string
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
         """
-        assert any((term, phrase)), 'You must supply a term or phrase to search'
-
-        # Phrases should have dashes and not spaces
-        if phrase:
-            phrase = phrase.replace(' ', '-')
-
-        params = {'s': (term or phrase)}
-        if rating:
-            params.update({'rating': rating})
-        resp = self._fetch('translate', **params)
+        renditions = self._check_renditions(renditions)
+        params = self._query_params('s', term, phrase, rating)
+        resp = self._local_translate(params)
+        if resp is None:
+            resp = self._fetch('translate', deadline=self._deadline(deadline),
+                               **params)
         if resp['data']:
-            return GiphyImage(resp['data'])
+            return self._image(resp['data'], renditions)
         elif strict or self.strict:
             raise GiphyApiException(
                 "Term/Phrase '%s' could not be translated into a GIF" %
                 (term or phrase))
 
-    def trending(self, rating=None, limit=DEFAULT_SEARCH_LIMIT):
+    def trending(self, rating=None, limit=DEFAULT_SEARCH_LIMIT, prefetch=0,
+                 parallel=0, renditions=None, stream=False, page_size=None,
+                 deadline=None):
         """
         Retrieve GIFs currently trending online. The data returned mirrors
-        that used to create The Hot 100 list of GIFs on Giphy.
+        that used to create The Hot 100 list of GIFs on Giphy. Like `search`,
+        this is a generator that handles paging, sizes pages to the limit
+        unless given a `page_size`, and accepts `prefetch`, `parallel`,
+        `stream` or a `deadline` for every page.
 
         :param rating: limit results to those rated (y,g, pg, pg-13 or r).
         :type rating: string
         :param limit: Maximum number of results to yield
         :type limit: int
+        :param prefetch: Number of pages to request ahead in the background
+        :type prefetch: int
+        :param parallel: Number of remaining pages to request concurrently
+        :type parallel: int
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param stream: Whether to yield results while each page downloads
+        :type stream: boolean
+        :param page_size: Number of results to request per page
+        :type page_size: int
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
         """
-
-        results_yielded = 0  # Count how many things we yield
-        page, per_page = 0, 25
         params = {'rating': rating} if rating else {}
-        fetch = partial(self._fetch, 'trending', **params)
+        return self._paged('trending', params, limit, prefetch, parallel,
+                           renditions, stream, page_size, deadline)
 
-        # Generate results until we 1) run out of pages 2) reach a limit
-        while True:
-            data = fetch(offset=page, limit=per_page)
-            page += per_page
-
-            # Guard for empty results
-            if not data['data']:
-                raise StopIteration
-
-            for item in data['data']:
-                results_yielded += 1
-                yield GiphyImage(item)
-
-                if limit is not None and results_yielded >= limit:
-                    raise StopIteration
-
-            # Check yieled limit and whether or not there are more items
-            if (page >= data['pagination']['total_count'] or
-                    (limit is not None and results_yielded >= limit)):
-                raise StopIteration
-
-    def trending_list(self, rating=None, limit=DEFAULT_SEARCH_LIMIT):
+    def trending_list(self, rating=None, limit=DEFAULT_SEARCH_LIMIT,
+                      parallel=DEFAULT_PARALLEL, renditions=None,
+                      page_size=None, deadline=None):
         """
         Suppose you expect the `trending` method to just give you a list rather
         than a generator. This method will have that effect. Equivalent to::
 
             >>> g = Giphy()
-            >>> results = list(g.trending())
+            >>> results = list(g.trending(parallel=4))
+
+        As with `search_list`, pages are requested `parallel` at a time.
         """
-        return list(self.trending(limit=limit, rating=rating))
+        return list(self.trending(limit=limit, rating=rating,
+                                  parallel=parallel, renditions=renditions,
+                                  page_size=page_size, deadline=deadline))
 
-    def gif(self, gif_id, strict=False):
+    def gif(self, gif_id, strict=False, renditions=None, deadline=None):
         """
         Retrieves a specifc gif from giphy based on unique id
 
@@ -425,31 +3208,121 @@ class Giphy(object):
         :type gif_id: string
         :param strict: Whether an exception should be raised when no results
         :type strict: boolean
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
         """
-        resp = self._fetch(gif_id)
+        renditions = self._check_renditions(renditions)
+        resp = self._local_gif(gif_id)
+        if resp is None:
+            resp = self._fetch(gif_id, deadline=self._deadline(deadline))
 
         if resp['data']:
-            return GiphyImage(resp['data'])
+            return self._image(resp['data'], renditions)
         elif strict or self.strict:
             raise GiphyApiException(
                 "GIF with ID '%s' could not be found" % gif_id)
 
-    def screensaver(self, tag=None, strict=False):
+    def gifs(self, gif_ids, strict=False, parallel=DEFAULT_PARALLEL,
+             renditions=None, deadline=None):
+        """
+        Retrieves many gifs at once based on their unique ids. Ids are looked
+        up `GIFS_CHUNK_SIZE` at a time, with up to `parallel` of these
+        requests in flight at once. Returns a dict mapping each requested id
+        to its GiphyImage, or to None if the gif could not be found.
+
+        :param gif_ids: Unique giphy gif IDs
+        :type gif_ids: list
+        :param strict: Whether an exception should be raised when any id has
+                       no result
+        :type strict: boolean
+        :param parallel: Number of requests to make concurrently
+        :type parallel: int
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
+        """
+        renditions = self._check_renditions(renditions)
+        deadline = self._deadline(deadline)
+        gif_ids, local, chunks = self._gifs_chunks(gif_ids)
+
+        def fetch(chunk):
+            return self._fetch('', deadline=deadline, ids=','.join(chunk))
+
+        if parallel and len(chunks) > 1:
+            with ThreadPoolExecutor(parallel) as executor:
+                responses = list(executor.map(fetch, chunks))
+        else:
+            responses = [fetch(chunk) for chunk in chunks]
+
+        return self._gifs_found(gif_ids, local, responses, renditions, strict)
+
+    def _gifs_chunks(self, gif_ids):
+        """
+        Returns the ids `gifs` was asked for without duplicates, the
+        responses the local index answers each with (or None), and the
+        chunks of the rest to ask the api for
+        """
+        # Drop duplicates, keeping the order ids were given in
+        seen = set()
+        gif_ids = [x for x in gif_ids if not (x in seen or seen.add(x))]
+
+        # Only ask the api for those the local index can't answer
+        local = [self._local_gif(gif_id) for gif_id in gif_ids]
+        wanted = [x for x, resp in zip(gif_ids, local) if resp is None]
+
+        chunks = [wanted[i:i + GIFS_CHUNK_SIZE]
+                  for i in range(0, len(wanted), GIFS_CHUNK_SIZE)]
+        return gif_ids, local, chunks
+
+    def _gifs_found(self, gif_ids, local, responses, renditions, strict):
+        """
+        Builds the results of `gifs` from the local and api responses
+        """
+        found = {}
+        for resp in local:
+            if resp is not None and resp['data']:
+                found[resp['data']['id']] = self._image(resp['data'],
+                                                        renditions)
+        for resp in responses:
+            for item in resp['data'] or []:
+                found[item['id']] = self._image(item, renditions)
+
+        results = dict((gif_id, found.get(gif_id)) for gif_id in gif_ids)
+        missing = [gif_id for gif_id in gif_ids if results[gif_id] is None]
+
+        if missing and (strict or self.strict):
+            raise GiphyApiException(
+                "GIFs with IDs '%s' could not be found" % "', '".join(missing))
+
+        return results
+
+    def screensaver(self, tag=None, strict=False, renditions=None,
+                    deadline=None):
         """
         Returns a random giphy image, optionally based on a search of a given tag.
-        Note that this method will both query for a screensaver image and fetch the
-        full details of that image (2 request calls)
+        If the screensaver response doesn't have the full details of the image,
+        they are fetched with a second request. With a `reservoir`, the image
+        is handed out from those kept ready for the tag, if there are any.
 
         :param tag: Tag to retrieve a screensaver image
         :type tag: string
         :param strict: Whether an exception should be raised when no results
         :type strict: boolean
+        :param renditions: Names of the only renditions to convert
+        :type renditions: list
+        :param deadline: Seconds within which the call must finish
+        :type deadline: float
         """
-        params = {'tag': tag} if tag else {}
-        resp = self._fetch('screensaver', **params)
+        renditions = self._check_renditions(renditions)
+        data = self._draw(tag) if self.reservoir else None
+        if data is None:
+            data = self._random(tag, self._deadline(deadline))
 
-        if resp['data'] and resp['data']['id']:
-            return self.gif(resp['data']['id'])
+        if data:
+            return self._image(data, renditions)
         elif strict or self.strict:
             raise GiphyApiException(
                 "No screensaver GIF tagged '%s' found" % tag)
@@ -457,15 +3330,126 @@ class Giphy(object):
     # Alias
     random_gif = screensaver
 
-    def upload(self, tags, file_path, username=None):
+    def _random(self, tag, deadline):
+        """
+        Returns the api data of a random gif tagged `tag`, or None, looking
+        up its full details if the screensaver response doesn't have them
+        """
+        params = {'tag': tag} if tag else {}
+        data = self._fetch('screensaver', deadline=deadline, **params)['data']
+
+        if not data or not data.get('id'):
+            return None
+        if data.get('images'):
+            return data
+        return self._fetch(data['id'], deadline=deadline)['data']
+
+    def _draw(self, tag):
         """
-        Uploads a gif from the filesystem to Giphy.
+        Takes the api data of a random gif from the reservoir for `tag`,
+        or returns None if it's empty, starting a refill if it's low
+        """
+        with self._reservoirs_lock:
+            reservoir = self._reservoirs.get(tag)
+            if reservoir is None:
+                reservoir = self._reservoirs[tag] = _Reservoir()
+
+        with reservoir.lock:
+            data = reservoir.items.popleft() if reservoir.items else None
+            refill = (not reservoir.filling and
+                      len(reservoir.items) <= self.reservoir_low)
+            reservoir.filling = reservoir.filling or refill
+
+        if refill:
+            self._start_refill(tag, reservoir)
+        return data
+
+    def _start_refill(self, tag, reservoir):
+        with self._reservoirs_lock:
+            if self._refiller is None:
+                self._refiller = ThreadPoolExecutor(DEFAULT_PARALLEL)
+            self._refiller.submit(self._refill, tag, reservoir)
+
+    def _refill(self, tag, reservoir):
+        """
+        Tops the reservoir for `tag` up to `reservoir` random gifs. It stops
+        early if the api has none or fails, to be tried again on the next
+        draw.
+        """
+        try:
+            # Stop if the instance is closed
+            while (self._refiller is not None and
+                   len(reservoir.items) < self.reservoir):
+                data = self._random(tag, None)
+                if data is None:
+                    return
+                with reservoir.lock:
+                    reservoir.items.append(data)
+        except Exception:
+            pass  # Left for the next draw to retry
+        finally:
+            with reservoir.lock:
+                reservoir.filling = False
+
+    def warm(self, queries, limit=DEFAULT_SEARCH_LIMIT,
+             concurrency=DEFAULT_PARALLEL):
+        """
+        Searches for each of `queries`, up to `concurrency` at a time, so
+        that their results are saved to the local index. The api is asked
+        even if the index already has results for a query. Yields a (query,
+        results, error) tuple for each query as it finishes, where `results`
+        is the number of results saved, or None if the search failed, in
+        which case `error` is the exception raised.
+
+        :param queries: Searches to run
+        :type queries: iterable
+        :param limit: Maximum number of results to save for each query
+        :type limit: int
+        :param concurrency: Number of searches to run at once
+        :type concurrency: int
+        """
+        if self.local_index is None:
+            raise ValueError('warm needs a local_index')
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+
+        def search(query):
+            params = self._query_params('q', query, None, None)
+            results = self._paginate('search', params, limit,
+                                     renditions=frozenset())
+            return sum(1 for _ in results)
+
+        return self._map_unordered(search, iter(queries), concurrency)
+
+    def upload(self, tags, file_path, username=None, progress=None,
+               filename=None, hydrate=True):
+        """
+        Uploads a gif to Giphy. The file is streamed from wherever it is in
+        chunks, so big files don't have to fit in memory. Returns the
+        uploaded gif's GiphyImage, which takes a second request, or just its
+        id if `hydrate` is False.
 
         :param tags: Tags to apply to the uploaded image
         :type tags: list
-        :param file_path: Path at which the image can be found
+        :param file_path: Path at which the image can be found, or an open
+                          binary file (such as io.BytesIO, for contents in
+                          memory) or an iterable of bytes
         :type file_path: string
         :param username: Your channel username if not using public API key
+        :param progress: Called with the bytes sent so far and the total
+                         (None if unknown) as the upload goes
+        :type progress: callable
+        :param filename: Name to upload the file as, if not that of its path
+        :type filename: string
+        :param hydrate: Whether to look up the uploaded gif's details
+        :type hydrate: boolean
+        """
+        gif_id = self._upload(tags, file_path, username, progress, filename)
+        return self.gif(gif_id) if hydrate else gif_id
+
+    def _upload(self, tags, file_path, username, progress, filename):
+        """
+        Uploads a file, returning the id giphy gave it
         """
         params = {
             'api_key': self.api_key,
@@ -474,93 +3458,409 @@ class Giphy(object):
         if username is not None:
             params['username'] = username
 
-        with open(file_path, 'rb') as f:
-            resp = requests.post(
-                GIPHY_UPLOAD_ENDPOINT, params=params, files={'file': f})
+        call = self._call_start('upload', GIPHY_UPLOAD_ENDPOINT, params,
+                                'post')
+
+        error = None
+        try:
+            # The file can only be sent once, so failures aren't retried
+            with _MultipartBody('file', file_path, filename, progress) as body:
+                try:
+                    resp = self._request(
+                        'post', GIPHY_UPLOAD_ENDPOINT, retry=False, call=call,
+                        params=params, data=body,
+                        headers={'Content-Type': body.content_type})
+                finally:
+                    if call is not None:
+                        call['bytes_out'] = body.sent
+
+            resp.raise_for_status()
+
+            data = self._decode_body(resp.content, call)
+            self._check_or_raise(data.get('meta', {}))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        return data['data']['id']
+
+    def upload_many(self, items, tags=(), username=None,
+                    concurrency=DEFAULT_PARALLEL, hydrate=True,
+                    progress=None):
+        """
+        Uploads many files, up to `concurrency` at a time. Items can be
+        anything `upload` accepts as a file, or (file, tags) pairs to give
+        them tags of their own. Items are only read from `items` as workers
+        are free for them, so it can be a long-running generator.
+
+        Yields an (item, result, error) tuple for each item as its upload
+        finishes, which is not necessarily the order they were given in.
+        `result` is what `upload` returns, or None if the upload failed, in
+        which case `error` is the exception raised; the other uploads carry
+        on regardless. Pass hydrate=False to get just the uploaded gif ids,
+        which can be looked up in bulk later with `gifs`.
+
+        :param items: Files to upload, or (file, tags) pairs
+        :type items: iterable
+        :param tags: Tags to apply to files not given their own
+        :type tags: list
+        :param username: Your channel username if not using public API key
+        :param concurrency: Number of uploads to run at once
+        :type concurrency: int
+        :param hydrate: Whether to look up each uploaded gif's details
+        :type hydrate: boolean
+        :param progress: Called with an item, the bytes of it sent so far and
+                         its size (None if unknown) as its upload goes
+        :type progress: callable
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+
+        def upload(item):
+            path, item_tags = item if isinstance(item, tuple) else (item, tags)
+            track = progress and partial(progress, item)
+            return self.upload(item_tags, path, username, track,
+                               hydrate=hydrate)
+
+        return self._map_unordered(upload, iter(items), concurrency)
+
+    def download(self, image, rendition='original', dest='.'):
+        """
+        Downloads the gif at one of its renditions to disk, streaming it a
+        chunk at a time, and returns the path saved to. If the file is
+        already there at the size giphy gives, it isn't downloaded again.
+
+        The file is written to <path>.part until it's complete. A partial
+        file left by an earlier try, or by a dropped connection, is resumed
+        with a Range request rather than started over. Once done, the file
+        is checked against the size giphy gives for the rendition, if any,
+        and GiphyDownloadException is raised if it doesn't match.
+
+        :param image: The gif to download
+        :type image: GiphyImage
+        :param rendition: Name of the rendition to download (see RENDITIONS)
+        :type rendition: string
+        :param dest: Path to save the file at, or a directory to save it in
+                     named after the gif's id and the rendition
+        :type dest: string
+        """
+        url, path, size = _download_target(image, rendition, dest)
+        if size is not None and os.path.isfile(path) and \
+                os.path.getsize(path) == size:
+            return path
+
+        part = path + '.part'
+        call = self._call_start('download', url, {})
+        failures, failed = 0, None
+        try:
+            while True:
+                status = None
+                try:
+                    self._download_part(url, part, size, call)
+                    break
+                except (requests.ConnectionError, requests.Timeout,
+                        requests.exceptions.ChunkedEncodingError) as e:
+                    error = e
+                except requests.HTTPError as e:
+                    status = e.response.status_code
+                    if status not in RETRY_STATUSES:
+                        raise
+                    error = e
+
+                delay = self._retry_delay(True, failures, None)
+                if delay is None:
+                    raise error
+                if call is not None:
+                    self._retried(call, delay, status, error)
+                failures += 1
+                time.sleep(delay)
+        except Exception as e:
+            failed = e
+            raise
+        finally:
+            self._call_end(call, failed)
+
+        return _finish_download(part, path, size)
+
+    def _download_part(self, url, part, size, call=None):
+        """
+        Downloads `url` to `part`, carrying on from where any earlier try
+        left off. The attempt and the bytes received are counted towards
+        `call`, if it is instrumented.
+        """
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        if offset and offset == size:
+            return
+
+        if call is not None:
+            call['attempts'] += 1
+        headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+        resp = self.session.get(url, headers=headers, stream=True,
+                                timeout=self._timeout(None))
+        try:
+            if call is not None:
+                call['status'] = resp.status_code
+
+            # Nothing left past the offset: an earlier try got everything
+            if offset and resp.status_code == 416:
+                return
+            resp.raise_for_status()
+
+            # Servers that ignore the range send the whole file again
+            mode = 'ab' if resp.status_code == 206 else 'wb'
+            with open(part, mode) as f:
+                for chunk in resp.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    if call is not None:
+                        call['bytes_in'] += len(chunk)
+        finally:
+            resp.close()
+
+    def download_many(self, images, dest='.', rendition='original',
+                      concurrency=DEFAULT_PARALLEL):
+        """
+        Downloads many gifs into the directory `dest`, up to `concurrency`
+        at a time over the connection pool, as `download` does. Images are
+        only read from `images` as workers are free for them, so a `search`
+        or `trending` generator can be passed straight in.
+
+        Yields an (image, path, error) tuple for each image as it finishes.
+        `path` is where it was saved, or None if the download failed, in
+        which case `error` is the exception raised; the other downloads
+        carry on regardless. Set `pool_maxsize` to at least `concurrency`.
+
+        :param images: The gifs to download
+        :type images: iterable
+        :param dest: Directory to save the files in
+        :type dest: string
+        :param rendition: Name of the rendition to download (see RENDITIONS)
+        :type rendition: string
+        :param concurrency: Number of downloads to run at once
+        :type concurrency: int
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        if not os.path.isdir(dest):
+            raise ValueError("'%s' is not a directory" % dest)
+
+        download = partial(self.download, rendition=rendition, dest=dest)
+        return self._map_unordered(download, iter(images), concurrency)
+
+    def _map_unordered(self, func, items, concurrency):
+        """
+        Calls `func` on each of `items` from up to `concurrency` threads,
+        yielding (item, result, error) as each call finishes
+        """
+        with ThreadPoolExecutor(concurrency) as executor:
+            running = {}
+            try:
+                while True:
+                    # Keep every worker busy while there are items left
+                    for item in items:
+                        running[executor.submit(func, item)] = item
+                        if len(running) >= concurrency:
+                            break
+
+                    if not running:
+                        return
+
+                    done = wait(running, return_when=FIRST_COMPLETED)[0]
+                    for future in done:
+                        item = running.pop(future)
+                        error = future.exception()
+                        if error is None:
+                            yield item, future.result(), None
+                        else:
+                            yield item, None, error
+            finally:
+                # Don't start anything more if the caller stopped early
+                for future in running:
+                    future.cancel()
+
+
+_clients = {}  # Api key -> the Giphy instance `get_client` gives out
+_clients_lock = threading.Lock()
+
+
+def _client_settings(environ):
+    """
+    Returns the Giphy arguments set by the CLIENT_ENVIRON variables in
+    `environ`
+    """
+    settings = {}
+    for name, arg in CLIENT_ENVIRON.items():
+        value = environ.get(name)
+        if not value:
+            continue
+
+        try:
+            if arg == 'timeout':
+                value = tuple(float(x) for x in value.split(','))
+                value = value[0] if len(value) == 1 else value
+            elif arg == 'rate_limit':
+                value = float(value)
+                if value <= 0:
+                    raise ValueError
+            elif arg == 'cache':
+                value = FileCache(value)
+            else:
+                value = int(value)
+        except ValueError:
+            raise ValueError('Invalid %s: %r' % (name, environ[name]))
+
+        settings[arg] = value
+    return settings
+
+
+def get_client(api_key=None):
+    """
+    Returns the Giphy instance shared by everything in this process using
+    `api_key`, creating it on first use. Without an api key, the one in the
+    GIPHYPOP_API_KEY environment variable is used, or else the public key.
+    New instances are configured from the environment variables in
+    CLIENT_ENVIRON. The module-level shorthands (`search`, `gif`, ...) use
+    these instances.
+
+    Instances are safe to use after os.fork: the child gets its own
+    connection pool and background threads.
+    """
+    if api_key is None:
+        api_key = os.environ.get('GIPHYPOP_API_KEY') or GIPHY_PUBLIC_KEY
+
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = Giphy(api_key=api_key,
+                               **_client_settings(os.environ))
+                _clients[api_key] = client
+    return client
+
+
+def close_clients():
+    """
+    Closes and forgets every instance `get_client` has given out
+    """
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        client.close()
+
 
-        resp.raise_for_status()
+def after_fork():
+    """
+    Resets the connection pools, locks and background threads inherited
+    from the parent process. This is called in every child process by
+    os.fork where os.register_at_fork is available (Python 3.7+). Elsewhere,
+    call it first thing in the child, e.g. from your server's post-fork hook.
+    """
+    global _flights_lock, _rate_limiters_lock, _clients_lock
+    global _default_downloader_lock, _materialize_lock
+
+    # Requests in flight belong to the parent's threads
+    _flights.clear()
+    _flights_lock = threading.Lock()
+    _rate_limiters_lock = threading.Lock()
+    _clients_lock = threading.Lock()
+    _default_downloader_lock = threading.Lock()
+    _materialize_lock = threading.RLock()
+
+    for obj in list(_fork_sensitive):
+        obj._after_fork()
 
-        data = resp.json()
-        self._check_or_raise(data.get('meta', {}))
 
-        return self.gif(data['data']['id'])
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=after_fork)
 
 
 def search(term=None, phrase=None, limit=DEFAULT_SEARCH_LIMIT,
-           api_key=GIPHY_PUBLIC_KEY, strict=False, rating=None):
+           api_key=None, strict=False, rating=None):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the search method. Note that this will return a generator
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the search method. Note that
+    this will return a generator
     """
-    return Giphy(api_key=api_key, strict=strict).search(
-        term=term, phrase=phrase, limit=limit, rating=rating)
+    return get_client(api_key).search(term=term, phrase=phrase, limit=limit,
+                                      rating=rating)
 
 
 def search_list(term=None, phrase=None, limit=DEFAULT_SEARCH_LIMIT,
-                api_key=GIPHY_PUBLIC_KEY, strict=False, rating=None):
+                api_key=None, strict=False, rating=None):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the search_list method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the search_list method.
     """
-    return Giphy(api_key=api_key, strict=strict).search_list(
-        term=term, phrase=phrase, limit=limit, rating=rating)
+    return get_client(api_key).search_list(term=term, phrase=phrase,
+                                           limit=limit, rating=rating)
 
 
-def translate(term=None, phrase=None, api_key=GIPHY_PUBLIC_KEY, strict=False,
+def translate(term=None, phrase=None, api_key=None, strict=False,
               rating=None):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the translate method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the translate method.
     """
-    return Giphy(api_key=api_key, strict=strict).translate(
-        term=term, phrase=phrase, rating=rating)
+    return get_client(api_key).translate(term=term, phrase=phrase,
+                                         strict=strict, rating=rating)
 
 
-def trending(limit=DEFAULT_SEARCH_LIMIT, api_key=GIPHY_PUBLIC_KEY,
+def trending(limit=DEFAULT_SEARCH_LIMIT, api_key=None,
              strict=False, rating=None):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the trending method. Note that this will return
-    a generator
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the trending method. Note that
+    this will return a generator
     """
-    return Giphy(api_key=api_key, strict=strict).trending(
-        limit=limit, rating=rating)
+    return get_client(api_key).trending(limit=limit, rating=rating)
 
 
-def trending_list(limit=DEFAULT_SEARCH_LIMIT, api_key=GIPHY_PUBLIC_KEY,
+def trending_list(limit=DEFAULT_SEARCH_LIMIT, api_key=None,
                   strict=False, rating=None):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the trending_list method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the trending_list method.
+    """
+    return get_client(api_key).trending_list(limit=limit, rating=rating)
+
+
+def gif(gif_id, api_key=None, strict=False):
+    """
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the gif method.
     """
-    return Giphy(api_key=api_key, strict=strict).trending_list(
-        limit=limit, rating=rating)
+    return get_client(api_key).gif(gif_id, strict=strict)
 
 
-def gif(gif_id, api_key=GIPHY_PUBLIC_KEY, strict=False):
+def gifs(gif_ids, api_key=None, strict=False):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the gif method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the gifs method.
     """
-    return Giphy(api_key=api_key, strict=strict).gif(gif_id)
+    return get_client(api_key).gifs(gif_ids, strict=strict)
 
 
-def screensaver(tag=None, api_key=GIPHY_PUBLIC_KEY, strict=False):
+def screensaver(tag=None, api_key=None, strict=False):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the screensaver method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the screensaver method.
     """
-    return Giphy(api_key=api_key, strict=strict).screensaver(tag=tag)
+    return get_client(api_key).screensaver(tag=tag, strict=strict)
 
 # Alias
 random_gif = screensaver
 
 
-def upload(tags, file_path, username=None, api_key=GIPHY_PUBLIC_KEY,
+def upload(tags, file_path, username=None, api_key=None,
            strict=False):
     """
-    Shorthand for creating a Giphy api wrapper with the given api key
-    and then calling the upload method.
+    Shorthand for getting the shared Giphy api wrapper for the given api
+    key (see `get_client`) and then calling the upload method.
     """
-    return Giphy(api_key=api_key, strict=strict).upload(
-        tags, file_path, username)
+    giphy = get_client(api_key)
+    gif_id = giphy.upload(tags, file_path, username, hydrate=False)
+    return giphy.gif(gif_id, strict=strict)
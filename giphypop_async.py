@@ -0,0 +1,785 @@
+"""
+An asyncio flavor of the giphypop client. Requires python 3.6+ and aiohttp_::
+
+    $ pip install giphypop[async]
+
+.. _aiohttp: https://pypi.python.org/pypi/aiohttp
+"""
+import asyncio
+import os
+
+from functools import partial
+
+import aiohttp
+
+import giphypop
+
+from giphypop import (DEFAULT_PARALLEL,
+                      DOWNLOAD_CHUNK_SIZE,
+                      DEFAULT_SEARCH_LIMIT,
+                      RATE_LIMIT_RETRIES,
+                      RETRY_STATUSES,
+                      STREAM_CHUNK_SIZE,
+                      Giphy,
+                      GiphyApiException,
+                      GiphyTimeoutException,
+                      _JSONStream,
+                      _MultipartBody,
+                      _clock,
+                      _download_target,
+                      _finish_download)
+
+
+# In-flight requests by (event loop, api key, endpoint, params)
+_flights = {}
+
+
+async def _stream(body):
+    for chunk in body:
+        yield chunk
+
+
+def _after_fork():
+    # Requests in flight belong to the parent's event loops
+    _flights.clear()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _landed(key, task):
+    if _flights.get(key) is task:
+        del _flights[key]
+    if not task.cancelled():
+        # Mark any error as retrieved, in case every caller gave up waiting
+        task.exception()
+
+
+class AsyncGiphy(Giphy):
+
+    """
+    A non-blocking version of `giphypop.Giphy` for use with asyncio. It
+    accepts the same arguments and offers the same methods, except that
+    `search` and `trending` are async generators and everything else is a
+    coroutine::
+
+        >>> async with AsyncGiphy() as g:
+        ...     async for img in g.search('foo'):
+        ...         print(img.media_url)
+        ...     img = await g.translate('bar')
+
+    All requests share one aiohttp connection pool, which holds at most
+    `pool_maxsize` keep-alive connections per host and `pool_connections *
+    pool_maxsize` in total; requests beyond that wait for a free connection.
+    The pool is bound to the event loop it is first used in.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._flights = set()  # Coalesced requests this client started
+        self._refills = set()  # Reservoir refills under way
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __enter__(self):
+        raise TypeError('Use "async with" with AsyncGiphy')
+
+    def _after_fork(self):
+        super()._after_fork()
+        self._flights = set()
+        self._refills = set()
+
+    def _make_session(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_connections * self.pool_maxsize,
+            limit_per_host=self.pool_maxsize)
+        return aiohttp.ClientSession(connector=connector)
+
+    async def close(self):
+        """
+        Closes any pooled connections, cancelling coalesced requests still
+        in flight and reservoir refills
+        """
+        for tasks in (self._flights, self._refills):
+            if tasks:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.wait(tasks)
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, method, url, retry=True, deadline=None,
+                       call=None, **kwargs):
+        """
+        Coroutine version of `giphypop.Giphy._request`. The rate limiter and
+        retries are waited for without blocking the event loop.
+        """
+        send = getattr(self.session, method)
+        limiter, breaker = self.rate_limiter, self.circuit_breaker
+        if breaker is not None:
+            breaker.before()
+
+        failures = throttled = 0
+        success = None
+        try:
+            while True:
+                try:
+                    if limiter is not None:
+                        wait = self._limiter_wait(limiter, deadline)
+                        if wait:
+                            await asyncio.sleep(wait)
+
+                    # Only once the limiter lets the request go
+                    connect, read = self._timeout(deadline)
+                    kwargs['timeout'] = aiohttp.ClientTimeout(
+                        sock_connect=connect, sock_read=read)
+                    if call is not None:
+                        call['attempts'] += 1
+                    resp = await send(url, **kwargs)
+                except (aiohttp.ClientConnectionError,
+                        asyncio.TimeoutError) as e:
+                    status, error = None, e
+                    if limiter is not None:
+                        limiter.update({})
+
+                    delay = self._retry_delay(retry, failures, deadline)
+                    if delay is None:
+                        success = False
+                        if deadline is not None and _clock() >= deadline:
+                            raise GiphyTimeoutException('Deadline exceeded')
+                        raise
+                except BaseException:
+                    # The request won't be answered, so stop counting it
+                    if limiter is not None:
+                        limiter.update({})
+                    raise
+                else:
+                    status, error = resp.status, None
+                    if call is not None:
+                        call['status'] = status
+                    if limiter is not None:
+                        limiter.update(resp.headers, status)
+
+                    if (status == 429 and limiter is not None and
+                            retry and throttled < RATE_LIMIT_RETRIES):
+                        throttled += 1
+                        resp.release()
+                        if call is not None:
+                            self._retried(call, None, status)
+                        continue
+
+                    if resp.status not in RETRY_STATUSES:
+                        success = True
+                        return resp
+
+                    delay = self._retry_delay(retry, failures, deadline)
+                    if delay is None:
+                        success = False
+                        return resp
+                    resp.release()
+
+                if call is not None:
+                    self._retried(call, delay, status, error)
+                failures += 1
+                await asyncio.sleep(delay)
+        finally:
+            if breaker is not None:
+                breaker.record(success)
+
+    async def _coalesced(self, key, call, deadline):
+        """
+        Coroutine version of `giphypop.Giphy._coalesced`. The request runs as
+        a task of its own, so it carries on for the other callers if the one
+        that started it is cancelled.
+        """
+        key = (asyncio.get_event_loop(), key)
+        task = _flights.get(key)
+        if task is None:
+            task = _flights[key] = asyncio.ensure_future(call())
+            task.add_done_callback(partial(_landed, key))
+            self._flights.add(task)
+            task.add_done_callback(self._flights.discard)
+
+        if deadline is None:
+            return await asyncio.shield(task)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task),
+                                          self._remaining(deadline))
+        except asyncio.TimeoutError:
+            # The request may have finished, or failed, meanwhile
+            if task.done():
+                return task.result()
+            raise GiphyTimeoutException('Deadline exceeded')
+
+    async def _fetch(self, endpoint_name, deadline=None, **params):
+        """
+        Wrapper for making an api request from giphy
+        """
+        self._check_online(endpoint_name)
+        if self.bundle:
+            params.setdefault('bundle', self.bundle)
+
+        key = self._cache_key(endpoint_name, params)
+        entry = None
+        if key is not None:
+            entry, fresh = self._cache_get(key, endpoint_name)
+            if fresh:
+                return entry['data']
+
+        flight = self._flight_key(endpoint_name, params)
+        get = partial(self._get, endpoint_name, params, key, entry, deadline)
+        if flight is None:
+            return await get()
+        return await self._coalesced(flight, get, deadline)
+
+    async def _get(self, endpoint_name, params, key, entry, deadline):
+        """
+        Coroutine version of `giphypop.Giphy._get`
+        """
+        params = dict(params, api_key=self.api_key)
+        url = self._endpoint(endpoint_name)
+        call = self._call_start(endpoint_name, url, params)
+
+        error = None
+        try:
+            async with await self._request(
+                    'get', url, deadline=deadline, call=call, params=params,
+                    headers=self._conditional_headers(entry)) as resp:
+                revalidated = entry is not None and resp.status == 304
+                if revalidated:
+                    data = entry['data']
+                else:
+                    resp.raise_for_status()
+                    data = self._decode_body(await resp.read(), call)
+                    self._check_or_raise(data.get('meta', {}))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        if key is not None:
+            self._cache_set(key, endpoint_name, resp.headers, data,
+                            entry if revalidated else None)
+        if self.local_index is not None:
+            self.local_index.store(endpoint_name, params, data)
+
+        return data
+
+    async def _fetch_stream(self, endpoint_name, deadline=None, **params):
+        """
+        Async generator version of `giphypop.Giphy._fetch_stream`
+        """
+        self._check_online(endpoint_name)
+        if self.bundle:
+            params.setdefault('bundle', self.bundle)
+
+        key = self._cache_key(endpoint_name, params)
+        entry = None
+        if key is not None:
+            entry, fresh = self._cache_get(key, endpoint_name)
+            if fresh:
+                for pair in self._replay_members(entry['data']):
+                    yield pair
+                return
+
+        params['api_key'] = self.api_key
+        url = self._endpoint(endpoint_name)
+        call = self._call_start(endpoint_name, url, params)
+
+        error = None
+        try:
+            async with await self._request(
+                    'get', url, deadline=deadline, call=call, params=params,
+                    headers=self._conditional_headers(entry)) as resp:
+                revalidated = entry is not None and resp.status == 304
+                if revalidated:
+                    data = entry['data']
+                    for pair in self._replay_members(data):
+                        yield pair
+                else:
+                    resp.raise_for_status()
+
+                    # Only hold on to the whole response if it's to be kept
+                    keep = key is not None or self.local_index is not None
+                    members, items = ({}, []) if keep else (None, None)
+                    parser = _JSONStream()
+                    async for chunk in resp.content.iter_chunked(
+                            STREAM_CHUNK_SIZE):
+                        if call is not None:
+                            call['bytes_in'] += len(chunk)
+                        for pair in self._stream_members(parser.feed(chunk),
+                                                         members, items,
+                                                         call):
+                            yield pair
+
+                    if not parser.done:
+                        raise GiphyApiException(
+                            'Incomplete response from giphy')
+
+                    if keep:
+                        data = dict(members)
+                        data.setdefault('data', items)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        if key is not None:
+            self._cache_set(key, endpoint_name, resp.headers, data,
+                            entry if revalidated else None)
+        if self.local_index is not None:
+            self.local_index.store(endpoint_name, params, data)
+
+    async def _paginate_stream(self, endpoint_name, params, limit,
+                               renditions=None, page_size=None,
+                               deadline=None):
+        results_yielded = 0  # Count how many things we yield
+        page = 0  # Offset of the next page to request
+
+        while True:
+            count, total = 0, None
+            per_page = self._page_size(page, limit, page_size)
+            members = self._fetch_stream(endpoint_name, deadline=deadline,
+                                         offset=page, limit=per_page,
+                                         **params)
+            built = self._page_start(endpoint_name, page)
+            try:
+                async for name, value in members:
+                    if name is None:
+                        count += 1
+                        results_yielded += 1
+                        yield self._build(value, renditions, built)
+
+                        if limit is not None and results_yielded >= limit:
+                            return
+                    elif name == 'pagination':
+                        total = value['total_count']
+            finally:
+                self._page_end(built)
+                # Release the connection now rather than when collected
+                await members.aclose()
+
+            page += count
+
+            # Guard for empty results, then check for more items
+            if not count or total is None or page >= total:
+                return
+
+    async def _paginate(self, endpoint_name, params, limit, renditions=None,
+                        page_size=None, deadline=None):
+        results_yielded = 0  # Count how many things we yield
+        page = 0  # Offset of the next page to request
+
+        # Generate results until we 1) run out of pages 2) reach a limit
+        while True:
+            per_page = self._page_size(page, limit, page_size)
+            data = await self._fetch(endpoint_name, deadline=deadline,
+                                     offset=page, limit=per_page, **params)
+
+            # Guard for empty results
+            if not data['data']:
+                return
+
+            built = self._page_start(endpoint_name, page)
+            page += len(data['data'])
+            try:
+                for item in data['data']:
+                    results_yielded += 1
+                    yield self._build(item, renditions, built)
+
+                    if limit is not None and results_yielded >= limit:
+                        return
+            finally:
+                self._page_end(built)
+
+            # Check whether or not there are more items
+            if page >= data['pagination']['total_count']:
+                return
+
+    def _paged(self, endpoint_name, params, limit, renditions, stream,
+               page_size, deadline):
+        renditions = self._check_renditions(renditions)
+        page_size = self._check_page_size(page_size)
+        deadline = self._deadline(deadline)
+
+        local = self._local(endpoint_name, params, limit)
+        if local is not None:
+            return _stream(self._image(item, renditions) for item in local)
+
+        if stream:
+            return self._paginate_stream(endpoint_name, params, limit,
+                                         renditions, page_size, deadline)
+        return self._paginate(endpoint_name, params, limit, renditions,
+                              page_size, deadline)
+
+    def search(self, term=None, phrase=None, limit=DEFAULT_SEARCH_LIMIT,
+               rating=None, renditions=None, stream=False, page_size=None,
+               deadline=None):
+        """
+        Async generator version of `giphypop.Giphy.search`
+        """
+        params = self._query_params('q', term, phrase, rating)
+        return self._paged('search', params, limit, renditions, stream,
+                           page_size, deadline)
+
+    async def search_list(self, term=None, phrase=None,
+                          limit=DEFAULT_SEARCH_LIMIT, rating=None,
+                          renditions=None, page_size=None, deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.search_list`
+        """
+        return [img async for img in self.search(term=term, phrase=phrase,
+                                                 limit=limit, rating=rating,
+                                                 renditions=renditions,
+                                                 page_size=page_size,
+                                                 deadline=deadline)]
+
+    async def translate(self, term=None, phrase=None, strict=False,
+                        rating=None, renditions=None, deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.translate`
+        """
+        renditions = self._check_renditions(renditions)
+        params = self._query_params('s', term, phrase, rating)
+        resp = self._local_translate(params)
+        if resp is None:
+            resp = await self._fetch('translate',
+                                     deadline=self._deadline(deadline),
+                                     **params)
+        if resp['data']:
+            return self._image(resp['data'], renditions)
+        elif strict or self.strict:
+            raise GiphyApiException(
+                "Term/Phrase '%s' could not be translated into a GIF" %
+                (term or phrase))
+
+    def trending(self, rating=None, limit=DEFAULT_SEARCH_LIMIT,
+                 renditions=None, stream=False, page_size=None,
+                 deadline=None):
+        """
+        Async generator version of `giphypop.Giphy.trending`
+        """
+        params = {'rating': rating} if rating else {}
+        return self._paged('trending', params, limit, renditions, stream,
+                           page_size, deadline)
+
+    async def trending_list(self, rating=None, limit=DEFAULT_SEARCH_LIMIT,
+                            renditions=None, page_size=None, deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.trending_list`
+        """
+        return [img async for img in self.trending(limit=limit, rating=rating,
+                                                   renditions=renditions,
+                                                   page_size=page_size,
+                                                   deadline=deadline)]
+
+    async def gif(self, gif_id, strict=False, renditions=None, deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.gif`
+        """
+        renditions = self._check_renditions(renditions)
+        resp = self._local_gif(gif_id)
+        if resp is None:
+            resp = await self._fetch(gif_id,
+                                     deadline=self._deadline(deadline))
+
+        if resp['data']:
+            return self._image(resp['data'], renditions)
+        elif strict or self.strict:
+            raise GiphyApiException(
+                "GIF with ID '%s' could not be found" % gif_id)
+
+    async def gifs(self, gif_ids, strict=False, parallel=DEFAULT_PARALLEL,
+                   renditions=None, deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.gifs`. Up to `parallel` chunks
+        of ids are requested at once.
+        """
+        renditions = self._check_renditions(renditions)
+        deadline = self._deadline(deadline)
+        gif_ids, local, chunks = self._gifs_chunks(gif_ids)
+
+        slots = asyncio.Semaphore(parallel or 1)
+
+        async def fetch(chunk):
+            async with slots:
+                return await self._fetch('', deadline=deadline,
+                                         ids=','.join(chunk))
+
+        responses = await asyncio.gather(*[fetch(chunk) for chunk in chunks])
+        return self._gifs_found(gif_ids, local, responses, renditions, strict)
+
+    async def screensaver(self, tag=None, strict=False, renditions=None,
+                          deadline=None):
+        """
+        Coroutine version of `giphypop.Giphy.screensaver`
+        """
+        renditions = self._check_renditions(renditions)
+        data = self._draw(tag) if self.reservoir else None
+        if data is None:
+            data = await self._random(tag, self._deadline(deadline))
+
+        if data:
+            return self._image(data, renditions)
+        elif strict or self.strict:
+            raise GiphyApiException(
+                "No screensaver GIF tagged '%s' found" % tag)
+
+    # Alias
+    random_gif = screensaver
+
+    async def _random(self, tag, deadline):
+        """
+        Coroutine version of `giphypop.Giphy._random`
+        """
+        params = {'tag': tag} if tag else {}
+        data = (await self._fetch('screensaver', deadline=deadline,
+                                  **params))['data']
+
+        if not data or not data.get('id'):
+            return None
+        if data.get('images'):
+            return data
+        return (await self._fetch(data['id'], deadline=deadline))['data']
+
+    def _start_refill(self, tag, reservoir):
+        task = asyncio.ensure_future(self._refill(tag, reservoir))
+        self._refills.add(task)
+        task.add_done_callback(self._refills.discard)
+
+    async def _refill(self, tag, reservoir):
+        """
+        Coroutine version of `giphypop.Giphy._refill`
+        """
+        try:
+            while len(reservoir.items) < self.reservoir:
+                data = await self._random(tag, None)
+                if data is None:
+                    return
+                reservoir.items.append(data)
+        except Exception:
+            pass  # Left for the next draw to retry
+        finally:
+            reservoir.filling = False
+
+    def warm(self, queries, limit=DEFAULT_SEARCH_LIMIT,
+             concurrency=DEFAULT_PARALLEL):
+        """
+        Async generator version of `giphypop.Giphy.warm`. `queries` may be
+        an async iterable.
+        """
+        if self.local_index is None:
+            raise ValueError('warm needs a local_index')
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+
+        async def search(query):
+            params = self._query_params('q', query, None, None)
+            results = self._paginate('search', params, limit,
+                                     renditions=frozenset())
+            return len([img async for img in results])
+
+        return self._map_unordered(search, queries, concurrency)
+
+    async def upload(self, tags, file_path, username=None, progress=None,
+                     filename=None, hydrate=True):
+        """
+        Coroutine version of `giphypop.Giphy.upload`
+        """
+        gif_id = await self._upload(tags, file_path, username, progress,
+                                    filename)
+        return await self.gif(gif_id) if hydrate else gif_id
+
+    async def _upload(self, tags, file_path, username, progress, filename):
+        """
+        Coroutine version of `giphypop.Giphy._upload`
+        """
+        params = {
+            'api_key': self.api_key,
+            'tags': ','.join(tags)
+        }
+        if username is not None:
+            params['username'] = username
+
+        url = giphypop.GIPHY_UPLOAD_ENDPOINT
+        call = self._call_start('upload', url, params, 'post')
+
+        error = None
+        try:
+            with _MultipartBody('file', file_path, filename,
+                                progress) as body:
+                headers = {'Content-Type': body.content_type}
+                if body.size is not None:
+                    headers['Content-Length'] = str(body.len)
+
+                # The file can only be sent once, so failures aren't retried
+                try:
+                    async with await self._request(
+                            'post', url, retry=False, call=call,
+                            params=params, data=_stream(body),
+                            headers=headers) as resp:
+                        resp.raise_for_status()
+                        data = self._decode_body(await resp.read(), call)
+                finally:
+                    if call is not None:
+                        call['bytes_out'] = body.sent
+
+            self._check_or_raise(data.get('meta', {}))
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._call_end(call, error)
+
+        return data['data']['id']
+
+    def upload_many(self, items, tags=(), username=None,
+                    concurrency=DEFAULT_PARALLEL, hydrate=True,
+                    progress=None):
+        """
+        Async generator version of `giphypop.Giphy.upload_many`
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+
+        def upload(item):
+            path, item_tags = item if isinstance(item, tuple) else (item, tags)
+            track = progress and partial(progress, item)
+            return self.upload(item_tags, path, username, track,
+                               hydrate=hydrate)
+
+        return self._map_unordered(upload, iter(items), concurrency)
+
+    async def download(self, image, rendition='original', dest='.'):
+        """
+        Coroutine version of `giphypop.Giphy.download`
+        """
+        url, path, size = _download_target(image, rendition, dest)
+        if size is not None and os.path.isfile(path) and \
+                os.path.getsize(path) == size:
+            return path
+
+        part = path + '.part'
+        call = self._call_start('download', url, {})
+        failures, failed = 0, None
+        try:
+            while True:
+                status = None
+                try:
+                    await self._download_part(url, part, size, call)
+                    break
+                except (aiohttp.ClientConnectionError,
+                        aiohttp.ClientPayloadError,
+                        asyncio.TimeoutError) as e:
+                    error = e
+                except aiohttp.ClientResponseError as e:
+                    status = e.status
+                    if status not in RETRY_STATUSES:
+                        raise
+                    error = e
+
+                delay = self._retry_delay(True, failures, None)
+                if delay is None:
+                    raise error
+                if call is not None:
+                    self._retried(call, delay, status, error)
+                failures += 1
+                await asyncio.sleep(delay)
+        except Exception as e:
+            failed = e
+            raise
+        finally:
+            self._call_end(call, failed)
+
+        return _finish_download(part, path, size)
+
+    async def _download_part(self, url, part, size, call=None):
+        """
+        Coroutine version of `giphypop.Giphy._download_part`
+        """
+        offset = os.path.getsize(part) if os.path.isfile(part) else 0
+        if offset and offset == size:
+            return
+
+        if call is not None:
+            call['attempts'] += 1
+        connect, read = self._timeout(None)
+        headers = {'Range': 'bytes=%d-' % offset} if offset else {}
+        async with self.session.get(
+                url, headers=headers,
+                timeout=aiohttp.ClientTimeout(sock_connect=connect,
+                                              sock_read=read)) as resp:
+            if call is not None:
+                call['status'] = resp.status
+
+            # Nothing left past the offset: an earlier try got everything
+            if offset and resp.status == 416:
+                return
+            resp.raise_for_status()
+
+            # Servers that ignore the range send the whole file again
+            mode = 'ab' if resp.status == 206 else 'wb'
+            with open(part, mode) as f:
+                async for chunk in resp.content.iter_chunked(
+                        DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    if call is not None:
+                        call['bytes_in'] += len(chunk)
+
+    def download_many(self, images, dest='.', rendition='original',
+                      concurrency=DEFAULT_PARALLEL):
+        """
+        Async generator version of `giphypop.Giphy.download_many`. `images`
+        can also be an async iterable, such as `search` returns.
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be at least 1')
+        if not os.path.isdir(dest):
+            raise ValueError("'%s' is not a directory" % dest)
+
+        download = partial(self.download, rendition=rendition, dest=dest)
+        return self._map_unordered(download, images, concurrency)
+
+    async def _map_unordered(self, func, items, concurrency):
+        """
+        Coroutine version of `giphypop.Giphy._map_unordered`, which also
+        takes async iterables
+        """
+        if not hasattr(items, '__aiter__'):
+            items = _stream(items)
+
+        running = {}
+        try:
+            while True:
+                # Keep `concurrency` calls going while there are items left
+                async for item in items:
+                    running[asyncio.ensure_future(func(item))] = item
+                    if len(running) >= concurrency:
+                        break
+
+                if not running:
+                    return
+
+                done = (await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED))[0]
+                for task in done:
+                    item = running.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        yield item, task.result(), None
+                    else:
+                        yield item, None, error
+        finally:
+            # Don't leave uploads running if the caller stopped early
+            for task in running:
+                task.cancel()
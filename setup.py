@@ -16,6 +16,7 @@ setup(name='giphypop',
       url='http://www.github.com/shaunduncan/giphypop/',
       license='MIT',
       packages=find_packages(),
-      install_requires=['requests'],
-      py_modules=['giphypop'],
+      install_requires=['requests>=2.4', 'futures; python_version < "3.2"'],
+      extras_require={'async': ['aiohttp']},
+      py_modules=['giphypop', 'giphypop_async'],
       )
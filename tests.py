@@ -1,17 +1,70 @@
-from unittest import TestCase
+import copy
+import io
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from email.parser import BytesParser
+from functools import partial
+
+from unittest import TestCase, skipIf
 
 from mock import Mock, patch
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+except ImportError:  # Python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+try:
+    import asyncio
+    import giphypop_async
+    from giphypop_async import AsyncGiphy
+except (ImportError, SyntaxError):  # Python 2 or no aiohttp
+    AsyncGiphy = None
+
+import giphypop
+
 from giphypop import (AttrDict,
+                      BaseCache,
+                      CircuitBreaker,
+                      CompactGiphyImage,
+                      FileCache,
                       Giphy,
                       GiphyApiException,
+                      GiphyCircuitOpenException,
+                      GiphyDownloadException,
                       GiphyImage,
+                      GiphyRendition,
+                      GiphyTimeoutException,
+                      LazyGiphyImage,
+                      LocalIndex,
+                      MemoryCache,
+                      RateLimiter,
                       search,
                       search_list,
                       translate,
                       trending,
                       trending_list,
                       gif,
+                      gifs,
                       screensaver,
                       upload)
 
@@ -66,6 +119,390 @@ FAKE_DATA = {
 }
 
 
+class FakeGiphyHandler(BaseHTTPRequestHandler):
+
+    """
+    Serves canned giphy api responses over keep-alive HTTP/1.1
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    # Otherwise Nagle's algorithm and delayed ACKs stall every response
+    # after the first on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _respond(self, payload, status=200, headers=()):
+        # Split the body so that each result of a page can be sent separately
+        if isinstance(payload['data'], list):
+            items = [json.dumps(item).encode('utf-8')
+                     for item in payload['data']]
+            body = json.dumps(dict(payload, data=[])).encode('utf-8')
+            head, tail = body.split(b'[]', 1)
+            pieces = ([head + b'['] + [item + b',' for item in items[:-1]] +
+                      items[-1:] + [b']' + tail])
+        else:
+            pieces = [json.dumps(payload).encode('utf-8')]
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if self.server.etag is not None:
+            self.send_header('ETag', self.server.etag)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(sum(map(len, pieces))))
+        self.end_headers()
+
+        if not self.server.item_latency:
+            self.wfile.write(b''.join(pieces))
+            return
+
+        for piece in pieces:
+            self.wfile.write(piece)
+            self.wfile.flush()
+            time.sleep(self.server.item_latency)
+
+    def _error(self):
+        """
+        Answers with the server's next error, if any, returning whether it did
+        """
+        with self.server.lock:
+            if not self.server.errors:
+                return False
+            status = self.server.errors.pop(0)
+            self.server.statuses.append(status)
+
+        if status is None:
+            self.close_connection = True
+        else:
+            self._respond({'data': [], 'meta': {'status': status}}, status)
+        return True
+
+    def _send_media(self, name):
+        content = self.server.media.get(name)
+        if content is None:
+            self.server.statuses.append(404)
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start = 0
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range') or '')
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            if start >= len(content):
+                self.server.statuses.append(416)
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+        status = 206 if start else 200
+        self.server.statuses.append(status)
+        self.send_response(status)
+        self.send_header('Content-Type', 'image/gif')
+        self.send_header('Content-Length', str(len(content) - start))
+        if start:
+            self.send_header('Content-Range', 'bytes %d-%d/%d' %
+                             (start, len(content) - 1, len(content)))
+        self.end_headers()
+
+        with self.server.lock:
+            cut, self.server.cut_media = self.server.cut_media, None
+        if cut is not None:
+            # Drop the connection part way through
+            self.wfile.write(content[start:start + cut])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(content[start:])
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight,
+                                            self.server.in_flight)
+        try:
+            self._get()
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+
+    def _get(self):
+        url = urlparse(self.path)
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+        name = url.path.rstrip('/').split('/')[-1]
+
+        with self.server.lock:
+            self.server.requests.append((name, params))
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self._error():
+            return
+
+        if url.path.startswith('/media/'):
+            self._send_media(name)
+            return
+
+        allowed, headers = self.server.rate_limit()
+        if not allowed:
+            self.server.statuses.append(429)
+            self._respond({'data': [], 'meta': {'status': 429}}, 429, headers)
+            return
+
+        etag = self.server.etag
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.server.statuses.append(304)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.server.statuses.append(200)
+        self._respond(self.server.payload(name, params), headers=headers)
+
+    def _body(self):
+        """
+        Yields the request body a piece at a time
+        """
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunk = self.rfile.read(size + 2)[:-2]
+                if not size:
+                    return
+                yield chunk
+
+        left = int(self.headers.get('Content-Length') or 0)
+        while left > 0:
+            chunk = self.rfile.read(min(left, 64 * 1024))
+            left -= len(chunk)
+            yield chunk
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = dict((k, v[0]) for k, v in parse_qs(url.query).items())
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if self.server.discard_uploads:
+            size = sum(len(chunk) for chunk in self._body())
+            with self.server.lock:
+                self.server.requests.append(('upload', params))
+                self.server.uploads.append((size, None))
+            self._respond({'data': {'id': 'uploaded'},
+                           'meta': {'status': 200}})
+            return
+
+        body = b''.join(self._body())
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['Content-Type'].encode() +
+            b'\r\n\r\n' + body)
+        upload = dict((part.get_param('name', header='content-disposition'),
+                       (part.get_filename(), part.get_content_type(),
+                        part.get_payload(decode=True)))
+                      for part in message.get_payload())
+
+        with self.server.lock:
+            self.server.requests.append(('upload', params))
+            self.server.uploads.append(
+                (upload, self.headers.get('Content-Length')))
+
+        if self._error():
+            return
+
+        self._respond({'data': {'id': 'uploaded'}, 'meta': {'status': 200}})
+
+
+class FakeGiphyServer(ThreadingMixIn, HTTPServer):
+
+    """
+    A local stand-in for the giphy api. Point the client at it with::
+
+        >>> with FakeGiphyServer(total_count=100) as server:
+        ...     with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+        ...         Giphy().search_list('foo')
+
+    Tracks the number of TCP connections accepted and the requests made.
+    Each response can be delayed by `latency` seconds to simulate the network,
+    and the results within it trickled out `item_latency` seconds apart.
+    Pages hold at most `max_page_size` results, whatever limit is asked for.
+
+    Set `quota` to a (requests, seconds) tuple to allow only that many
+    requests per window, answering the rest with 429 Too Many Requests.
+    Responses then carry X-RateLimit headers, and 429s a Retry-After header.
+    Alternatively, set `throttle` to answer that many requests with 429,
+    without any headers.
+    If `etag` is set, responses carry it and matching conditional requests
+    are answered with 304 Not Modified.
+    Uploaded files are kept in `uploads` as a dict of field name to
+    (filename, content type, content), with the Content-Length sent, if any.
+    Set `discard_uploads` to keep just the size of each request body.
+    Files put in `media` by name are served from `media_url(name)`, with
+    support for Range requests unless `ranges` is False. Set `cut_media` to
+    drop the connection after sending that many bytes of the next one.
+    Requests are answered with the statuses in `errors` first, if any, one
+    each; a None status drops the connection without answering.
+    Screensaver responses have the full gif, unless `bare_random` is set, in
+    which case they only have its id.
+    The most GET requests it has been handling at once is kept in
+    `max_in_flight`.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, total_count=100, latency=0, item_latency=0,
+                 max_page_size=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), FakeGiphyHandler)
+        self.total_count = total_count
+        self.max_page_size = max_page_size
+        self.quota = None
+        self.throttle = 0
+        self._window = (0, 0)  # Start of the quota window, requests in it
+        self.latency = latency
+        self.item_latency = item_latency
+        self.etag = None
+        self.errors = []
+        self.uploads = []
+        self.discard_uploads = False
+        self.media = {}
+        self.ranges = True
+        self.cut_media = None
+        self.bare_random = False
+        self.connections = 0
+        self.in_flight = self.max_in_flight = 0
+        self.requests = []
+        self.statuses = []
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        return 'http://127.0.0.1:%s/v1/gifs' % self.server_address[1]
+
+    def media_url(self, name):
+        return 'http://127.0.0.1:%s/media/%s' % (self.server_address[1], name)
+
+    def rate_limit(self):
+        """
+        Counts a request against the quota, returning whether it's allowed
+        and the rate limit headers to send
+        """
+        with self.lock:
+            if self.throttle:
+                self.throttle -= 1
+                return False, ()
+
+            if self.quota is None:
+                return True, ()
+
+            limit, seconds = self.quota
+            start, used = self._window
+            now = time.time()
+            if now >= start + seconds:
+                start, used = now, 0
+            self._window = (start, used + 1)
+
+            reset = '%.3f' % (start + seconds - now)
+            headers = [('X-RateLimit-Limit', str(limit)),
+                       ('X-RateLimit-Remaining', str(max(limit - used - 1, 0))),
+                       ('X-RateLimit-Reset', reset)]
+            if used >= limit:
+                return False, headers + [('Retry-After', reset)]
+            return True, headers
+
+    def item(self, gif_id):
+        item = copy.deepcopy(FAKE_DATA)
+        item['id'] = str(gif_id)
+        return item
+
+    def payload(self, name, params):
+        if name in ('search', 'trending'):
+            offset = int(params.get('offset', 0))
+            limit = int(params.get('limit', 25))
+            if self.max_page_size:
+                limit = min(limit, self.max_page_size)
+            stop = min(offset + limit, self.total_count)
+            return {
+                'data': [self.item(i) for i in range(offset, stop)],
+                'pagination': {'total_count': self.total_count,
+                               'count': max(stop - offset, 0),
+                               'offset': offset},
+                'meta': {'status': 200}
+            }
+
+        if name == 'gifs':
+            return {'data': [self.item(gif_id)
+                             for gif_id in params['ids'].split(',')],
+                    'meta': {'status': 200}}
+
+        if name in ('translate', 'screensaver', 'random'):
+            item = self.item('random')
+            if name == 'screensaver' and self.bare_random:
+                item = {'id': item['id'], 'type': 'gif'}
+            return {'data': item, 'meta': {'status': 200}}
+
+        return {'data': self.item(name), 'meta': {'status': 200}}
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-response is expected when they stop reading
+        # a streamed page early
+        pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class ServerTestCase(TestCase):
+
+    """
+    Runs a FakeGiphyServer, made with `server_kwargs`, for each test, with
+    the api and upload endpoints pointed at it
+    """
+
+    server_kwargs = {}
+
+    def setUp(self):
+        self.server = FakeGiphyServer(**self.server_kwargs).start()
+        self.patcher = patch.multiple(
+            'giphypop',
+            GIPHY_API_ENDPOINT=self.server.endpoint,
+            GIPHY_UPLOAD_ENDPOINT=self.server.endpoint)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.server.stop()
+
+
 class AttrDictTestCase(TestCase):
 
     def test_get_attribute_raises(self):
@@ -174,6 +611,254 @@ class GiphyImageCase(TestCase):
             assert getattr(result, prop) == getattr(result.original, attr)
 
 
+class LazyGiphyImageCase(TestCase):
+
+    def setUp(self):
+        self.eager = GiphyImage(copy.deepcopy(FAKE_DATA))
+        self.lazy = LazyGiphyImage(copy.deepcopy(FAKE_DATA))
+
+    def test_renditions_not_built(self):
+        assert 'original' not in dict.keys(self.lazy)
+        assert self.lazy.id == self.eager.id
+
+    def test_builds_accessed_rendition_only(self):
+        assert self.lazy.fixed_width.still.url == \
+            self.eager.fixed_width.still.url
+
+        built = set(dict.keys(self.lazy))
+        assert 'fixed_width' in built
+        assert 'original' not in built
+        assert 'fixed_height' not in built
+
+    def test_same_attributes(self):
+        for attr in ('media_url', 'frames', 'width', 'height', 'filesize',
+                     'fullscreen', 'tiled', 'bitly', 'url', 'type'):
+            assert getattr(self.lazy, attr) == getattr(self.eager, attr)
+
+        assert self.lazy.fixed_height.downsampled == \
+            self.eager.fixed_height.downsampled
+        assert isinstance(self.lazy.width, int)
+
+    def test_missing_attribute_raises(self):
+        self.assertRaises(AttributeError, lambda: self.lazy.downsized)
+        self.assertRaises(AttributeError, lambda: self.lazy.foo)
+
+    def test_dict_access_builds_everything(self):
+        assert sorted(self.lazy.keys()) == sorted(self.eager.keys())
+        assert self.lazy['original'] == self.eager['original']
+        assert self.lazy == self.eager
+        assert '_pending' not in self.lazy.__dict__
+
+    def test_mutating_methods_build_everything(self):
+        assert self.lazy.pop('original') == self.eager.pop('original')
+        assert self.lazy.setdefault('fixed_width') == \
+            self.eager.setdefault('fixed_width')
+
+        lazy = LazyGiphyImage(copy.deepcopy(FAKE_DATA))
+        del lazy['fixed_height']
+        lazy.update({'id': 'foo'})
+        assert 'fixed_height' not in lazy
+        eager = GiphyImage(copy.deepcopy(FAKE_DATA))
+        assert lazy.original == eager['original']
+        assert lazy.id == 'foo'
+
+        lazy.popitem()
+        assert len(lazy) == len(eager) - 2
+
+    def test_set_rendition_replaces_it(self):
+        self.lazy.fixed_width = 'mine'
+        self.lazy['original'] = 'also mine'
+        assert sorted(self.lazy.keys()) == sorted(self.eager.keys())
+        assert self.lazy.fixed_width == 'mine'
+        assert self.lazy['original'] == 'also mine'
+        assert self.lazy.fixed_height == self.eager.fixed_height
+
+    def test_empty(self):
+        lazy = LazyGiphyImage()
+        self.assertRaises(AttributeError, lambda: lazy.original)
+        assert len(lazy) == 0
+
+
+class CompactGiphyImageCase(TestCase):
+
+    def setUp(self):
+        self.eager = GiphyImage(copy.deepcopy(FAKE_DATA))
+        self.compact = CompactGiphyImage(copy.deepcopy(FAKE_DATA))
+
+    def test_same_attributes(self):
+        for attr in ('id', 'url', 'type', 'fullscreen', 'tiled', 'bitly',
+                     'media_url', 'frames', 'width', 'height', 'filesize'):
+            assert getattr(self.compact, attr) == getattr(self.eager, attr)
+
+    def test_same_renditions(self):
+        for key in FAKE_DATA['images']:
+            path = key.replace('_downsampled', '.downsampled')
+            path = path.replace('_still', '.still').split('.')
+
+            compact, eager = self.compact, self.eager
+            for attr in path:
+                compact, eager = getattr(compact, attr), getattr(eager, attr)
+
+            for field, value in eager.items():
+                if not isinstance(value, dict):
+                    assert getattr(compact, field) == value
+
+    def test_missing_fields_raise(self):
+        assert not hasattr(self.compact.fixed_width, 'size')
+        assert not hasattr(self.compact, 'downsized')
+        self.assertRaises(AttributeError, lambda: self.compact.foo)
+
+    def test_is_slotted(self):
+        assert not hasattr(self.compact, '__dict__')
+        assert not hasattr(self.compact.original, '__dict__')
+        self.assertRaises(AttributeError, setattr, self.compact, 'foo', 1)
+
+    def test_raw_data_is_opt_in(self):
+        assert self.compact.raw_data is None
+        kept = CompactGiphyImage(FAKE_DATA, keep_raw=True)
+        assert kept.raw_data is FAKE_DATA
+
+    def test_ignores_unknown_fields(self):
+        rendition = GiphyRendition({'url': 'foo', 'hash': 'bar'})
+        assert rendition.url == 'foo'
+        assert not hasattr(rendition, 'hash')
+
+    def test_pickles(self):
+        copied = pickle.loads(pickle.dumps(self.compact, 2))
+        assert copied.fixed_width.still.url == self.compact.fixed_width.still.url
+
+    def test_repr(self):
+        assert repr(self.compact) == repr(self.eager).replace(
+            'GiphyImage', 'CompactGiphyImage')
+
+
+class RenditionsTestCase(TestCase):
+
+    thumbs = ('fixed_width_still', 'fixed_width_downsampled')
+
+    def check_thumbs_only(self, img):
+        assert img.fixed_width.still.url.endswith('200w_s.gif')
+        assert img.fixed_width.downsampled.url.endswith('200w_d.gif')
+        assert not hasattr(img.fixed_width, 'url')
+        assert not hasattr(img, 'original')
+        assert not hasattr(img, 'fixed_height')
+
+    def test_giphy_image(self):
+        img = GiphyImage(copy.deepcopy(FAKE_DATA), renditions=self.thumbs)
+        self.check_thumbs_only(img)
+        assert sorted(img.keys()) == ['bitly', 'fixed_width', 'fullscreen',
+                                      'id', 'raw_data', 'tiled', 'type', 'url']
+
+    def test_lazy_image(self):
+        img = LazyGiphyImage(copy.deepcopy(FAKE_DATA), renditions=self.thumbs)
+        self.check_thumbs_only(img)
+
+    def test_compact_image(self):
+        img = CompactGiphyImage(FAKE_DATA, renditions=self.thumbs)
+        self.check_thumbs_only(img)
+
+    def test_parent_only(self):
+        img = GiphyImage(copy.deepcopy(FAKE_DATA), renditions=['fixed_width'])
+        assert img.fixed_width.url.endswith('200w.gif')
+        assert not hasattr(img.fixed_width, 'still')
+
+
+class BestRenditionTestCase(TestCase):
+
+    def setUp(self):
+        data = copy.deepcopy(FAKE_DATA)
+        images = data['images']
+        images['fixed_width']['size'] = '3000'
+        images['fixed_width_downsampled']['size'] = '1000'
+        images['fixed_width_still']['size'] = '200'
+        images['fixed_height']['size'] = '5000'
+        images['original']['size'] = '90000'
+        self.images = [cls(data) for cls in (GiphyImage, LazyGiphyImage,
+                                             CompactGiphyImage)]
+
+    def test_renditions_sorted(self):
+        for img in self.images:
+            names = [name for name, _ in img.renditions]
+            assert names == ['fixed_width_still', 'fixed_width_downsampled',
+                             'fixed_width', 'fixed_height', 'original',
+                             'fixed_height_downsampled', 'fixed_height_still']
+            assert img.renditions is img.renditions
+
+    def test_largest_first(self):
+        for img in self.images:
+            names = [name for name, _ in
+                     giphypop._largest_first(img.renditions)]
+            assert names == ['original', 'fixed_height',
+                             'fixed_height_downsampled', 'fixed_height_still',
+                             'fixed_width_still', 'fixed_width_downsampled',
+                             'fixed_width']
+
+    def test_index_not_a_field(self):
+        img = self.images[0]
+        img.renditions
+        assert '_rendition_index' not in img
+        assert img == GiphyImage(img.raw_data)
+
+    def test_no_limits(self):
+        for img in self.images:
+            assert img.best_rendition() is img.fixed_width.downsampled
+            assert img.best_rendition(largest=True) is img.original
+
+    def test_fits_box(self):
+        for img in self.images:
+            assert img.best_rendition(max_width=300, max_height=200) is \
+                img.fixed_width.downsampled
+            assert img.best_rendition(max_width=300, max_height=200,
+                                      largest=True) is img.fixed_height
+            # The cheapest of the 200px wide renditions
+            assert img.best_rendition(max_width=250, largest=True) is \
+                img.fixed_width.downsampled
+            assert img.best_rendition(max_width=100) is None
+
+    def test_fits_byte_budget(self):
+        for img in self.images:
+            assert img.best_rendition(max_bytes=4000) is \
+                img.fixed_width.downsampled
+            assert img.best_rendition(max_bytes=4000, largest=True) is \
+                img.fixed_width.downsampled
+            assert img.best_rendition(max_bytes=100000) is \
+                img.fixed_width.downsampled
+            assert img.best_rendition(max_bytes=100000, largest=True) is \
+                img.original
+            # Renditions of unknown size don't fit a budget
+            assert img.best_rendition(max_bytes=10) is None
+
+    def test_unknown_sizes_by_area(self):
+        img = GiphyImage(copy.deepcopy(FAKE_DATA))
+        assert img.best_rendition(max_width=250) is img.fixed_width
+        assert img.best_rendition(max_width=250, animated=False) is \
+            img.fixed_width.still
+
+    def test_stills(self):
+        for img in self.images:
+            assert img.best_rendition(animated=False) is \
+                img.fixed_width.still
+            assert img.best_rendition(animated=False, largest=True) is \
+                img.fixed_height.still
+            assert img.best_rendition(max_width=250, animated=None) is \
+                img.fixed_width.still
+
+    def test_best_renditions(self):
+        small = GiphyImage({'id': 'small', 'images': {
+            'fixed_width': {'url': 'a', 'width': '100', 'height': '50'}}})
+        empty = GiphyImage({'id': 'empty'})
+
+        best = giphypop.best_renditions(self.images + [small, empty],
+                                        max_width=250)
+        assert best[:3] == [img.fixed_width.downsampled
+                            for img in self.images]
+        assert best[3] is small.fixed_width
+        assert best[4] is None
+
+        best = giphypop.best_renditions(self.images, largest=True)
+        assert best == [img.original for img in self.images]
+
+
 class GiphyTestCase(TestCase):
 
     def setUp(self):
@@ -195,19 +880,54 @@ class GiphyTestCase(TestCase):
     def test_fetch_error_raises(self, requests):
         # api returns error messages sorta like...
         err = {'meta': {'error_type': 'ERROR', 'code': 400, 'error_message': ''}}
-        requests.get.return_value = requests
-        requests.json.return_value = err
+        session = requests.Session.return_value
+        session.get.return_value.content = json.dumps(err)
 
         self.assertRaises(GiphyApiException, self.g._fetch, 'foo')
 
     @patch('giphypop.requests')
     def test_fetch(self, requests):
         data = {'data': FAKE_DATA, 'meta': {'status': 200}}
-        requests.get.return_value = requests
-        requests.json.return_value = data
+        session = requests.Session.return_value
+        session.get.return_value.content = json.dumps(data)
 
         assert self.g._fetch('foo') == data
 
+    @patch('giphypop.requests')
+    def test_session_is_reused(self, requests):
+        session = requests.Session.return_value
+        session.get.return_value.content = '{"meta": {"status": 200}}'
+
+        self.g._fetch('foo')
+        self.g._fetch('bar')
+
+        assert requests.Session.call_count == 1
+        assert session.get.call_count == 2
+
+    @patch('giphypop.requests')
+    def test_session_pool_settings(self, requests):
+        g = Giphy(pool_connections=3, pool_maxsize=7, pool_block=True)
+        g.session
+
+        requests.adapters.HTTPAdapter.assert_called_with(
+            pool_connections=3, pool_maxsize=7, pool_block=True)
+        assert requests.Session.return_value.mount.call_count == 2
+
+    @patch('giphypop.requests')
+    def test_close_releases_session(self, requests):
+        session = self.g.session
+        self.g.close()
+
+        assert session.close.called
+        assert self.g._session is None
+
+    @patch('giphypop.requests')
+    def test_context_manager_closes(self, requests):
+        with Giphy() as g:
+            session = g.session
+
+        assert session.close.called
+
     def fake_search_fetch(self, num_results, pages=3):
         self.g._fetch = Mock()
         self.g._fetch.return_value = {
@@ -239,6 +959,71 @@ class GiphyTestCase(TestCase):
             'meta': {'status': 200}
         }
 
+    def fake_paged_fetch(self, total_count):
+        def fetch(endpoint, offset=0, limit=25, **params):
+            stop = min(offset + limit, total_count)
+            return {
+                'data': [dict(FAKE_DATA, id=str(i))
+                         for i in range(offset, stop)],
+                'pagination': {'total_count': total_count,
+                               'count': stop - offset,
+                               'offset': offset},
+                'meta': {'status': 200}
+            }
+
+        self.g._fetch = Mock(side_effect=fetch)
+
+    def test_search_prefetch_matches_sequential(self):
+        self.fake_paged_fetch(110)
+        sequential = [r.id for r in self.g.search('foo', limit=None)]
+
+        self.fake_paged_fetch(110)
+        prefetched = [r.id for r in self.g.search('foo', limit=None,
+                                                  prefetch=3)]
+
+        assert prefetched == sequential == [str(i) for i in range(110)]
+        assert self.g._fetch.call_count == 3
+
+    def test_search_parallel_matches_sequential(self):
+        self.fake_paged_fetch(210)
+        sequential = [r.id for r in self.g.search('foo', limit=200)]
+
+        self.fake_paged_fetch(210)
+        parallel = [r.id for r in self.g.search('foo', limit=200, parallel=3)]
+
+        assert parallel == sequential == [str(i) for i in range(200)]
+        assert self.g._fetch.call_count == 4
+
+    def test_search_list_is_parallel(self):
+        self.fake_paged_fetch(100)
+        self.g._paginate = Mock(return_value=iter([]))
+        self.g.search_list('foo', limit=100)
+
+        assert (self.g._paginate.call_args[1]['parallel'] ==
+                giphypop.DEFAULT_PARALLEL)
+
+    def test_trending_list_parallel_results_in_order(self):
+        self.fake_paged_fetch(130)
+        results = self.g.trending_list(limit=None, parallel=8)
+
+        assert [r.id for r in results] == [str(i) for i in range(130)]
+
+    def test_prefetch_respects_limit(self):
+        self.fake_paged_fetch(1000)
+        results = list(self.g.trending(limit=30, prefetch=5, page_size=25))
+        offsets = sorted(c[1]['offset'] for c in self.g._fetch.call_args_list)
+
+        assert len(results) == 30
+        assert offsets == [0, 25]
+
+    def test_prefetch_stops_when_closed(self):
+        self.fake_paged_fetch(1000)
+        results = self.g.search('foo', limit=None, prefetch=2)
+        next(results)
+        results.close()
+
+        assert self.g._fetch.call_count <= 3
+
     def test_search_no_results(self):
         self.fake_search_fetch(0, pages=1)
         results = list(self.g.search('foo'))
@@ -329,6 +1114,50 @@ class GiphyTestCase(TestCase):
         assert isinstance(self.g.gif('foo'), GiphyImage)
         assert self.g._fetch.called_with('foo')
 
+    def fake_gifs_fetch(self, missing=()):
+        def fetch(endpoint, ids, deadline=None):
+            return {
+                'data': [dict(FAKE_DATA, id=gif_id) for gif_id in ids.split(',')
+                         if gif_id not in missing],
+                'meta': {'status': 200}
+            }
+
+        self.g._fetch = Mock(side_effect=fetch)
+
+    def test_gifs(self):
+        self.fake_gifs_fetch()
+        results = self.g.gifs(['a', 'b', 'a'])
+
+        assert list(results) == ['a', 'b']
+        assert all(isinstance(img, GiphyImage) for img in results.values())
+        self.g._fetch.assert_called_once_with('', deadline=None, ids='a,b')
+
+    def test_gifs_chunks_ids(self):
+        self.fake_gifs_fetch()
+        ids = [str(i) for i in range(250)]
+
+        results = self.g.gifs(ids)
+        chunks = sorted((c[1]['ids'].split(',')
+                         for c in self.g._fetch.call_args_list), key=len)
+
+        assert [results[x].id for x in ids] == ids
+        assert [len(c) for c in chunks] == [50, 100, 100]
+
+    def test_gifs_missing_are_none(self):
+        self.fake_gifs_fetch(missing=('b',))
+        results = self.g.gifs(['a', 'b'])
+
+        assert results['a'].id == 'a'
+        assert results['b'] is None
+
+    def test_gifs_raises_strict(self):
+        self.fake_gifs_fetch(missing=('b',))
+        self.assertRaises(GiphyApiException, self.g.gifs, ['a', 'b'],
+                          strict=True)
+
+    def test_gifs_endpoint(self):
+        assert self.g._endpoint('') == 'http://api.giphy.com/v1/gifs'
+
     def test_screensaver(self):
         self.fake_fetch()
         assert isinstance(self.g.screensaver(), GiphyImage)
@@ -342,6 +1171,94 @@ class GiphyTestCase(TestCase):
         self.fake_fetch()
         assert isinstance(self.g.random_gif(), GiphyImage)
 
+    def test_lazy_results(self):
+        self.g = Giphy(lazy=True)
+        self.fake_fetch()
+        assert isinstance(self.g.translate('foo'), LazyGiphyImage)
+
+        self.fake_search_fetch(25)
+        assert all(isinstance(r, LazyGiphyImage)
+                   for r in self.g.search('foo'))
+
+    def test_compact_results(self):
+        self.g = Giphy(compact=True)
+        self.fake_fetch()
+        img = self.g.gif('foo')
+        assert isinstance(img, CompactGiphyImage)
+        assert img.raw_data is None
+
+        self.g = Giphy(compact=True, keep_raw=True)
+        self.fake_fetch()
+        assert self.g.gif('foo').raw_data is not None
+
+    def test_renditions(self):
+        self.g = Giphy(renditions=['original'])
+        self.fake_fetch()
+        img = self.g.gif('foo')
+        assert hasattr(img, 'original')
+        assert not hasattr(img, 'fixed_width')
+
+        img = self.g.translate('foo', renditions=['fixed_width'])
+        assert not hasattr(img, 'original')
+        assert hasattr(img, 'fixed_width')
+
+    def test_renditions_passed_to_paginate(self):
+        self.g._paginate = Mock()
+        self.g.search('foo', renditions=['original'])
+        self.g.trending(renditions=['original'])
+
+        for call in self.g._paginate.call_args_list:
+            assert call[1]['renditions'] == frozenset(['original'])
+
+    def test_unknown_renditions_raise(self):
+        self.assertRaises(ValueError, Giphy, renditions=['foo'])
+        self.assertRaises(ValueError, self.g.gif, 'foo', renditions=['bar'])
+
+    def test_trending_passes_parallel(self):
+        self.g._paginate = Mock()
+        self.g.trending(parallel=3)
+        assert self.g._paginate.call_args[1]['parallel'] == 3
+
+    @patch('giphypop.requests')
+    def test_bundle(self, requests):
+        session = requests.Session.return_value
+        session.get.return_value.content = '{"meta": {"status": 200}}'
+
+        Giphy(bundle='low_bandwidth')._fetch('search', q='foo')
+        params = session.get.call_args[1]['params']
+        assert params['bundle'] == 'low_bandwidth'
+
+    @patch('giphypop.requests')
+    def test_json_decoder(self, requests):
+        session = requests.Session.return_value
+        session.get.return_value.content = b'body'
+        decoder = Mock(return_value={'meta': {'status': 200}})
+
+        Giphy(json_decoder=decoder)._fetch('search', q='foo')
+        decoder.assert_called_once_with(b'body')
+
+    @patch('giphypop.requests')
+    def test_default_json_decoder(self, requests):
+        session = requests.Session.return_value
+        session.get.return_value.content = b'body'
+        decoder = Mock(return_value={'meta': {'status': 200}})
+
+        with patch('giphypop.DEFAULT_JSON_DECODER', decoder):
+            self.g._fetch('search', q='foo')
+
+        decoder.assert_called_once_with(b'body')
+
+    def test_fast_json_decoder_falls_back(self):
+        real_import = __import__
+
+        def fake_import(name, *args, **kwargs):
+            if name in ('orjson', 'ujson'):
+                raise ImportError(name)
+            return real_import(name, *args, **kwargs)
+
+        with patch('giphypop.__import__', fake_import, create=True):
+            assert giphypop._fast_json_decoder() is json.loads
+
     def test_translate_returns_none(self):
         self.fake_fetch(result=None)
         assert self.g.translate('foo') is None
@@ -374,13 +1291,14 @@ class GiphyTestCase(TestCase):
         self.assertRaises(GiphyApiException, self.g.gif, 'foo', strict=False)
         self.assertRaises(GiphyApiException, self.g.screensaver, 'foo', strict=False)
 
-    @patch('requests.post')
-    def test_upload(self, post):
+    @patch('giphypop.requests')
+    def test_upload(self, requests):
+        post = requests.Session.return_value.post
         resp = Mock()
-        resp.json.return_value = {
+        resp.content = json.dumps({
             "data": {"id": "testid"},
             "meta": {"status": 200}
-        }
+        })
         post.return_value = resp
         self.g.gif = Mock(return_value="test")
         self.assertEqual(self.g.upload(['foo', 'bar'], '/dev/null'), "test")
@@ -388,72 +1306,2446 @@ class GiphyTestCase(TestCase):
         self.g.gif.assert_called_with("testid")
 
 
+class MemoryCacheTestCase(TestCase):
+
+    def test_get_set(self):
+        cache = MemoryCache()
+        assert cache.get('foo') is None
+        cache.set('foo', {'bar': 1}, 60)
+        assert cache.get('foo') == {'bar': 1}
+
+    @patch('giphypop.time.time')
+    def test_expires(self, now):
+        cache = MemoryCache()
+        now.return_value = 100
+        cache.set('foo', 'bar', 10)
+
+        now.return_value = 109
+        assert cache.get('foo') == 'bar'
+        now.return_value = 110
+        assert cache.get('foo') is None
+        assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.get('a')
+        cache.set('c', 3, 60)
+
+        assert len(cache) == 2
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_delete_and_clear(self):
+        cache = MemoryCache()
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.delete('a')
+        assert cache.get('a') is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_record(self):
+        cache = MemoryCache()
+        cache.record('misses')
+        cache.record('hits')
+        cache.record('hits')
+        cache.record('revalidations')
+
+        assert (cache.hits, cache.misses, cache.revalidations) == (2, 1, 1)
+
+
+class FileCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_persists(self):
+        FileCache(self.directory).set('foo', {'bar': [1, 2]}, 60)
+        assert FileCache(self.directory).get('foo') == {'bar': [1, 2]}
+
+    @patch('giphypop.time.time')
+    def test_expires(self, now):
+        cache = FileCache(self.directory)
+        now.return_value = 100
+        cache.set('foo', 'bar', 10)
+
+        now.return_value = 110
+        assert cache.get('foo') is None
+
+    def test_overwrites(self):
+        cache = FileCache(self.directory)
+        cache.set('foo', 1, 60)
+        # On Windows, renaming over an existing file fails
+        with patch('giphypop.os.rename', side_effect=OSError):
+            cache.set('foo', 2, 60)
+        assert cache.get('foo') == 2
+
+    def test_delete_and_clear(self):
+        cache = FileCache(self.directory)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.delete('a')
+        cache.delete('missing')
+        assert cache.get('a') is None
+        assert cache.get('b') == 2
+        cache.clear()
+        assert cache.get('b') is None
+
+
+class GiphyCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = MemoryCache()
+        self.g = Giphy(api_key='foo', cache=self.cache)
+        self.session = self.g._session = Mock()
+        self.resp = self.session.get.return_value
+        self.resp.status_code = 200
+        self.resp.headers = {}
+        self.resp.content = json.dumps({
+            'data': FAKE_DATA, 'meta': {'status': 200}})
+
+    def test_repeat_calls_are_cached(self):
+        first = self.g._fetch('translate', s='foo')
+        second = self.g._fetch('translate', s='foo')
+
+        assert first == second
+        assert self.session.get.call_count == 1
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+    def test_params_are_part_of_key(self):
+        self.g._fetch('search', q='foo', offset=0)
+        self.g._fetch('search', q='foo', offset=25)
+        assert self.session.get.call_count == 2
+
+    def test_key_ignores_api_key(self):
+        key = self.g._cache_key('search', {'q': 'foo', 'api_key': 'bar'})
+        assert key == 'search?q=foo'
+
+    def test_key_escapes_values(self):
+        assert (self.g._cache_key('search', {'q': 'a&rating=g'}) !=
+                self.g._cache_key('search', {'q': 'a', 'rating': 'g'}))
+        assert (giphypop._local_query('search', {'q': 'a&rating=g'}) !=
+                giphypop._local_query('search', {'q': 'a', 'rating': 'g'}))
+
+    def test_key_is_normalized(self):
+        assert (self.g._cache_key('search', {'q': 'foo', 'offset': 25}) ==
+                self.g._cache_key('search', {'offset': '25', 'q': 'foo'}))
+
+    def test_per_endpoint_ttls(self):
+        self.cache.set = Mock()
+        self.g._fetch('trending')
+        self.g._fetch('3avUsGhmckIYE')
+
+        ttls = [c[0][2] for c in self.cache.set.call_args_list]
+        assert ttls == [giphypop.DEFAULT_CACHE_TTLS['trending'],
+                        giphypop.DEFAULT_CACHE_TTLS['gif']]
+
+    def test_screensaver_not_cached(self):
+        self.g._fetch('screensaver')
+        self.g._fetch('screensaver')
+        assert self.session.get.call_count == 2
+
+    def test_ttl_overrides(self):
+        g = Giphy(cache=self.cache, cache_ttls={'trending': 0})
+        assert g._cache_key('trending', {}) is None
+        assert g._cache_ttl('search') == giphypop.DEFAULT_CACHE_TTLS['search']
+
+    def test_custom_backend(self):
+        class DictCache(BaseCache):
+            def __init__(self):
+                super(DictCache, self).__init__()
+                self.data = {}
+
+            def get(self, key):
+                return self.data.get(key)
+
+            def set(self, key, value, ttl):
+                self.data[key] = value
+
+        self.g = Giphy(api_key='foo', cache=DictCache())
+        self.g._session = self.session
+        self.g._fetch('translate', s='foo')
+        self.g._fetch('translate', s='foo')
+
+        assert list(self.g.cache.data) == ['translate?s=foo']
+        assert self.g.cache.hits == 1
+
+    def test_respects_max_age(self):
+        self.cache.set = Mock()
+        self.resp.headers = {'Cache-Control': 'public, max-age=10'}
+        self.g._fetch('translate', s='foo')
+
+        assert self.cache.set.call_args[0][2] == 10
+
+    def test_no_store_is_not_cached(self):
+        self.resp.headers = {'Cache-Control': 'no-store'}
+        self.g._fetch('translate', s='foo')
+        self.g._fetch('translate', s='foo')
+
+        assert self.session.get.call_count == 2
+        assert len(self.cache) == 0
+
+    def test_stale_entry_is_revalidated(self):
+        self.resp.headers = {'Cache-Control': 'no-cache', 'ETag': '"abc"',
+                             'Last-Modified': 'Sat, 17 Oct 2026 00:00:00 GMT'}
+        first = self.g._fetch('trending')
+
+        self.resp.status_code = 304
+        self.resp.content = b''
+        second = self.g._fetch('trending')
+
+        assert second == first
+        assert self.session.get.call_args[1]['headers'] == {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Sat, 17 Oct 2026 00:00:00 GMT'}
+        assert (self.cache.misses, self.cache.revalidations) == (1, 1)
+
+    @patch('giphypop.time.time')
+    def test_not_modified_without_validators_keeps_them(self, now):
+        now.return_value = 1000
+        self.resp.headers = {'ETag': '"abc"',
+                             'Last-Modified': 'Sat, 17 Oct 2026 00:00:00 GMT'}
+        first = self.g._fetch('trending')
+
+        # Servers needn't repeat the validators in a 304
+        now.return_value += 61
+        self.resp.status_code = 304
+        self.resp.content = b''
+        self.resp.headers = {}
+        self.g._fetch('trending')
+
+        now.return_value += 61
+        assert self.g._fetch('trending') == first
+        assert self.session.get.call_args[1]['headers'] == {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Sat, 17 Oct 2026 00:00:00 GMT'}
+        assert self.cache.revalidations == 2
+
+    def test_no_conditional_headers_without_entry(self):
+        self.g._fetch('trending')
+        assert self.session.get.call_args[1]['headers'] == {}
+
+
+class FreshnessTestCase(TestCase):
+
+    def test_default(self):
+        assert giphypop._freshness({}, 60) == 60
+
+    def test_max_age_caps_default(self):
+        assert giphypop._freshness({'Cache-Control': 'max-age=10'}, 60) == 10
+        assert giphypop._freshness({'Cache-Control': 'max-age=99'}, 60) == 60
+
+    def test_no_cache(self):
+        assert giphypop._freshness({'Cache-Control': 'no-cache'}, 60) == 0
+
+    def test_no_store(self):
+        headers = {'Cache-Control': 'private, no-store'}
+        assert giphypop._freshness(headers, 60) is None
+
+    def test_expires(self):
+        headers = {'Date': 'Sat, 17 Oct 2026 00:00:00 GMT',
+                   'Expires': 'Sat, 17 Oct 2026 00:00:30 GMT'}
+        assert giphypop._freshness(headers, 60) == 30
+
+    def test_invalid_expires(self):
+        assert giphypop._freshness({'Expires': '0'}, 60) == 0
+
+    def test_max_age_beats_expires(self):
+        headers = {'Cache-Control': 'max-age=5',
+                   'Expires': 'Sat, 17 Oct 2026 00:00:30 GMT'}
+        assert giphypop._freshness(headers, 60) == 5
+
+
+class ConditionalRequestTestCase(TestCase):
+
+    def test_unchanged_trending_is_not_modified(self):
+        cache = MemoryCache()
+        with FakeGiphyServer(total_count=10) as server:
+            server.etag = '"v1"'
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy(cache=cache, cache_ttls={'trending': 0.01}) as g:
+                    first = g.trending_list()
+                    time.sleep(0.02)
+                    second = g.trending_list()
+
+        assert [r.id for r in first] == [r.id for r in second]
+        assert server.statuses == [200, 304]
+        assert cache.revalidations == 1
+
+
+class ConnectionPoolTestCase(TestCase):
+
+    def test_search_reuses_connections(self):
+        with FakeGiphyServer(total_count=1000) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy() as g:
+                    results = g.search_list('foo', limit=1000, parallel=0)
+
+        assert len(results) == 1000
+        assert len(server.requests) == 20
+        assert server.connections == 1
+
+    def test_parallel_search_list_bounds_connections(self):
+        with FakeGiphyServer(total_count=1000) as server:
+            with patch('giphypop.GIPHY_API_ENDPOINT', server.endpoint):
+                with Giphy() as g:
+                    results = g.search_list('foo', limit=None, parallel=4)
+
+        assert [r.id for r in results] == [str(i) for i in range(1000)]
+        assert len(server.requests) == 20
+        assert server.connections <= 4
+
+
+class RateLimiterTestCase(TestCase):
+
+    def assertAbout(self, actual, expected, delta=0.05):
+        self.assertAlmostEqual(actual, expected, delta=delta)
+
+    def test_burst_then_rate(self):
+        limiter = RateLimiter(10, burst=2)
+        waits = [limiter.reserve() for _ in range(4)]
+
+        assert waits[:2] == [0, 0]
+        self.assertAbout(waits[2], 0.1)
+        self.assertAbout(waits[3], 0.2)
+
+    def test_rate_must_be_positive(self):
+        self.assertRaises(ValueError, RateLimiter, 0)
+        self.assertRaises(ValueError, RateLimiter, -1)
+        self.assertRaises(ValueError, giphypop.rate_limiter, 'key', 0)
+
+    def test_reserve_is_thread_safe(self):
+        limiter = RateLimiter(100, burst=1)
+        waits = []
+
+        def reserve():
+            waits.append(limiter.reserve())
+
+        threads = [threading.Thread(target=reserve) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every request gets its own slot
+        for i, wait in enumerate(sorted(waits)):
+            self.assertAbout(wait, i * 0.01, delta=0.005)
+
+    def test_acquire_sleeps(self):
+        limiter = RateLimiter(20, burst=1)
+        start = time.time()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertAbout(time.time() - start, 0.1)
+
+    def test_quota_headers(self):
+        limiter = RateLimiter(1000)
+        limiter.update({'X-RateLimit-Remaining': '1',
+                        'X-RateLimit-Reset': '5'})
+
+        assert limiter.reserve() == 0
+        self.assertAbout(limiter.reserve(), 5)
+
+    def test_quota_counts_requests_in_flight(self):
+        limiter = RateLimiter(1000)
+        for _ in range(3):
+            limiter.reserve()
+
+        # The api has only seen the first of the three requests
+        limiter.update({'X-RateLimit-Remaining': '3',
+                        'X-RateLimit-Reset': '5'})
+
+        assert limiter.reserve() == 0
+        self.assertAbout(limiter.reserve(), 5)
+
+    def test_quota_reset_as_unix_time(self):
+        limiter = RateLimiter(1000)
+        limiter.update({'X-RateLimit-Remaining': '0',
+                        'X-RateLimit-Reset': str(int(time.time()) + 10)})
+        self.assertAbout(limiter.reserve(), 10, delta=1)
+
+    def test_retry_after_pauses(self):
+        limiter = RateLimiter(1000)
+        limiter.update({'Retry-After': '2'}, 429)
+        self.assertAbout(limiter.reserve(), 2)
+
+    @patch('giphypop.RATE_LIMIT_BACKOFF', 1)
+    def test_429_backs_off_exponentially(self):
+        limiter = RateLimiter(1000)
+        limiter.update({}, 429)
+        self.assertAbout(limiter.reserve(), 1)
+        limiter.update({}, 429)
+        self.assertAbout(limiter.reserve(), 2)
+
+        # Successes reset the backoff
+        limiter.update({}, 200)
+        limiter.update({}, 429)
+        self.assertAbout(limiter.reserve(), 2)
+
+
+class RateLimitedGiphyTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(RateLimitedGiphyTestCase, self).setUp()
+        self.backoff = patch('giphypop.RATE_LIMIT_BACKOFF', 0.01)
+        self.backoff.start()
+
+    def tearDown(self):
+        self.backoff.stop()
+        super(RateLimitedGiphyTestCase, self).tearDown()
+        giphypop._rate_limiters.clear()
+
+    def test_unanswered_request_not_left_pending(self):
+        limiter = RateLimiter(100)
+        with Giphy(rate_limit=limiter) as g:
+            g.session.get = Mock(side_effect=requests.TooManyRedirects)
+            self.assertRaises(requests.TooManyRedirects, g.gif, 'foo')
+        assert limiter._pending == 0
+
+    def test_deadline_covers_limiter_wait(self):
+        limiter = RateLimiter(1)
+        limiter.pause(3)
+        start = time.time()
+        with Giphy(rate_limit=limiter) as g:
+            self.assertRaises(GiphyTimeoutException, g.gif, 'foo',
+                              deadline=0.5)
+        assert time.time() - start < 0.5
+        assert self.server.requests == []
+        assert limiter._pending == 0
+
+    def test_deadline_covers_retry_after(self):
+        self.server.quota = (0, 3)
+        start = time.time()
+        with Giphy(rate_limit=100) as g:
+            self.assertRaises(GiphyTimeoutException, g.gif, 'foo',
+                              deadline=0.5)
+        assert time.time() - start < 0.5
+        assert self.server.statuses == [429]
+
+    def test_limiter_shared_per_api_key(self):
+        limiter = Giphy(api_key='foo', rate_limit=5).rate_limiter
+        assert isinstance(limiter, RateLimiter)
+        assert Giphy(api_key='foo', rate_limit=5).rate_limiter is limiter
+        assert Giphy(api_key='bar', rate_limit=5).rate_limiter is not limiter
+
+        own = RateLimiter(1)
+        assert Giphy(rate_limit=own).rate_limiter is own
+        assert Giphy().rate_limiter is None
+
+    def test_retries_429(self):
+        self.server.throttle = 2
+        with Giphy(rate_limit=100) as g:
+            assert g.gif('foo').id == 'foo'
+        assert self.server.statuses == [429, 429, 200]
+
+    def test_gives_up_after_retries(self):
+        self.server.throttle = giphypop.RATE_LIMIT_RETRIES + 1
+        with Giphy(rate_limit=100) as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+        assert len(self.server.requests) == giphypop.RATE_LIMIT_RETRIES + 1
+
+    def test_429_raises_without_limiter(self):
+        self.server.throttle = 1
+        with Giphy() as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+
+    def test_full_quota_without_errors(self):
+        self.server.quota = (10, 0.5)
+        start = time.time()
+        with Giphy(rate_limit=1000) as g:
+            ids = [g.gif(str(i)).id for i in range(25)]
+        elapsed = time.time() - start
+
+        assert ids == [str(i) for i in range(25)]
+        assert self.server.statuses == [200] * 25
+        # Three windows' worth of requests, each sent as soon as allowed
+        assert 1.0 <= elapsed < 1.4
+
+    def test_threads_share_quota(self):
+        self.server.quota = (10, 0.5)
+        results = []
+
+        def work(g, start):
+            results.extend(g.gif(str(i)).id for i in range(start, start + 5))
+
+        clients = [Giphy(rate_limit=1000) for _ in range(4)]
+        threads = [threading.Thread(target=work, args=(g, i * 5))
+                   for i, g in enumerate(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for g in clients:
+            g.close()
+
+        assert sorted(results, key=int) == [str(i) for i in range(20)]
+        assert self.server.statuses.count(200) == 20
+
+
+class CircuitBreakerTestCase(TestCase):
+
+    def setUp(self):
+        self.now = 100.0
+        self.patcher = patch('giphypop._clock', lambda: self.now)
+        self.patcher.start()
+        self.breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=10)
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def fail(self, times):
+        for _ in range(times):
+            self.breaker.before()
+            self.breaker.record(False)
+
+    def test_opens_after_threshold(self):
+        self.fail(2)
+        assert self.breaker.state == 'closed'
+        self.fail(1)
+        assert self.breaker.state == 'open'
+        self.assertRaises(GiphyCircuitOpenException, self.breaker.before)
+
+    def test_success_resets_failures(self):
+        self.fail(2)
+        self.breaker.before()
+        self.breaker.record(True)
+        self.fail(2)
+        assert self.breaker.state == 'closed'
+
+    def test_single_trial_when_half_open(self):
+        self.fail(3)
+        self.now += 10
+        assert self.breaker.state == 'half-open'
+        self.breaker.before()
+        # Only one request tries the api at a time
+        self.assertRaises(GiphyCircuitOpenException, self.breaker.before)
+
+    def test_trial_success_closes(self):
+        self.fail(3)
+        self.now += 10
+        self.breaker.before()
+        self.breaker.record(True)
+        assert self.breaker.state == 'closed'
+        self.breaker.before()
+
+    def test_trial_failure_reopens(self):
+        self.fail(3)
+        self.now += 10
+        self.fail(1)
+        assert self.breaker.state == 'open'
+        self.now += 9
+        self.assertRaises(GiphyCircuitOpenException, self.breaker.before)
+
+    def test_no_verdict_releases_trial(self):
+        self.fail(3)
+        self.now += 10
+        self.breaker.before()
+        self.breaker.record(None)
+        assert self.breaker.state == 'half-open'
+        self.breaker.before()
+
+
+class RetryTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(RetryTestCase, self).setUp()
+        self.backoff = patch('giphypop.RETRY_BACKOFF', 0.01)
+        self.backoff.start()
+
+    def tearDown(self):
+        self.backoff.stop()
+        super(RetryTestCase, self).tearDown()
+
+    def test_retries_server_errors(self):
+        self.server.errors = [502, 503]
+        with Giphy() as g:
+            assert g.gif('foo').id == 'foo'
+        assert self.server.statuses == [502, 503, 200]
+
+    def test_gives_up_after_retries(self):
+        self.server.errors = [500] * 3
+        with Giphy(retries=2) as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+        assert self.server.statuses == [500] * 3
+
+    def test_client_errors_not_retried(self):
+        self.server.errors = [404]
+        with Giphy() as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+        assert len(self.server.requests) == 1
+
+    def test_retries_dropped_connections(self):
+        self.server.errors = [None]
+        with Giphy() as g:
+            assert g.gif('foo').id == 'foo'
+        assert self.server.statuses == [None, 200]
+
+    def test_retries_disabled(self):
+        self.server.errors = [502]
+        with Giphy(retries=0) as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+
+    def test_upload_not_retried(self):
+        self.server.errors = [502]
+        with Giphy() as g:
+            self.assertRaises(requests.HTTPError, g.upload, [], __file__)
+        assert [name for name, params in self.server.requests] == ['upload']
+
+    def test_read_timeout(self):
+        self.server.latency = 0.3
+        with Giphy(timeout=0.1, retries=1) as g:
+            start = time.time()
+            self.assertRaises(requests.Timeout, g.gif, 'foo')
+            elapsed = time.time() - start
+        assert len(self.server.requests) == 2
+        assert elapsed < 0.3
+
+    def test_deadline_covers_every_page(self):
+        self.server.total_count = 200
+        self.server.latency = 0.1
+        with Giphy() as g:
+            results = []
+            start = time.time()
+            with self.assertRaises(GiphyTimeoutException):
+                for img in g.search('foo', limit=None, page_size=10,
+                                    deadline=0.35):
+                    results.append(img)
+            elapsed = time.time() - start
+        assert len(results) == 30
+        assert elapsed < 0.45
+
+    def test_instance_deadline(self):
+        self.server.latency = 0.2
+        with Giphy(deadline=0.1) as g:
+            self.assertRaises(GiphyTimeoutException, g.gif, 'foo')
+
+    def test_retry_not_past_deadline(self):
+        self.server.errors = [502] * 2
+        self.server.latency = 0.1
+        with patch('giphypop.random.uniform', return_value=2), Giphy() as g:
+            start = time.time()
+            self.assertRaises(requests.HTTPError, g.gif, 'foo', deadline=1)
+            elapsed = time.time() - start
+        # Waiting for the backoff would have run past the deadline
+        assert len(self.server.requests) == 1
+        assert elapsed < 1
+
+    def test_circuit_breaker_fails_fast(self):
+        self.server.errors = [502] * 6
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+        with Giphy(retries=2, circuit_breaker=breaker) as g:
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+            self.assertRaises(requests.HTTPError, g.gif, 'foo')
+            self.assertRaises(GiphyCircuitOpenException, g.gif, 'foo')
+        assert len(self.server.requests) == 6
+
+    def test_circuit_breaker_recovers(self):
+        self.server.errors = [None]
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.1)
+        with Giphy(retries=0, circuit_breaker=breaker) as g:
+            self.assertRaises(requests.ConnectionError, g.gif, 'foo')
+            self.assertRaises(GiphyCircuitOpenException, g.gif, 'foo')
+            time.sleep(0.1)
+            assert g.gif('foo').id == 'foo'
+        assert breaker.state == 'closed'
+
+
+class CoalescingTestCase(ServerTestCase):
+
+    server_kwargs = {'latency': 0.2}
+
+    def tearDown(self):
+        super(CoalescingTestCase, self).tearDown()
+        assert not giphypop._flights
+
+    def concurrently(self, *calls):
+        """
+        Makes each call from a thread of its own, returning their results or
+        the errors they raised
+        """
+        results = [None] * len(calls)
+
+        def run(i, call):
+            try:
+                results[i] = call()
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=run, args=args)
+                   for args in enumerate(calls)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_identical_calls_share_request(self):
+        with Giphy() as g:
+            results = self.concurrently(*[partial(g.gif, 'foo')] * 10)
+        assert [img.id for img in results] == ['foo'] * 10
+        assert len(self.server.requests) == 1
+
+    def test_shared_across_instances(self):
+        clients = [Giphy() for _ in range(5)]
+        results = self.concurrently(*[partial(g.translate, 'foo')
+                                      for g in clients])
+        for g in clients:
+            g.close()
+        assert len(set(img.id for img in results)) == 1
+        assert len(self.server.requests) == 1
+
+    def test_not_shared_with_different_cache_or_index(self):
+        cache, index = MemoryCache(), LocalIndex()
+        with Giphy() as a, Giphy(cache=cache, local_index=index,
+                                 local_mode='store',
+                                 collect_stats=True) as b:
+            self.concurrently(partial(a.gif, 'foo'), partial(b.gif, 'foo'))
+            assert b.stats()['gif']['requests'] == 1
+        assert len(self.server.requests) == 2
+        assert len(cache) == 1 and cache.misses == 1
+        assert len(index) == 1
+        index.close()
+
+    def test_shared_with_same_cache(self):
+        cache = MemoryCache()
+        clients = [Giphy(cache=cache) for _ in range(3)]
+        self.concurrently(*[partial(g.gif, 'foo') for g in clients])
+        for g in clients:
+            g.close()
+        assert len(self.server.requests) == 1
+        assert len(cache) == 1
+
+    def test_different_calls_not_shared(self):
+        with Giphy() as g:
+            self.concurrently(partial(g.gif, 'foo'), partial(g.gif, 'bar'),
+                              partial(g.search_list, 'foo', limit=5))
+        assert len(self.server.requests) == 3
+        assert (Giphy(api_key='other')._flight_key('', {}) !=
+                Giphy()._flight_key('', {}))
+
+    def test_errors_shared(self):
+        self.server.errors = [404]
+        with Giphy() as g:
+            results = self.concurrently(*[partial(g.gif, 'foo')] * 5)
+        assert all(isinstance(e, requests.HTTPError) for e in results)
+        assert len(self.server.requests) == 1
+
+    def test_interrupt_shared(self):
+        started = threading.Event()
+
+        def interrupted():
+            started.set()
+            time.sleep(0.1)
+            raise KeyboardInterrupt
+
+        g = Giphy()
+        errors = []
+
+        def run(call):
+            try:
+                g._coalesced('key', call, None)
+            except BaseException as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=run, args=(interrupted,))
+        leader.start()
+        started.wait()
+        run(Mock())
+        leader.join()
+        assert [type(e) for e in errors] == [KeyboardInterrupt] * 2
+
+    def test_later_calls_make_new_request(self):
+        with Giphy() as g:
+            g.gif('foo')
+            g.gif('foo')
+        assert len(self.server.requests) == 2
+
+    def test_random_endpoints_not_shared(self):
+        with Giphy() as g:
+            self.concurrently(*[partial(g.screensaver, 'foo')] * 3)
+        names = [name for name, params in self.server.requests]
+        assert names.count('screensaver') == 3
+
+    def test_disabled(self):
+        with Giphy(coalesce=False) as g:
+            self.concurrently(*[partial(g.gif, 'foo')] * 3)
+        assert len(self.server.requests) == 3
+
+    def test_waiting_call_keeps_own_deadline(self):
+        with Giphy() as g:
+            results = self.concurrently(partial(g.gif, 'foo'),
+                                        partial(g.gif, 'foo', deadline=0.05))
+        assert results[0].id == 'foo'
+        assert isinstance(results[1], GiphyTimeoutException)
+        assert len(self.server.requests) == 1
+
+    def test_with_cache(self):
+        with Giphy(cache=MemoryCache()) as g:
+            self.concurrently(*[partial(g.gif, 'foo')] * 5)
+            g.gif('foo')
+        assert len(self.server.requests) == 1
+
+
+class ThreadSafetyTestCase(ServerTestCase):
+
+    server_kwargs = {'total_count': 60}
+
+    def run_threads(self, count, target):
+        """
+        Runs `target(i)` in `count` threads started together, returning any
+        errors raised
+        """
+        barrier = threading.Barrier(count)
+        errors = []
+
+        def run(i):
+            barrier.wait()
+            try:
+                target(i)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_settings_are_read_only(self):
+        g = Giphy(strict=True)
+        self.assertRaises(AttributeError, setattr, g, 'strict', False)
+        self.assertRaises(AttributeError, setattr, g, 'cache', MemoryCache())
+        assert g.strict
+
+    def test_one_session_for_all_threads(self):
+        def slow_session():
+            time.sleep(0.01)
+            return session_class()
+
+        session_class = requests.Session
+        sessions = []
+        with patch('giphypop.requests.Session',
+                   side_effect=slow_session) as Session:
+            with Giphy() as g:
+                errors = self.run_threads(
+                    16, lambda i: sessions.append(g.session))
+        assert not errors
+        assert Session.call_count == 1
+        assert len(set(map(id, sessions))) == 1
+
+    def test_results_leave_api_data_alone(self):
+        data = copy.deepcopy(FAKE_DATA)
+        for cls in (GiphyImage, LazyGiphyImage):
+            img = cls(data)
+            img.keys()
+            assert data == FAKE_DATA
+
+    def test_results_are_independent(self):
+        with Giphy(cache=MemoryCache()) as g:
+            first, second = g.gif('foo'), g.gif('foo')
+            first.fixed_width.url = 'changed'
+            assert second.fixed_width.url != 'changed'
+            assert g.gif('foo').fixed_width.url != 'changed'
+
+    def check_mixed_calls(self, g, threads=32, rounds=5):
+        def work(i):
+            for _ in range(rounds):
+                results = g.search_list('foo', limit=None, parallel=0)
+                assert [r.id for r in results] == [str(n) for n in range(60)]
+                assert g.gif(str(i)).id == str(i)
+                assert g.translate('foo').id == 'random'
+                assert g.gif(str(i), strict=True).id == str(i)
+
+        assert self.run_threads(threads, work) == []
+
+    def test_mixed_calls_from_many_threads(self):
+        with Giphy(pool_maxsize=32) as g:
+            self.check_mixed_calls(g)
+        assert self.server.connections <= 32
+
+    def test_mixed_calls_from_many_threads_cached(self):
+        with Giphy(pool_maxsize=32, cache=MemoryCache(), lazy=True) as g:
+            self.check_mixed_calls(g)
+
+    def test_close_while_in_use(self):
+        g = Giphy()
+
+        def work(i):
+            for n in range(20):
+                if i == 0:
+                    g.close()
+                else:
+                    assert g.gif(str(n)).id == str(n)
+
+        assert self.run_threads(8, work) == []
+        g.close()
+
+    def test_requests_made_concurrently(self):
+        self.server.latency = 0.02
+        ids = [str(i) for i in range(64)]
+
+        for threads in (1, 8):
+            self.server.max_in_flight = 0
+            with Giphy(pool_maxsize=threads) as g:
+                with ThreadPoolExecutor(threads) as pool:
+                    results = list(pool.map(g.gif, ids))
+            assert [r.id for r in results] == ids
+            assert self.server.max_in_flight == threads
+
+
+class UploadTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(UploadTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cat.gif')
+        self.content = os.urandom(200 * 1024)
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.g = Giphy()
+
+    def tearDown(self):
+        self.g.close()
+        shutil.rmtree(self.dir)
+        super(UploadTestCase, self).tearDown()
+
+    def uploaded(self):
+        (fields, length), = self.server.uploads
+        return fields['file'], length
+
+    def test_upload_path(self):
+        assert self.g.upload(['foo'], self.path).id == 'uploaded'
+        (filename, content_type, content), length = self.uploaded()
+        assert (filename, content_type) == ('cat.gif', 'image/gif')
+        assert content == self.content
+        assert length is not None
+
+    def test_upload_file(self):
+        f = io.BytesIO(b'skipped' + self.content)
+        f.read(7)
+        self.g.upload(['foo'], f, filename='dog.mp4')
+        (filename, content_type, content), length = self.uploaded()
+        assert (filename, content_type) == ('dog.mp4', 'video/mp4')
+        assert content == self.content
+        assert length is not None
+
+    def test_upload_bytes_iterator(self):
+        chunks = (self.content[i:i + 1000]
+                  for i in range(0, len(self.content), 1000))
+        self.g.upload(['foo'], chunks)
+        (filename, content_type, content), length = self.uploaded()
+        assert (filename, content_type) == ('file', 'application/octet-stream')
+        assert content == self.content
+        assert length is None  # Sent chunked
+
+    def test_progress(self):
+        progress = Mock()
+        self.g.upload(['foo'], self.path, progress=progress)
+        calls = [c[0] for c in progress.call_args_list]
+        assert len(calls) == len(self.content) // giphypop.UPLOAD_CHUNK_SIZE + 1
+        assert calls[-1] == (len(self.content), len(self.content))
+        assert [sent for sent, total in calls] == sorted(
+            sent for sent, total in calls)
+
+    def test_progress_without_size(self):
+        progress = Mock()
+        self.g.upload(['foo'], iter([b'abc', b'', b'def']), progress=progress)
+        assert [c[0] for c in progress.call_args_list] == [(3, None),
+                                                           (6, None)]
+
+    def test_upload_bytes_path(self):
+        self.g.upload(['foo'], self.path.encode('utf-8'))
+        (filename, content_type, content), length = self.uploaded()
+        assert (filename, content_type) == ('cat.gif', 'image/gif')
+        assert content == self.content
+
+    def test_missing_file_raises_before_request(self):
+        self.assertRaises(EnvironmentError, self.g.upload, ['foo'],
+                          os.path.join(self.dir, 'missing.gif'))
+        assert not self.server.requests
+
+    def test_file_closed_after_upload(self):
+        opened = []
+        real_open = open
+
+        def fake_open(*args):
+            opened.append(real_open(*args))
+            return opened[-1]
+
+        with patch('giphypop.open', fake_open, create=True):
+            self.g.upload(['foo'], self.path)
+        assert opened[0].closed
+
+    @skipIf(tracemalloc is None, 'Needs tracemalloc')
+    def test_memory_stays_flat(self):
+        with open(self.path, 'wb') as f:
+            for _ in range(160):
+                f.write(self.content)  # 31MB
+
+        self.server.discard_uploads = True
+        tracemalloc.start()
+        self.g.upload(['foo'], self.path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        (size, _), = self.server.uploads
+        assert size > 160 * len(self.content)
+        assert peak < 2 * 1024 * 1024
+
+
+class UploadManyTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(UploadManyTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(8):
+            self.paths.append(os.path.join(self.dir, '%d.gif' % i))
+            with open(self.paths[-1], 'wb') as f:
+                f.write(os.urandom(1024))
+        self.g = Giphy()
+
+    def tearDown(self):
+        self.g.close()
+        shutil.rmtree(self.dir)
+        super(UploadManyTestCase, self).tearDown()
+
+    def uploaded_tags(self):
+        return sorted(params['tags'] for name, params in self.server.requests
+                      if name == 'upload')
+
+    def test_upload_without_hydrating(self):
+        assert self.g.upload(['foo'], self.paths[0], hydrate=False) == \
+            'uploaded'
+        assert [name for name, params in self.server.requests] == ['upload']
+
+    def test_uploads_everything(self):
+        results = list(self.g.upload_many(self.paths, tags=['foo']))
+
+        assert sorted(item for item, result, error in results) == self.paths
+        assert all(result.id == 'uploaded' and error is None
+                   for item, result, error in results)
+        assert self.uploaded_tags() == ['foo'] * 8
+        # Uploads are then looked up, though these all got the same id
+        assert 'uploaded' in [name for name, params in self.server.requests]
+
+    def test_items_with_own_tags(self):
+        items = [(path, ['tag%d' % i]) for i, path in enumerate(self.paths)]
+        results = list(self.g.upload_many(items, tags=['foo'], hydrate=False))
+
+        assert sorted(item for item, result, error in results) == items
+        assert self.uploaded_tags() == ['tag%d' % i for i in range(8)]
+
+    def test_errors_dont_stop_batch(self):
+        missing = os.path.join(self.dir, 'missing.gif')
+        results = dict((item, (result, error)) for item, result, error in
+                       self.g.upload_many(self.paths[:3] + [missing],
+                                          hydrate=False))
+
+        result, error = results.pop(missing)
+        assert result is None and isinstance(error, EnvironmentError)
+        assert list(results.values()) == [('uploaded', None)] * 3
+
+    def test_no_hydration(self):
+        results = list(self.g.upload_many(self.paths, hydrate=False))
+        assert [result for item, result, error in results] == \
+            ['uploaded'] * 8
+        assert len(self.server.requests) == 8
+
+    def test_concurrency(self):
+        self.server.latency = 0.1
+        start = time.time()
+        list(self.g.upload_many(self.paths, concurrency=4, hydrate=False))
+        elapsed = time.time() - start
+        assert 0.2 <= elapsed < 0.35
+
+    def test_results_as_they_finish(self):
+        self.server.latency = 0.1
+        pulled = []
+
+        def items():
+            for path in self.paths:
+                pulled.append(path)
+                yield path
+
+        results = self.g.upload_many(items(), concurrency=2, hydrate=False)
+        next(results)
+        # Only enough items to keep the workers busy were read
+        assert len(pulled) <= 3
+        results.close()
+        assert len(self.server.requests) <= 3
+
+    def test_progress(self):
+        progress = Mock()
+        list(self.g.upload_many(self.paths[:2], hydrate=False,
+                                progress=progress))
+        assert sorted(c[0] for c in progress.call_args_list) == [
+            (path, 1024, 1024) for path in self.paths[:2]]
+
+    def test_bad_concurrency(self):
+        self.assertRaises(ValueError, self.g.upload_many, self.paths,
+                          concurrency=0)
+
+
+class DownloadTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(DownloadTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.g = Giphy()
+        self.backoff = patch('giphypop.RETRY_BACKOFF', 0.01)
+        self.backoff.start()
+
+    def tearDown(self):
+        self.backoff.stop()
+        self.g.close()
+        shutil.rmtree(self.dir)
+        super(DownloadTestCase, self).tearDown()
+
+    def image(self, gif_id='foo', size=20000, cls=GiphyImage, sized=True):
+        """
+        Returns an image whose original and fixed_width_still renditions are
+        served by the test server
+        """
+        data = copy.deepcopy(FAKE_DATA)
+        data['id'] = gif_id
+        for key, name in (('original', '%s.gif'), ('fixed_width_still',
+                                                   '%s_s.gif')):
+            name = name % gif_id
+            self.server.media[name] = os.urandom(size)
+            data['images'][key]['url'] = self.server.media_url(name)
+            data['images'][key]['size'] = str(size)
+            if not sized:
+                del data['images'][key]['size']
+        return cls(data)
+
+    def content(self, gif_id='foo', suffix=''):
+        return self.server.media['%s%s.gif' % (gif_id, suffix)]
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_download_into_directory(self):
+        path = self.g.download(self.image(), dest=self.dir)
+        assert path == os.path.join(self.dir, 'foo-original.gif')
+        assert self.read(path) == self.content()
+        assert os.listdir(self.dir) == ['foo-original.gif']
+
+    def test_download_to_path(self):
+        dest = os.path.join(self.dir, 'cat.gif')
+        img = self.image()
+        assert self.g.download(img, 'fixed_width_still', dest) == dest
+        assert self.read(dest) == self.content(suffix='_s')
+
+    def test_image_download(self):
+        for cls in (GiphyImage, LazyGiphyImage, CompactGiphyImage):
+            path = self.image(cls=cls).download(dest=self.dir, giphy=self.g)
+            assert self.read(path) == self.content()
+            os.remove(path)
+
+    def test_image_download_without_client(self):
+        with patch('warnings.warn') as warn:
+            path = self.image().download(dest=self.dir)
+        assert self.read(path) == self.content()
+        assert not warn.called
+
+    def test_bad_renditions(self):
+        img = self.image()
+        self.assertRaises(ValueError, self.g.download, img, 'huge', self.dir)
+        self.assertRaises(GiphyApiException, self.g.download, img,
+                          'downsized', self.dir)
+
+    def test_resumes_partial_file(self):
+        img = self.image()
+        part = os.path.join(self.dir, 'foo-original.gif.part')
+        with open(part, 'wb') as f:
+            f.write(self.content()[:5000])
+
+        path = self.g.download(img, dest=self.dir)
+        assert self.read(path) == self.content()
+        assert self.server.statuses == [206]
+        assert not os.path.exists(part)
+
+    def test_resumes_after_dropped_connection(self):
+        # What was read in whole chunks before the drop is kept
+        self.server.cut_media = 150000
+        path = self.g.download(self.image(size=200000), dest=self.dir)
+        assert self.read(path) == self.content()
+        assert self.server.statuses == [200, 206]
+
+    def test_restarts_if_range_ignored(self):
+        self.server.ranges = False
+        img = self.image()
+        with open(os.path.join(self.dir, 'foo-original.gif.part'), 'wb') as f:
+            f.write(b'x' * 5000)
+
+        path = self.g.download(img, dest=self.dir)
+        assert self.read(path) == self.content()
+        assert self.server.statuses == [200]
+
+    def test_complete_part_without_size(self):
+        img = self.image(sized=False)
+        with open(os.path.join(self.dir, 'foo-original.gif.part'), 'wb') as f:
+            f.write(self.content())
+
+        path = self.g.download(img, dest=self.dir)
+        assert self.read(path) == self.content()
+        assert self.server.statuses == [416]
+
+    def test_size_mismatch_raises(self):
+        img = self.image()
+        self.server.media['foo.gif'] += b'extra'
+        self.assertRaises(GiphyDownloadException, self.g.download, img,
+                          dest=self.dir)
+        assert os.listdir(self.dir) == []
+
+    def test_existing_file_not_downloaded_again(self):
+        img = self.image()
+        self.g.download(img, dest=self.dir)
+        self.g.download(img, dest=self.dir)
+        assert self.server.statuses == [200]
+
+    def test_server_errors_retried(self):
+        self.server.errors = [503]
+        path = self.g.download(self.image(), dest=self.dir)
+        assert self.read(path) == self.content()
+
+    def test_download_many(self):
+        images = [self.image(str(i), size=1000) for i in range(20)]
+        with Giphy(pool_maxsize=4) as g:
+            results = list(g.download_many(iter(images), self.dir,
+                                           concurrency=4))
+
+        assert sorted(img.id for img, path, error in results) == sorted(
+            img.id for img in images)
+        for img, path, error in results:
+            assert error is None
+            assert self.read(path) == self.content(img.id)
+        assert self.server.connections <= 4
+
+    def test_download_many_errors_dont_stop_batch(self):
+        images = [self.image(str(i), size=1000) for i in range(4)]
+        del self.server.media['2.gif']
+
+        results = dict((img.id, (path, error)) for img, path, error in
+                       self.g.download_many(images, self.dir))
+        path, error = results.pop('2')
+        assert path is None and isinstance(error, requests.HTTPError)
+        assert all(error is None for path, error in results.values())
+
+    def test_download_many_from_search(self):
+        self.server.total_count = 60
+        self.server.media = dict(('%d.gif' % i, os.urandom(100))
+                                 for i in range(60))
+        media_url = self.server.media_url
+        item = self.server.item
+
+        def media_item(gif_id):
+            data = item(gif_id)
+            data['images']['original']['url'] = media_url('%s.gif' % gif_id)
+            data['images']['original']['size'] = '100'
+            return data
+
+        self.server.item = media_item
+        with patch('giphypop.GIPHY_API_ENDPOINT', self.server.endpoint):
+            results = list(self.g.download_many(
+                self.g.search('foo', limit=None), self.dir))
+        assert len(results) == 60
+        assert len(os.listdir(self.dir)) == 60
+
+    def test_download_many_needs_directory(self):
+        self.assertRaises(ValueError, self.g.download_many, [],
+                          os.path.join(self.dir, 'missing'))
+
+
+def local_item(gif_id, title='', rating='g', width=500, height=346):
+    item = copy.deepcopy(FAKE_DATA)
+    item.update(id=gif_id, title=title, rating=rating)
+    item['images']['original'].update(width=str(width), height=str(height))
+    return item
+
+
+class LocalIndexTestCase(TestCase):
+
+    fts = True
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.index = LocalIndex(os.path.join(self.dir, 'index.db'),
+                                fts=self.fts)
+        self.index.add([local_item('cat', 'Funny Cat GIF'),
+                        local_item('dog', 'dog dancing', rating='pg'),
+                        local_item('catdog', 'cat and dog', width=200,
+                                   height=100)])
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.dir)
+
+    def ids(self, results):
+        return sorted(item['id'] for item in results)
+
+    def test_uses_fts(self):
+        assert self.index.fts == self.fts
+
+    def test_search_matches_every_word(self):
+        assert self.ids(self.index.search('cat')) == ['cat', 'catdog']
+        assert self.ids(self.index.search('Cat dog!')) == ['catdog']
+        assert self.index.search('bird') == []
+        assert self.index.search('...') == []
+
+    def test_search_filters(self):
+        assert self.ids(self.index.search('dog', rating='pg')) == ['dog']
+        assert self.ids(self.index.search('cat', max_width=300)) == \
+            ['catdog']
+        assert self.ids(self.index.search('cat', max_height=99)) == []
+        assert len(self.index.search('cat', limit=1)) == 1
+
+    def test_add_images(self):
+        self.index.add([GiphyImage(local_item('bird'))], query='tweet')
+        assert self.ids(self.index.search('tweet')) == ['bird']
+        self.assertRaises(ValueError, self.index.add,
+                          [CompactGiphyImage(local_item('owl'))])
+
+    def test_query_words_added_to_existing(self):
+        self.index.add([local_item('cat', 'Funny Cat GIF')], query='kitten')
+        assert self.ids(self.index.search('kitten')) == ['cat']
+        assert self.ids(self.index.search('funny')) == ['cat']
+        assert len(self.index) == 3
+
+    def test_get(self):
+        assert self.index.get('dog')['title'] == 'dog dancing'
+        assert self.index.get('bird') is None
+        assert self.index.get('dog', max_age=60) is not None
+
+        with patch('giphypop.time.time', return_value=time.time() + 61):
+            assert self.index.get('dog', max_age=60) is None
+            assert self.index.get('dog') is not None
+
+    def page(self, offset, ids, total):
+        return {'data': [local_item(gif_id) for gif_id in ids],
+                'pagination': {'total_count': total}}
+
+    def test_results_in_order(self):
+        params = {'q': 'foo', 'api_key': 'key', 'limit': 2}
+        self.index.store('search', dict(params, offset=0),
+                         self.page(0, ['b', 'a'], 3))
+        assert self.index.results('search', {'q': 'foo'}, limit=2) is not None
+        # The last result hasn't been fetched yet
+        assert self.index.results('search', {'q': 'foo'}) is None
+        assert self.index.results('search', {'q': 'bar'}) is None
+
+        self.index.store('search', dict(params, offset=2),
+                         self.page(2, ['c'], 3))
+        results = self.index.results('search', {'q': 'foo'}, limit=None)
+        assert [item['id'] for item in results] == ['b', 'a', 'c']
+        assert self.ids(self.index.search('foo')) == ['a', 'b', 'c']
+
+    def test_results_max_age(self):
+        self.index.store('trending', {}, self.page(0, ['a'], 1))
+        assert self.index.results('trending', {}, max_age=60) is not None
+
+        with patch('giphypop.time.time', return_value=time.time() + 61):
+            assert self.index.results('trending', {}, max_age=60) is None
+
+    def test_reopen(self):
+        self.index.close()
+        self.index = LocalIndex(os.path.join(self.dir, 'index.db'))
+        assert self.index.fts == self.fts
+        assert len(self.index) == 3
+        assert self.ids(self.index.search('dog')) == ['catdog', 'dog']
+
+
+class LocalIndexFallbackTestCase(LocalIndexTestCase):
+
+    fts = False
+
+
+class LocalGiphyTestCase(ServerTestCase):
+
+    server_kwargs = {'total_count': 60}
+
+    def setUp(self):
+        super(LocalGiphyTestCase, self).setUp()
+        self.index = LocalIndex()
+        self.g = Giphy(local_index=self.index)
+
+    def tearDown(self):
+        self.g.close()
+        self.index.close()
+        super(LocalGiphyTestCase, self).tearDown()
+
+    def ids(self, results):
+        return [img.id for img in results]
+
+    def test_bad_mode(self):
+        self.assertRaises(ValueError, Giphy, local_mode='sometimes')
+
+    def test_repeat_search_answered_locally(self):
+        first = self.ids(self.g.search('foo', limit=30))
+        assert self.ids(self.g.search('foo', limit=30)) == first
+        assert self.ids(self.g.search('foo', limit=10)) == first[:10]
+        assert len(self.server.requests) == 1
+
+        # More results than were stored
+        assert self.ids(self.g.search('foo', limit=40)) == \
+            [str(i) for i in range(40)]
+        assert len(self.server.requests) == 2
+
+    def test_stale_results_refetched(self):
+        list(self.g.search('foo'))
+        with patch('giphypop.time.time', return_value=time.time() + 3600):
+            list(Giphy(local_index=self.index, local_max_age=60).search('foo'))
+        assert len(self.server.requests) == 2
+
+    def test_trending_refetched_after_cache_ttl(self):
+        list(self.g.trending())
+        list(self.g.search('foo'))
+        later = time.time() + giphypop.DEFAULT_CACHE_TTLS['trending'] + 1
+        with patch('giphypop.time.time', return_value=later):
+            list(self.g.trending())
+            list(self.g.search('foo'))
+        names = [name for name, params in self.server.requests]
+        assert names == ['trending', 'search', 'trending']
+
+    def test_streamed_results_stored(self):
+        # Only streams read to the end are stored
+        list(self.g.trending(limit=None, stream=True))
+        assert self.ids(self.g.trending(limit=None)) == \
+            [str(i) for i in range(60)]
+        assert len(self.server.requests) == 2
+
+    def test_store_mode(self):
+        g = Giphy(local_index=self.index, local_mode='store')
+        list(g.search('foo'))
+        list(g.search('foo'))
+        assert len(self.server.requests) == 2
+        assert len(self.index) == 25
+
+    def test_gifs_only_asks_for_missing(self):
+        self.g.gif('a')
+        results = self.g.gifs(['a', 'b'])
+        assert sorted(img.id for img in results.values()) == ['a', 'b']
+        assert self.server.requests[-1][1]['ids'] == 'b'
+        assert self.g.gif('b').id == 'b'
+        assert len(self.server.requests) == 2
+
+    def test_offline(self):
+        list(self.g.search('funny cats', limit=5))
+        self.g.gif('a')
+        requests = len(self.server.requests)
+
+        g = Giphy(local_index=self.index, local_mode='offline')
+        assert self.ids(g.search('funny cats', limit=5)) == \
+            ['0', '1', '2', '3', '4']
+        assert len(self.ids(g.search('cats', limit=None))) == 5
+        assert self.ids(g.search('dogs')) == []
+        assert self.ids(g.trending()) == []
+        assert g.translate('funny').id in ('0', '1', '2', '3', '4')
+        assert g.translate('dogs') is None
+        assert g.gif('a').id == 'a'
+        assert g.gifs(['a', 'b']) == {'a': g.gif('a'), 'b': None}
+        self.assertRaises(GiphyApiException, g.gif, 'b', strict=True)
+        self.assertRaises(GiphyApiException, g.screensaver)
+        assert len(self.server.requests) == requests
+
+    def test_warm(self):
+        results = sorted(self.g.warm(['foo', 'bar'], limit=30))
+        assert results == [('bar', 30, None), ('foo', 30, None)]
+        assert len(self.server.requests) == 2
+
+        # Warming doesn't use what's stored
+        list(self.g.warm(['foo'], limit=30))
+        assert len(self.server.requests) == 3
+
+        list(self.g.search('bar', limit=30))
+        assert len(self.server.requests) == 3
+
+        self.assertRaises(ValueError, Giphy().warm, ['foo'])
+
+
+class ReservoirTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(ReservoirTestCase, self).setUp()
+        self.g = Giphy(reservoir=4)
+
+    def tearDown(self):
+        self.g.close()
+        super(ReservoirTestCase, self).tearDown()
+
+    def names(self):
+        return [name for name, _ in self.server.requests]
+
+    def wait_for_refill(self, tag=None):
+        reservoir = self.g._reservoirs[tag]
+        start = time.time()
+        while reservoir.filling and time.time() - start < 5:
+            time.sleep(0.01)
+        return len(reservoir.items)
+
+    def test_screensaver_has_full_data(self):
+        img = Giphy().screensaver('foo')
+        assert img.original.url == FAKE_DATA['images']['original']['url']
+        assert self.names() == ['screensaver']
+
+    def test_bare_screensaver_looked_up(self):
+        self.server.bare_random = True
+        img = Giphy().screensaver('foo')
+        assert img.original.url == FAKE_DATA['images']['original']['url']
+        assert self.names() == ['screensaver', 'random']
+
+    def test_bad_low_water_mark(self):
+        self.assertRaises(ValueError, Giphy, reservoir=4, reservoir_low=4)
+        assert Giphy(reservoir=4).reservoir_low == 2
+
+    def test_draws_from_reservoir(self):
+        self.server.latency = 0.1
+        assert self.g.screensaver('foo').id == 'random'
+        assert self.wait_for_refill('foo') == 4
+
+        start = time.time()
+        img = self.g.random_gif('foo', renditions=['fixed_width'])
+        assert time.time() - start < 0.05
+        assert img.fixed_width.url
+        assert not hasattr(img, 'original')
+
+        # Not yet down to the low water mark
+        assert len(self.server.requests) == 5
+        assert len(self.g._reservoirs['foo'].items) == 3
+
+    def test_refills_below_low_water_mark(self):
+        self.g.screensaver()
+        self.wait_for_refill()
+        self.g.screensaver()
+        self.g.screensaver()
+        assert self.wait_for_refill() == 4
+        assert len(self.server.requests) == 7
+
+    def test_reservoir_per_tag(self):
+        self.g.screensaver('foo')
+        self.g.screensaver('bar')
+        assert self.wait_for_refill('foo') == 4
+        assert self.wait_for_refill('bar') == 4
+        tags = [params.get('tag') for _, params in self.server.requests]
+        assert tags.count('foo') == tags.count('bar') == 5
+
+    def test_failed_refill_tried_again(self):
+        g = Giphy(reservoir=4, retries=0)
+        try:
+            self.server.errors = [500] * 2
+            # The call itself fails, and so does the refill it starts
+            self.assertRaises(requests.HTTPError, g.screensaver)
+            reservoir = g._reservoirs[None]
+            start = time.time()
+            while reservoir.filling and time.time() - start < 5:
+                time.sleep(0.01)
+            assert not reservoir.items
+
+            assert g.screensaver().id == 'random'
+            start = time.time()
+            while len(reservoir.items) < 4 and time.time() - start < 5:
+                time.sleep(0.01)
+            assert len(reservoir.items) == 4
+        finally:
+            g.close()
+
+
+class ClientRegistryTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(ClientRegistryTestCase, self).setUp()
+        giphypop.close_clients()
+
+    def tearDown(self):
+        giphypop.close_clients()
+        super(ClientRegistryTestCase, self).tearDown()
+
+    def test_one_client_per_key(self):
+        client = giphypop.get_client('foo')
+        assert giphypop.get_client('foo') is client
+        assert giphypop.get_client('bar') is not client
+        assert client.api_key == 'foo'
+
+    def test_shorthands_share_connections(self):
+        gif('a', api_key='foo')
+        gif('b', api_key='foo')
+        translate('c', api_key='foo')
+        assert self.server.connections == 1
+
+    def test_close_clients(self):
+        client = giphypop.get_client('foo')
+        giphypop.close_clients()
+        assert giphypop.get_client('foo') is not client
+
+    @patch.dict('os.environ', {'GIPHYPOP_API_KEY': 'envkey'})
+    def test_api_key_from_environment(self):
+        assert giphypop.get_client().api_key == 'envkey'
+        assert giphypop.get_client() is giphypop.get_client('envkey')
+        gif('a')
+        assert self.server.requests[-1][1]['api_key'] == 'envkey'
+
+    @patch.dict('os.environ', clear=True)
+    def test_public_key_by_default(self):
+        assert giphypop.get_client().api_key == giphypop.GIPHY_PUBLIC_KEY
+
+    def test_settings_from_environment(self):
+        tmp = tempfile.mkdtemp()
+        environ = {'GIPHYPOP_TIMEOUT': '1.5,4', 'GIPHYPOP_RETRIES': '5',
+                   'GIPHYPOP_POOL_MAXSIZE': '20', 'GIPHYPOP_RATE_LIMIT': '2.5',
+                   'GIPHYPOP_CACHE_DIR': tmp}
+        try:
+            with patch.dict('os.environ', environ):
+                client = giphypop.get_client('foo')
+            assert client.timeout == (1.5, 4)
+            assert client.retries == 5
+            assert client.pool_maxsize == 20
+            assert client.rate_limiter.rate == 2.5
+            assert isinstance(client.cache, FileCache)
+            assert client.cache.directory == tmp
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_single_timeout_from_environment(self):
+        settings = giphypop._client_settings({'GIPHYPOP_TIMEOUT': '7'})
+        assert settings == {'timeout': 7}
+
+    def test_bad_environment(self):
+        with patch.dict('os.environ', {'GIPHYPOP_RETRIES': 'lots'}):
+            self.assertRaises(ValueError, giphypop.get_client, 'foo')
+        self.assertRaises(ValueError, giphypop._client_settings,
+                          {'GIPHYPOP_RATE_LIMIT': '0'})
+
+    @skipIf(not hasattr(os, 'fork'), 'Needs os.fork')
+    def test_fork(self):
+        client = giphypop.get_client('foo')
+        client.gif('a')
+        parent_session = client.session
+        index = LocalIndex()
+
+        # Locks held by another thread at the time of the fork are left
+        # locked in the child, unless they are reset
+        giphypop._flights_lock.acquire()
+        client._session_lock.acquire()
+        read, write = os.pipe()
+        pid = os.fork()
+        if not pid:  # Child
+            status = 1
+            try:
+                os.close(read)
+                child = giphypop.get_client('foo')
+                same = child.session is parent_session
+                child.gif('b')
+                index.add([local_item('c')])
+                os.write(write, json.dumps([child is client, same,
+                                            len(index)]).encode())
+                status = 0
+            finally:
+                os._exit(status)
+
+        giphypop._flights_lock.release()
+        client._session_lock.release()
+        os.close(write)
+        with os.fdopen(read) as f:
+            result = f.read()
+        assert os.waitpid(pid, 0)[1] == 0
+
+        assert json.loads(result) == [True, False, 1]
+        # The child opened a connection of its own
+        assert self.server.connections == 2
+        assert len(index) == 0
+
+        client.gif('d')
+        assert client.session is parent_session
+        assert self.server.connections == 2
+
+
+class HooksTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(HooksTestCase, self).setUp()
+        self.backoff = patch('giphypop.RETRY_BACKOFF', 0.01)
+        self.backoff.start()
+        self.events = []
+        hooks = dict((event, partial(self.record, event))
+                     for event in giphypop.HOOK_EVENTS)
+        self.g = Giphy(hooks=hooks, cache=MemoryCache())
+
+    def tearDown(self):
+        self.g.close()
+        self.backoff.stop()
+        super(HooksTestCase, self).tearDown()
+
+    def record(self, event, info):
+        self.events.append((event, info))
+
+    def names(self):
+        return [event for event, _ in self.events]
+
+    def info(self, name):
+        return [info for event, info in self.events if event == name]
+
+    def test_no_hooks_by_default(self):
+        g = Giphy()
+        assert g._hooks is None
+        self.assertRaises(ValueError, g.stats)
+
+    def test_unknown_event(self):
+        self.assertRaises(ValueError, Giphy, hooks={'request': Mock()})
+
+    def test_several_hooks(self):
+        first, second = Mock(), Mock()
+        with Giphy(hooks={'request_end': [first, second]}) as g:
+            g.gif('foo')
+        assert first.call_count == second.call_count == 1
+
+    def test_request_start_and_end(self):
+        self.g.gif('foo')
+        assert self.names() == ['cache_miss', 'request_start', 'request_end']
+
+        start, = self.info('request_start')
+        assert start['endpoint'] == 'gif'
+        assert 'api_key' not in start['params']
+
+        end, = self.info('request_end')
+        assert end['endpoint'] == 'gif'
+        assert end['status'] == 200
+        assert end['attempts'] == 1
+        assert end['error'] is None
+        assert end['bytes_in'] > 0 and end['bytes_out'] == 0
+        assert 0 < end['decode_seconds'] <= end['seconds']
+
+    def test_cache_hit(self):
+        self.g.gif('foo')
+        self.g.gif('foo')
+        assert self.names()[-1] == 'cache_hit'
+        miss, = self.info('cache_miss')
+        assert miss['endpoint'] == 'gif' and not miss['stale']
+        assert self.info('cache_hit')[0]['key'] == miss['key']
+
+    def test_gifs_endpoint(self):
+        self.g.gifs(['a', 'b'])
+        assert self.info('request_end')[0]['endpoint'] == 'gifs'
+
+    def test_retry(self):
+        self.server.errors = [502]
+        self.g.gif('foo')
+        assert self.names() == ['cache_miss', 'request_start', 'retry',
+                                'request_end']
+
+        retry, = self.info('retry')
+        assert retry['status'] == 502 and retry['attempt'] == 1
+        assert retry['delay'] is not None
+        assert self.info('request_end')[0]['attempts'] == 2
+
+    def test_error(self):
+        self.server.errors = [404]
+        self.assertRaises(requests.HTTPError, self.g.gif, 'foo')
+        end, = self.info('request_end')
+        assert end['status'] == 404
+        assert isinstance(end['error'], requests.HTTPError)
+
+    def test_pages(self):
+        results = list(self.g.search('foo', limit=60))
+        assert len(results) == 60
+        pages = self.info('page')
+        assert [(p['offset'], p['results']) for p in pages] == [(0, 50),
+                                                               (50, 10)]
+        assert all(p['endpoint'] == 'search' and p['build_seconds'] > 0
+                   for p in pages)
+
+    def test_pages_stopped_early(self):
+        results = self.g.search('foo', limit=None, stream=True)
+        for _ in range(5):
+            next(results)
+        results.close()
+
+        page, = self.info('page')
+        assert page['results'] == 5
+        end, = self.info('request_end')
+        assert end['error'] is None and end['bytes_in'] > 0
+
+    def test_stream(self):
+        list(self.g.search('foo', limit=30, stream=True))
+        end, = self.info('request_end')
+        assert end['endpoint'] == 'search'
+        assert 0 < end['decode_seconds'] <= end['seconds']
+        assert self.info('page')[0]['results'] == 30
+
+    def test_upload(self):
+        self.g.upload([], io.BytesIO(b'abcdef'), hydrate=False)
+        end, = self.info('request_end')
+        assert end['endpoint'] == 'upload' and end['method'] == 'post'
+        assert end['bytes_out'] > 6 and end['bytes_in'] > 0
+
+    def test_download(self):
+        self.server.media['foo.gif'] = os.urandom(1000)
+        data = copy.deepcopy(FAKE_DATA)
+        data['images']['original']['url'] = self.server.media_url('foo.gif')
+        data['images']['original']['size'] = '1000'
+
+        dest = tempfile.mkdtemp()
+        try:
+            self.g.download(GiphyImage(data), dest=dest)
+        finally:
+            shutil.rmtree(dest)
+
+        end, = self.info('request_end')
+        assert end['endpoint'] == 'download' and end['status'] == 200
+        assert end['bytes_in'] == 1000
+
+
+class StatsTestCase(ServerTestCase):
+
+    def setUp(self):
+        super(StatsTestCase, self).setUp()
+        self.g = Giphy(collect_stats=True, cache=MemoryCache())
+
+    def tearDown(self):
+        self.g.close()
+        super(StatsTestCase, self).tearDown()
+
+    def test_counts(self):
+        list(self.g.search('foo', limit=60))
+        self.g.gif('foo')
+        self.g.gif('foo')
+
+        stats = self.g.stats()
+        search = stats['search']
+        assert search['requests'] == 2
+        assert search['statuses'] == {200: 2}
+        assert search['pages'] == 2 and search['results'] == 60
+        assert search['cache_misses'] == 2 and search['cache_hits'] == 0
+        assert sum(count for _, count in search['latency']) == 2
+        assert search['bytes_in'] > 0
+        assert 0 < search['decode_seconds'] <= search['seconds']
+
+        gif = stats['gif']
+        assert gif['requests'] == 1
+        assert gif['cache_hits'] == 1 and gif['cache_misses'] == 1
+
+    def test_exportable(self):
+        self.g.gif('foo')
+        stats = self.g.stats()
+        assert json.loads(json.dumps(stats))['gif']['requests'] == 1
+
+    def test_reset(self):
+        self.g.gif('foo')
+        assert self.g.stats(reset=True)['gif']['requests'] == 1
+        assert self.g.stats() == {}
+
+    def test_snapshot_is_a_copy(self):
+        self.g.gif('foo')
+        stats = self.g.stats()
+        stats['gif']['statuses'][200] = 5
+        assert self.g.stats()['gif']['statuses'] == {200: 1}
+
+    def test_shared(self):
+        stats = giphypop.Stats()
+        with Giphy(collect_stats=stats) as a, Giphy(collect_stats=stats) as b:
+            a.gif('foo')
+            b.gif('bar')
+        assert stats.snapshot()['gif']['requests'] == 2
+
+    def test_with_hooks(self):
+        hook = Mock()
+        with Giphy(collect_stats=True, hooks={'request_end': hook}) as g:
+            g.gif('foo')
+            assert g.stats()['gif']['requests'] == 1
+        assert hook.call_count == 1
+
+    def test_latency_buckets(self):
+        stats = giphypop.Stats(buckets=(1, 0.1))
+        for seconds in (0.05, 0.1, 0.5, 5):
+            stats.hooks['request_end']({
+                'endpoint': 'gif', 'status': None, 'error': Exception(),
+                'seconds': seconds, 'decode_seconds': 0, 'bytes_in': 0,
+                'bytes_out': 0})
+        counters = stats.snapshot()['gif']
+        assert counters['latency'] == [[0.1, 2], [1, 1], [None, 1]]
+        assert counters['errors'] == 4 and counters['statuses'] == {}
+
+    def test_starts_over_after_fork(self):
+        self.g.gif('foo')
+        self.g.stats_collector._after_fork()
+        assert self.g.stats() == {}
+
+
+class PageSizeTestCase(ServerTestCase):
+
+    server_kwargs = {'total_count': 1000}
+
+    def setUp(self):
+        super(PageSizeTestCase, self).setUp()
+        self.g = Giphy()
+
+    def tearDown(self):
+        self.g.close()
+        super(PageSizeTestCase, self).tearDown()
+
+    def requested(self, **kwargs):
+        """
+        Pages through search results, returning the ids yielded and the
+        limit of each page requested, in offset order
+        """
+        del self.server.requests[:]
+        ids = [r.id for r in self.g.search('foo', **kwargs)]
+        params = sorted((int(p['offset']), int(p['limit']))
+                        for name, p in self.server.requests)
+        return ids, [limit for offset, limit in params]
+
+    def test_request_counts(self):
+        # limit: (requests with fixed pages of 25, requests now)
+        counts = {3: (1, 1), 25: (1, 1), 50: (2, 1), 100: (4, 2),
+                  500: (20, 10), None: (40, 20)}
+
+        for limit, (fixed, adaptive) in sorted(counts.items(), key=str):
+            ids, pages = self.requested(limit=limit, page_size=25)
+            assert len(pages) == fixed
+
+            ids, pages = self.requested(limit=limit)
+            assert ids == [str(i) for i in range(limit or 1000)]
+            assert len(pages) == adaptive
+
+            # Nothing is downloaded beyond the limit
+            assert sum(pages) == (limit or 1000)
+
+    def test_pages_sized_to_remaining_limit(self):
+        ids, pages = self.requested(limit=120)
+        assert pages == [50, 50, 20]
+
+        ids, pages = self.requested(limit=120, parallel=2)
+        assert pages == [50, 50, 20]
+
+        ids, pages = self.requested(limit=3, stream=True)
+        assert ids == ['0', '1', '2']
+        assert pages == [3]
+
+    def test_page_size_override(self):
+        ids, pages = self.requested(limit=30, page_size=20)
+        assert len(ids) == 30
+        assert pages == [20, 20]
+
+        with Giphy(page_size=100) as g:
+            assert len(g.search_list('foo', limit=250)) == 250
+        assert [int(p['limit']) for name, p in self.server.requests[-3:]] == \
+            [100] * 3
+
+    def test_bad_page_size(self):
+        self.assertRaises(ValueError, Giphy, page_size=0)
+        self.assertRaises(ValueError, self.g.search, 'foo', page_size=0)
+
+    def test_smaller_api_pages(self):
+        # Pages the api cuts short mustn't leave gaps, however they're fetched
+        self.server.max_page_size = 25
+        expected = [str(i) for i in range(130)]
+
+        for kwargs in ({}, {'prefetch': 2}, {'parallel': 3},
+                       {'stream': True}):
+            ids, pages = self.requested(limit=130, **kwargs)
+            assert ids == expected, kwargs
+
+
+class JSONStreamTestCase(TestCase):
+
+    def split(self, body, size):
+        parser = giphypop._JSONStream()
+        pairs = []
+        for i in range(0, len(body), size):
+            pairs.extend(parser.feed(body[i:i + size]))
+        return parser, [(key, json.loads(raw.decode('utf-8')))
+                        for key, raw in pairs]
+
+    def test_splits_data_items_and_members(self):
+        doc = {'data': [{'a': 'x]}"\\', 'b': [1, {'c': None}]}, 3, 'y', []],
+               'pagination': {'total_count': 4},
+               'meta': {'status': 200},
+               'n': -1.5}
+        body = json.dumps(doc).encode('utf-8')
+
+        for size in (1, 2, 3, 7, 64, len(body)):
+            parser, pairs = self.split(body, size)
+            assert parser.done
+            assert [v for k, v in pairs if k is None] == doc['data']
+            assert dict((k, v) for k, v in pairs if k is not None) == \
+                dict((k, v) for k, v in doc.items() if k != 'data')
+
+    def test_items_yielded_before_document_ends(self):
+        body = b'{"data": [{"id": "1"}, {"id": "2"}, {"id": '
+        parser, pairs = self.split(body, 5)
+        assert pairs == [(None, {'id': '1'}), (None, {'id': '2'})]
+        assert not parser.done
+
+    def test_unicode_split_across_chunks(self):
+        body = json.dumps({'data': [{'title': u'caf\xe9 \u2603'}]},
+                          ensure_ascii=False).encode('utf-8')
+        parser, pairs = self.split(body, 1)
+        assert pairs == [(None, {'title': u'caf\xe9 \u2603'})]
+
+    def test_data_object_is_a_member(self):
+        parser, pairs = self.split(b'{"data": {"id": "1"}, "meta": {}}', 4)
+        assert pairs == [('data', {'id': '1'}), ('meta', {})]
+
+    def test_rejects_non_objects(self):
+        parser = giphypop._JSONStream()
+        self.assertRaises(ValueError, list, parser.feed(b'[1, 2]'))
+
+
+class StreamingTestCase(ServerTestCase):
+
+    server_kwargs = {'total_count': 60}
+
+    def setUp(self):
+        super(StreamingTestCase, self).setUp()
+        self.g = Giphy()
+
+    def tearDown(self):
+        self.g.close()
+        super(StreamingTestCase, self).tearDown()
+
+    def test_search_stream_matches_search(self):
+        results = list(self.g.search('foo', limit=None, stream=True))
+        assert [r.id for r in results] == [str(i) for i in range(60)]
+        assert results[0] == self.g.search_list('foo', limit=1)[0]
+        assert all(isinstance(r, GiphyImage) for r in results)
+        assert self.server.requests[:2] == [
+            ('search', {'q': 'foo', 'offset': str(offset), 'limit': '50',
+                        'api_key': giphypop.GIPHY_PUBLIC_KEY})
+            for offset in (0, 50)]
+
+    def test_trending_stream_respects_limit(self):
+        results = list(self.g.trending(limit=30, stream=True))
+        assert [r.id for r in results] == [str(i) for i in range(30)]
+        assert len(self.server.requests) == 1
+
+    def test_stream_yields_before_page_downloads(self):
+        self.server.item_latency = 0.05  # 1.25s for a whole page
+        start = time.time()
+        results = self.g.search('foo', stream=True)
+        first = next(results)
+        elapsed = time.time() - start
+        results.close()
+
+        assert first.id == '0'
+        assert elapsed < 0.5
+
+    def test_stream_raises_api_errors(self):
+        self.server.payload = lambda name, params: {
+            'data': [], 'meta': {'status': 403, 'error_message': 'nope'}}
+        results = self.g.search('foo', stream=True)
+        self.assertRaises(GiphyApiException, list, results)
+
+    def test_stream_raises_on_incomplete_response(self):
+        resp = Mock(status_code=200, headers={})
+        resp.iter_content.return_value = iter([b'{"data": [{"id": "1"},'])
+        self.g._session = Mock()
+        self.g._session.get.return_value = resp
+
+        results = self.g.search('foo', stream=True)
+        assert next(results).id == '1'
+        self.assertRaises(GiphyApiException, next, results)
+        assert resp.close.called
+
+    def test_stream_uses_cache(self):
+        self.g.close()
+        self.g = Giphy(cache=MemoryCache())
+        first = [r.id for r in self.g.search('foo', limit=None, stream=True)]
+        second = [r.id for r in self.g.search('foo', limit=None, stream=True)]
+
+        assert first == second == [str(i) for i in range(60)]
+        assert len(self.server.requests) == 2
+        assert self.g.cache.hits == 2
+
+        # Both streamed and whole responses share cache entries
+        assert len(self.g.search_list('foo', limit=None, parallel=0)) == 60
+        assert len(self.server.requests) == 2
+
+    def test_partly_read_stream_not_cached(self):
+        self.g.close()
+        self.g = Giphy(cache=MemoryCache())
+        list(self.g.search('foo', limit=10, stream=True))
+        assert len(self.g.cache) == 0
+
+    def test_stream_excludes_prefetch_and_parallel(self):
+        self.assertRaises(ValueError, self.g.search, 'foo', stream=True,
+                          prefetch=1)
+        self.assertRaises(ValueError, self.g.trending, stream=True,
+                          parallel=2)
+
+
+@skipIf(AsyncGiphy is None, 'requires python 3 and aiohttp')
+class AsyncGiphyTestCase(ServerTestCase):
+
+    server_kwargs = {'total_count': 60}
+
+    def setUp(self):
+        super(AsyncGiphyTestCase, self).setUp()
+        self.loop = asyncio.new_event_loop()
+        self.g = AsyncGiphy()
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.g.close())
+        self.loop.close()
+        super(AsyncGiphyTestCase, self).tearDown()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def collect(self, agen):
+        results = []
+        while True:
+            try:
+                results.append(self.run_async(agen.__anext__()))
+            except StopAsyncIteration:
+                return results
+
+    def test_search_pages(self):
+        results = self.collect(self.g.search('foo', limit=None))
+        assert [r.id for r in results] == [str(i) for i in range(60)]
+        assert len(self.server.requests) == 2
+
+    def test_search_stream(self):
+        results = self.collect(self.g.search('foo', limit=30, stream=True))
+        assert [r.id for r in results] == [str(i) for i in range(30)]
+        assert len(self.server.requests) == 1
+
+    def test_trending_stream_uses_cache(self):
+        self.run_async(self.g.close())
+        self.g = AsyncGiphy(cache=MemoryCache())
+        for _ in range(2):
+            results = self.collect(self.g.trending(limit=None, stream=True))
+            assert len(results) == 60
+        assert len(self.server.requests) == 2
+
+    @patch('giphypop.RATE_LIMIT_BACKOFF', 0.01)
+    def test_rate_limited_retries(self):
+        self.server.throttle = 1
+        self.run_async(self.g.close())
+        self.g = AsyncGiphy(rate_limit=RateLimiter(100))
+        img = self.run_async(self.g.gif('abc'))
+
+        assert img.id == 'abc'
+        assert self.server.statuses == [429, 200]
+
+    def test_retries_server_errors(self):
+        self.server.errors = [502, None]
+        with patch('giphypop.RETRY_BACKOFF', 0.01):
+            img = self.run_async(self.g.gif('foo'))
+        assert img.id == 'foo'
+        assert self.server.statuses == [502, None, 200]
+
+    def test_deadline(self):
+        self.server.latency = 0.2
+        self.assertRaises(GiphyTimeoutException, self.run_async,
+                          self.g.gif('foo', deadline=0.1))
+
+    def test_deadline_covers_limiter_wait(self):
+        limiter = RateLimiter(1)
+        limiter.pause(3)
+        self.run_async(self.g.close())
+        self.g = AsyncGiphy(rate_limit=limiter)
+        start = time.time()
+        self.assertRaises(GiphyTimeoutException, self.run_async,
+                          self.g.gif('foo', deadline=0.5))
+        assert time.time() - start < 0.5
+        assert self.server.requests == []
+        assert limiter._pending == 0
+
+    def test_search_respects_limit(self):
+        results = self.collect(self.g.search('foo', limit=30))
+        assert len(results) == 30
+        assert all(isinstance(r, GiphyImage) for r in results)
+
+    def test_search_phrase_hyphenates(self):
+        self.collect(self.g.search(phrase='foo bar', limit=1))
+        assert self.server.requests[0][1]['q'] == 'foo-bar'
+
+    def test_trending_list(self):
+        results = self.run_async(self.g.trending_list(limit=40))
+        assert len(results) == 40
+        assert self.server.requests[0][0] == 'trending'
+
+    def test_translate(self):
+        img = self.run_async(self.g.translate('foo'))
+        assert isinstance(img, GiphyImage)
+        assert self.server.requests[0] == (
+            'translate', {'s': 'foo', 'api_key': giphypop.GIPHY_PUBLIC_KEY})
+
+    def test_gif(self):
+        img = self.run_async(self.g.gif('abc'))
+        assert img.id == 'abc'
+
+    def test_screensaver(self):
+        img = self.run_async(self.g.screensaver('foo'))
+        assert img.id == 'random'
+        assert [r[0] for r in self.server.requests] == ['screensaver']
+
+        self.server.bare_random = True
+        img = self.run_async(self.g.screensaver('foo'))
+        assert img.original.url == FAKE_DATA['images']['original']['url']
+        assert [r[0] for r in self.server.requests][1:] == ['screensaver',
+                                                           'random']
+
+    def test_screensaver_reservoir(self):
+        g = AsyncGiphy(reservoir=4)
+        try:
+            assert self.run_async(g.screensaver('foo')).id == 'random'
+            self.run_async(asyncio.wait(g._refills))
+            assert len(g._reservoirs['foo'].items) == 4
+            assert len(self.server.requests) == 5
+
+            self.run_async(g.screensaver('foo'))
+            assert len(g._reservoirs['foo'].items) == 3
+            assert len(self.server.requests) == 5
+        finally:
+            self.run_async(g.close())
+
+    def test_upload(self):
+        img = self.run_async(self.g.upload(['foo'], __file__))
+        assert img.id == 'uploaded'
+
+    def test_upload_streams(self):
+        progress = Mock()
+        img = self.run_async(self.g.upload(['foo'], iter([b'abc', b'def']),
+                                           progress=progress))
+        assert img.id == 'uploaded'
+        (fields, length), = self.server.uploads
+        assert fields['file'][2] == b'abcdef'
+        assert progress.call_args == ((6, None),)
+
+        self.run_async(self.g.upload(['foo'], io.BytesIO(b'abc')))
+        fields, length = self.server.uploads[-1]
+        assert fields['file'][2] == b'abc'
+        assert length is not None
+
+    def test_upload_many(self):
+        self.server.latency = 0.1
+        items = [iter([b'abc']) for _ in range(4)]
+        start = time.time()
+        results = self.collect(self.g.upload_many(items, concurrency=4,
+                                                  hydrate=False))
+        assert time.time() - start < 0.2
+        assert sorted(map(id, (r[0] for r in results))) == sorted(
+            map(id, items))
+        assert [r[1:] for r in results] == [('uploaded', None)] * 4
+
+    def test_download_many(self):
+        self.server.media = dict(('%d.gif' % i, os.urandom(100000))
+                                 for i in range(60))
+        item = self.server.item
+
+        def media_item(gif_id):
+            data = item(gif_id)
+            data['images']['original']['url'] = self.server.media_url(
+                '%s.gif' % gif_id)
+            data['images']['original']['size'] = '100000'
+            return data
+
+        self.server.item = media_item
+        self.server.cut_media = 70000
+        tmp = tempfile.mkdtemp()
+        try:
+            with patch('giphypop.RETRY_BACKOFF', 0.01):
+                results = self.collect(self.g.download_many(
+                    self.g.search('foo', limit=None), tmp, concurrency=8))
+            assert len(results) == 60
+            for img, path, error in results:
+                with open(path, 'rb') as f:
+                    assert f.read() == self.server.media['%s.gif' % img.id]
+            assert 206 in self.server.statuses
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_local_index(self):
+        index = LocalIndex()
+        g = AsyncGiphy(local_index=index)
+        try:
+            results = sorted(self.collect(g.warm(['foo', 'bar'], limit=30)))
+            assert results == [('bar', 30, None), ('foo', 30, None)]
+
+            found = self.collect(g.search('foo', limit=30))
+            assert [r.id for r in found] == [str(i) for i in range(30)]
+            assert self.run_async(g.gif('5')).id == '5'
+            assert len(self.server.requests) == 2
+
+            offline = AsyncGiphy(local_index=index, local_mode='offline')
+            assert len(self.collect(offline.search('bar foo', limit=5))) == 5
+            assert self.run_async(offline.translate('foo')) is not None
+            assert len(self.server.requests) == 2
+        finally:
+            self.run_async(g.close())
+            index.close()
+
+    def test_gifs(self):
+        ids = ['a', 'b', 'a'] + [str(i) for i in range(150)]
+        with patch('giphypop.GIFS_CHUNK_SIZE', 50):
+            results = self.run_async(self.g.gifs(ids, parallel=2))
+        assert list(results) == ['a', 'b'] + [str(i) for i in range(150)]
+        assert all(img.id == gif_id for gif_id, img in results.items())
+        assert len(self.server.requests) == 4
+
+    def test_gifs_local_index(self):
+        index = LocalIndex()
+        g = AsyncGiphy(local_index=index)
+        try:
+            self.run_async(g.gif('a'))
+            results = self.run_async(g.gifs(['a', 'b']))
+            assert [img.id for img in results.values()] == ['a', 'b']
+            assert self.server.requests[-1][1]['ids'] == 'b'
+        finally:
+            self.run_async(g.close())
+            index.close()
+
+    def test_stats(self):
+        retry = Mock()
+        g = AsyncGiphy(collect_stats=True, hooks={'retry': retry})
+        try:
+            self.collect(g.search('foo', limit=None))
+            self.collect(g.search('bar', limit=10, stream=True))
+            with patch('giphypop.RETRY_BACKOFF', 0.01):
+                self.server.errors = [502]
+                self.assertRaises(giphypop_async.aiohttp.ClientResponseError,
+                                  self.run_async,
+                                  g.upload([], io.BytesIO(b'abc'),
+                                           hydrate=False))
+                self.server.errors = [502]
+                self.run_async(g.gif('foo'))
+
+            stats = g.stats()
+            search = stats['search']
+            assert search['requests'] == 3 and search['pages'] == 3
+            assert search['results'] == 70
+            assert 0 < search['decode_seconds'] <= search['seconds']
+            assert stats['upload']['errors'] == 1
+            assert stats['upload']['bytes_out'] > 3
+            assert stats['gif']['retries'] == 1
+            assert stats['gif']['statuses'] == {200: 1}
+            assert retry.call_count == 1
+        finally:
+            self.run_async(g.close())
+
+    def test_error_raises(self):
+        self.g._check_or_raise = Mock(side_effect=GiphyApiException)
+        self.assertRaises(GiphyApiException, self.run_async, self.g.gif('foo'))
+
+    def test_strict_raises(self):
+        self.server.payload = Mock(return_value={'data': None,
+                                                 'meta': {'status': 200}})
+        self.assertRaises(GiphyApiException, self.run_async,
+                          self.g.translate('foo', strict=True))
+        assert self.run_async(self.g.gif('foo')) is None
+
+    def test_identical_lookups_share_request(self):
+        self.server.latency = 0.1
+        tasks = [self.loop.create_task(self.g.gif('foo')) for _ in range(10)]
+        self.loop.call_later(0.05, tasks[0].cancel)
+
+        results = self.run_async(asyncio.gather(*tasks[1:]))
+        assert [r.id for r in results] == ['foo'] * 9
+        assert len(self.server.requests) == 1
+        assert tasks[0].cancelled()
+        assert not giphypop_async._flights
+
+    def test_concurrent_lookups_share_pool(self):
+        tasks = [self.loop.create_task(self.g.gif(str(i)))
+                 for i in range(200)]
+
+        results = self.run_async(asyncio.gather(*tasks))
+        assert [r.id for r in results] == [str(i) for i in range(200)]
+        assert self.server.connections <= self.g.pool_maxsize
+
+
 class AliasTestCase(TestCase):
 
-    @patch('giphypop.Giphy')
-    def test_search_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_search_alias(self, get_client):
+        giphy = get_client.return_value
         search(term='foo', limit=10, api_key='bar', strict=False, rating=None)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
+        get_client.assert_called_with('bar')
         giphy.search.assert_called_with(term='foo', phrase=None, limit=10,
                                         rating=None)
 
-    @patch('giphypop.Giphy')
-    def test_search_list_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_search_list_alias(self, get_client):
+        giphy = get_client.return_value
         search_list(term='foo', limit=10, api_key='bar', strict=False,
                     rating=None)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
+        get_client.assert_called_with('bar')
         giphy.search_list.assert_called_with(term='foo', phrase=None, limit=10,
                                              rating=None)
 
-    @patch('giphypop.Giphy')
-    def test_translate_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_translate_alias(self, get_client):
+        giphy = get_client.return_value
         translate(term='foo', api_key='bar', strict=False, rating=None)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
-        giphy.translate.assert_called_with(term='foo', phrase=None, rating=None)
+        get_client.assert_called_with('bar')
+        giphy.translate.assert_called_with(term='foo', phrase=None,
+                                           strict=False, rating=None)
 
-    @patch('giphypop.Giphy')
-    def test_gif_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_gif_alias(self, get_client):
+        giphy = get_client.return_value
         gif('foo', api_key='bar', strict=False)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
-        giphy.gif.assert_called_with('foo')
+        get_client.assert_called_with('bar')
+        giphy.gif.assert_called_with('foo', strict=False)
 
-    @patch('giphypop.Giphy')
-    def test_screensaver_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_gifs_alias(self, get_client):
+        giphy = get_client.return_value
+        gifs(['foo', 'bar'], api_key='bar', strict=False)
+
+        get_client.assert_called_with('bar')
+        giphy.gifs.assert_called_with(['foo', 'bar'], strict=False)
+
+    @patch('giphypop.get_client')
+    def test_screensaver_alias(self, get_client):
+        giphy = get_client.return_value
         screensaver(tag='foo', api_key='bar', strict=False)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
-        giphy.screensaver.assert_called_with(tag='foo')
+        get_client.assert_called_with('bar')
+        giphy.screensaver.assert_called_with(tag='foo', strict=False)
 
-    @patch('giphypop.Giphy')
-    def test_trending_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_trending_alias(self, get_client):
+        giphy = get_client.return_value
         trending(api_key='bar', strict=False, rating=None, limit=10)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
+        get_client.assert_called_with('bar')
         giphy.trending.assert_called_with(rating=None, limit=10)
 
-    @patch('giphypop.Giphy')
-    def test_trending_list_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_trending_list_alias(self, get_client):
+        giphy = get_client.return_value
         trending_list(api_key='bar', strict=False, rating=None, limit=10)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
+        get_client.assert_called_with('bar')
         giphy.trending_list.assert_called_with(rating=None, limit=10)
 
-    @patch('giphypop.Giphy')
-    def test_upload_alias(self, giphy):
-        giphy.return_value = giphy
+    @patch('giphypop.get_client')
+    def test_upload_alias(self, get_client):
+        giphy = get_client.return_value
         upload(tags=['foo', 'bar'], file_path='/dev/null', username='foobar',
                api_key='bar', strict=False)
 
-        giphy.assert_called_with(api_key='bar', strict=False)
-        giphy.upload.assert_called_with(['foo', 'bar'], '/dev/null', 'foobar')
+        get_client.assert_called_with('bar')
+        giphy.upload.assert_called_with(['foo', 'bar'], '/dev/null', 'foobar',
+                                        hydrate=False)
+        giphy.gif.assert_called_with(giphy.upload.return_value, strict=False)
+
+    @patch('giphypop.get_client')
+    def test_upload_alias_strict(self, get_client):
+        giphy = get_client.return_value
+        upload(tags=['foo'], file_path='/dev/null', strict=True)
+        giphy.gif.assert_called_with(giphy.upload.return_value, strict=True)